@@ -0,0 +1,186 @@
+"""
+Caché en memoria para métodos de servicio de lectura frecuente sobre datos que cambian
+poco (tratamientos, dentistas, preferencias, presupuesto pendiente de un cliente).
+
+- @cached(nombre) guarda el resultado por argumentos, con vencimiento (TTL) y una
+  cantidad máxima de entradas (se descarta la usada hace más tiempo).
+- @invalidates(nombre) en los métodos de escritura descarta las entradas afectadas al
+  terminar: todas las de la caché o solo la clave indicada. Dentro de un
+  Database.session() de escritura el descarte espera al commit de la sesión; hacerlo
+  antes dejaría que una lectura concurrente volviera a guardar los datos previos.
+- El TTL acota el tiempo que un cambio hecho fuera de este proceso (otra instancia de la
+  aplicación, SQL directo) tarda en verse.
+- cache_stats() expone aciertos, fallos y descartes de cada caché para ajustar tamaños
+  y TTL.
+
+Los valores se comparten entre llamadas: quien los recibe no debe modificarlos.
+"""
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+from core.config import settings
+from core.database import Database
+
+
+class TTLCache:
+    """LRU acotada con vencimiento por entrada"""
+
+    def __init__(self, name: str, ttl: float, maxsize: int):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # clave -> (expira, valor)
+        self._lock = threading.Lock()
+        # Se incrementa en cada invalidación: una lectura iniciada antes no guarda su resultado
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Retorna (encontrado, valor)"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return True, entry[1]
+                del self._data[key]
+            self.misses += 1
+            return False, None
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def set(self, key, value, generation: Optional[int] = None):
+        """Guarda el valor, salvo que haya habido una invalidación desde `generation`"""
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key=None):
+        """Descarta la entrada `key`, o todas si es None"""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+_caches: Dict[str, TTLCache] = {}
+_registry_lock = threading.Lock()
+
+
+def get_cache(name: str, ttl: Optional[float] = None, maxsize: Optional[int] = None) -> TTLCache:
+    """Caché registrada con ese nombre (se crea con los valores por defecto de la configuración)"""
+    with _registry_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            cache = TTLCache(
+                name,
+                ttl if ttl is not None else settings.CACHE_TTL_SECONDS,
+                maxsize if maxsize is not None else settings.CACHE_MAX_ENTRIES
+            )
+            _caches[name] = cache
+        return cache
+
+
+def cached(name: str, ttl: Optional[float] = None, maxsize: Optional[int] = None):
+    """
+    Guarda en la caché `name` el resultado de la función por argumentos (la clave es el
+    nombre de la función y la tupla de argumentos con los valores por defecto aplicados;
+    ver cache_key). Las excepciones no se guardan. La caché queda accesible como
+    función.cache; ttl y maxsize solo cuentan la primera vez que se registra la caché.
+    """
+    def decorator(func: Callable):
+        cache = get_cache(name, ttl, maxsize)
+        signature = inspect.signature(func)
+        # Varias funciones pueden compartir una caché (y su invalidación)
+        qualname = func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not settings.CACHE_ENABLED:
+                return func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (qualname,) + tuple(bound.arguments.values())
+
+            found, value = cache.get(key)
+            if found:
+                return value
+            generation = cache.generation
+            value = func(*args, **kwargs)
+            cache.set(key, value, generation)
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+
+def cache_key(func: Callable, *args):
+    """Clave con la que @cached guarda func(*args) (args completos, en el orden de la firma)"""
+    return (getattr(func, '__wrapped__', func).__qualname__,) + args
+
+
+def invalidates(name: str, key: Optional[Callable] = None):
+    """
+    Al terminar la función (con o sin error) descarta entradas de la caché `name`: la
+    clave que retorna key(*args, **kwargs) (ver cache_key) o, sin `key`, todas. Ver
+    invalidate() sobre cuándo se aplica.
+    """
+    def decorator(func: Callable):
+        get_cache(name)  # Registrada desde ya, para que figure en cache_stats()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                invalidate(name, key(*args, **kwargs) if key else None)
+        return wrapper
+    return decorator
+
+
+def invalidate(name: str, key=None):
+    """
+    Descarta la entrada `key` de la caché `name`, o todas si es None: al confirmarse la
+    sesión de escritura activa o, si no hay ninguna, en el momento.
+    """
+    cache = get_cache(name)
+    Database.after_commit(lambda: cache.invalidate(key))
+
+
+def cache_stats() -> Dict[str, dict]:
+    """Contadores de cada caché registrada (aciertos, fallos, tamaño, descartes)"""
+    with _registry_lock:
+        caches = list(_caches.values())
+    return {cache.name: cache.stats() for cache in caches}
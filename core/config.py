@@ -20,6 +20,8 @@ class Config:
     """Configuración base de la aplicación"""
     # Configuración general
     APP_NAME: str = "Godonto"
+    # Versión publicada (identifica cada arranque en el informe de tiempos de core.startup)
+    APP_VERSION: str = os.getenv("APP_VERSION", "1.0.0")
     DEBUG: bool = os.getenv("DEBUG", "False").lower() == "true"
     SECRET_KEY: str = os.getenv("SECRET_KEY", "default-secret-key-for-dev")
     
@@ -30,6 +32,73 @@ class Config:
     DB_USER: str = os.getenv("DB_USER", "postgres")
     DB_PASSWORD: str = os.getenv("DB_PASSWORD", "")
     
+    # Configuración del pool de conexiones
+    DB_POOL_MIN_SIZE: int = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+    DB_POOL_MAX_SIZE: int = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+    DB_CONNECT_TIMEOUT: int = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))  # segundos
+    DB_POOL_MAX_IDLE: int = int(os.getenv("DB_POOL_MAX_IDLE", "300"))  # segundos; 0 desactiva el reciclaje
+    DB_POOL_CHECKOUT_TIMEOUT: float = float(os.getenv("DB_POOL_CHECKOUT_TIMEOUT", "30"))  # segundos en cola
+    DB_POOL_SLOW_WAIT_MS: float = float(os.getenv("DB_POOL_SLOW_WAIT_MS", "1000"))  # umbral para registrar esperas largas
+    # Ajustes de sesión del pool interactivo (agenda, clientes, formularios)
+    DB_INTERACTIVE_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_INTERACTIVE_STATEMENT_TIMEOUT_MS", "15000"))
+    
+    # Pool de reportes: separado para que las agregaciones pesadas no acaparen las conexiones de la recepción
+    DB_REPORTING_POOL_MIN_SIZE: int = int(os.getenv("DB_REPORTING_POOL_MIN_SIZE", "0"))
+    DB_REPORTING_POOL_MAX_SIZE: int = int(os.getenv("DB_REPORTING_POOL_MAX_SIZE", "3"))
+    DB_REPORTING_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_REPORTING_STATEMENT_TIMEOUT_MS", "300000"))
+    DB_REPORTING_WORK_MEM: str = os.getenv("DB_REPORTING_WORK_MEM", "64MB")
+    
+    # Réplica de lectura (streaming replication); vacío desactiva el enrutamiento de lecturas
+    DB_REPLICA_HOST: str = os.getenv("DB_REPLICA_HOST", "")
+    DB_REPLICA_PORT: str = os.getenv("DB_REPLICA_PORT", DB_PORT)
+    DB_REPLICA_POOL_MAX_SIZE: int = int(os.getenv("DB_REPLICA_POOL_MAX_SIZE", "5"))
+    DB_REPLICA_MAX_LAG_SECONDS: float = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "5"))
+    DB_REPLICA_LAG_CHECK_INTERVAL: float = float(os.getenv("DB_REPLICA_LAG_CHECK_INTERVAL", "10"))  # segundos
+    # Tras una escritura, las lecturas van al primario durante este tiempo (read-your-writes)
+    DB_READ_YOUR_WRITES_SECONDS: float = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "10"))
+    
+    # Trazado de consultas SQL
+    DB_QUERY_TRACING: bool = os.getenv("DB_QUERY_TRACING", "True").lower() == "true"
+    DB_SLOW_QUERY_MS: float = float(os.getenv("DB_SLOW_QUERY_MS", "500"))
+    DB_SLOW_QUERY_EXPLAIN: bool = os.getenv("DB_SLOW_QUERY_EXPLAIN", "False").lower() == "true"
+
+    # Índice en memoria para el autocompletado de clientes; con más clientes que este
+    # límite no se construye y la búsqueda queda en la base de datos (0 lo desactiva)
+    CLIENT_SEARCH_INDEX_MAX_CLIENTS: int = int(os.getenv("CLIENT_SEARCH_INDEX_MAX_CLIENTS", "50000"))
+    # Cambios hechos desde otras instancias: sondeo por updated_at y reconstrucción completa (segundos)
+    CLIENT_SEARCH_INDEX_POLL_SECONDS: float = float(os.getenv("CLIENT_SEARCH_INDEX_POLL_SECONDS", "30"))
+    CLIENT_SEARCH_INDEX_MAX_AGE_SECONDS: float = float(os.getenv("CLIENT_SEARCH_INDEX_MAX_AGE_SECONDS", "900"))
+
+    # Total de los listados paginados: "exact" (COUNT) o "estimated" (estimación del planificador,
+    # no recorre la tabla; conviene con tablas muy grandes)
+    LIST_TOTAL_MODE: str = os.getenv("LIST_TOTAL_MODE", "exact").lower()
+
+    # Caché en memoria de lecturas frecuentes (core.cache): TTL por defecto y entradas por caché
+    CACHE_ENABLED: bool = os.getenv("CACHE_ENABLED", "True").lower() == "true"
+    CACHE_TTL_SECONDS: float = float(os.getenv("CACHE_TTL_SECONDS", "300"))
+    CACHE_MAX_ENTRIES: int = int(os.getenv("CACHE_MAX_ENTRIES", "256"))
+
+    # Bus de eventos: umbral para registrar manejadores lentos
+    EVENT_SLOW_HANDLER_MS: float = float(os.getenv("EVENT_SLOW_HANDLER_MS", "200"))
+
+    # Ventana en la que las vistas agrupan los eventos antes de recargarse (utils.refresh_scheduler)
+    VIEW_REFRESH_WINDOW_MS: float = float(os.getenv("VIEW_REFRESH_WINDOW_MS", "500"))
+
+    # Planificador de tareas de mantenimiento (core.scheduler): hilos de trabajo
+    SCHEDULER_WORKERS: int = int(os.getenv("SCHEDULER_WORKERS", "2"))
+    # Cada cuántos minutos se cancelan las citas pendientes que ya pasaron
+    PENDING_APPOINTMENTS_SWEEP_MINUTES: float = float(os.getenv("PENDING_APPOINTMENTS_SWEEP_MINUTES", "5"))
+    # Expresión cron (minuto hora día mes día-semana) del vencimiento de presupuestos
+    QUOTE_EXPIRY_CRON: str = os.getenv("QUOTE_EXPIRY_CRON", "5 0 * * *")
+    # Segundos tras el arranque antes del primer barrido (la carga inicial no lo espera)
+    MAINTENANCE_FIRST_RUN_DELAY: float = float(os.getenv("MAINTENANCE_FIRST_RUN_DELAY", "10"))
+
+    # Hilos con los que core.startup ejecuta en paralelo los pasos del arranque
+    STARTUP_WORKERS: int = int(os.getenv("STARTUP_WORKERS", "4"))
+
+    # Máximo de puntos por serie en los gráficos de reportes (las más largas se reducen)
+    CHART_MAX_POINTS: int = int(os.getenv("CHART_MAX_POINTS", "60"))
+
     # Configuración de la aplicación Flet
     FLET_PORT: int = int(os.getenv("FLET_PORT", "8500"))
     FLET_VIEW: str = os.getenv("FLET_VIEW", "WEB_BROWSER")
@@ -47,16 +116,45 @@ class Config:
     LOG_FILE: str = os.getenv("LOG_FILE", "godonto.log")
     
     @classmethod
-    def get_database_config(cls) -> Dict[str, Any]:
-        """Retorna la configuración de la base de datos como diccionario"""
+    def get_database_config(cls, replica: bool = False) -> Dict[str, Any]:
+        """Retorna la configuración de la base de datos (primario o réplica) como diccionario"""
         return {
-            "host": cls.DB_HOST,
-            "port": cls.DB_PORT,
+            "host": cls.DB_REPLICA_HOST if replica else cls.DB_HOST,
+            "port": cls.DB_REPLICA_PORT if replica else cls.DB_PORT,
             "database": cls.DB_NAME,
             "user": cls.DB_USER,
             "password": cls.DB_PASSWORD
         }
     
+    @classmethod
+    def get_pool_config(cls, name: str = "interactive") -> Dict[str, Any]:
+        """Retorna la configuración del pool de conexiones indicado ('interactive' o 'reporting')"""
+        config = {
+            "min_size": cls.DB_POOL_MIN_SIZE,
+            "max_size": cls.DB_POOL_MAX_SIZE,
+            "connect_timeout": cls.DB_CONNECT_TIMEOUT,
+            "max_idle": cls.DB_POOL_MAX_IDLE,
+            "checkout_timeout": cls.DB_POOL_CHECKOUT_TIMEOUT,
+            "slow_wait_ms": cls.DB_POOL_SLOW_WAIT_MS,
+            "application_name": f"{cls.APP_NAME}-{name}",
+            "session_settings": {
+                "statement_timeout": cls.DB_INTERACTIVE_STATEMENT_TIMEOUT_MS
+            }
+        }
+        if name in ("reporting", "replica"):
+            # La réplica también atiende reportes y no compite con la operación del primario
+            config.update({
+                "min_size": cls.DB_REPORTING_POOL_MIN_SIZE,
+                "max_size": cls.DB_REPORTING_POOL_MAX_SIZE,
+                "session_settings": {
+                    "statement_timeout": cls.DB_REPORTING_STATEMENT_TIMEOUT_MS,
+                    "work_mem": cls.DB_REPORTING_WORK_MEM
+                }
+            })
+        if name == "replica":
+            config["max_size"] = cls.DB_REPLICA_POOL_MAX_SIZE
+        return config
+    
     @property
     def FLET_VIEW(self) -> ft.AppView:
         view_mapping = {
@@ -0,0 +1,181 @@
+import bisect
+import logging
+import threading
+import time
+from collections import deque
+from psycopg2 import pool
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(pool.PoolError):
+    """No se pudo obtener una conexión del pool antes de que venciera el plazo de espera"""
+    pass
+
+
+class PoolMetrics:
+    """
+    Métricas del pool de conexiones: tiempos de espera al obtener una conexión,
+    tiempo que cada conexión permanece prestada y pico de saturación.
+    """
+    # Límites superiores (en milisegundos) de los buckets de los histogramas
+    BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.recycled = 0
+            self.in_use = 0
+            self.peak_in_use = 0
+            self._wait = self._empty_series()
+            self._hold = self._empty_series()
+
+    def _empty_series(self):
+        return {
+            'count': 0,
+            'total_ms': 0.0,
+            'max_ms': 0.0,
+            'histogram': [0] * (len(self.BUCKETS_MS) + 1)
+        }
+
+    def _observe(self, series, elapsed_ms):
+        series['count'] += 1
+        series['total_ms'] += elapsed_ms
+        series['max_ms'] = max(series['max_ms'], elapsed_ms)
+        series['histogram'][bisect.bisect_left(self.BUCKETS_MS, elapsed_ms)] += 1
+
+    def record_checkout(self, wait_ms):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self._observe(self._wait, wait_ms)
+
+    def record_release(self, hold_ms):
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+            self._observe(self._hold, hold_ms)
+
+    def record_recycle(self):
+        with self._lock:
+            self.recycled += 1
+
+    def _summary(self, series):
+        labels = [f"<={b}ms" for b in self.BUCKETS_MS] + [f">{self.BUCKETS_MS[-1]}ms"]
+        return {
+            'count': series['count'],
+            'avg_ms': series['total_ms'] / series['count'] if series['count'] else 0.0,
+            'max_ms': series['max_ms'],
+            'histogram': dict(zip(labels, series['histogram']))
+        }
+
+    def snapshot(self, max_size, idle):
+        with self._lock:
+            return {
+                'max_size': max_size,
+                'in_use': self.in_use,
+                'idle': idle,
+                'peak_in_use': self.peak_in_use,
+                'saturation': self.in_use / max_size if max_size else 0.0,
+                'peak_saturation': self.peak_in_use / max_size if max_size else 0.0,
+                'checkouts': self.checkouts,
+                'recycled': self.recycled,
+                'checkout_wait': self._summary(self._wait),
+                'hold_duration': self._summary(self._hold)
+            }
+
+
+class FairConnectionPool:
+    """
+    Envoltorio sobre ThreadedConnectionPool que, en lugar de lanzar PoolError
+    cuando todas las conexiones están prestadas, encola a los solicitantes en
+    orden FIFO y les entrega las conexiones a medida que se devuelven.
+
+    Cada solicitante obtiene primero un permiso (hay tantos permisos como
+    conexiones máximas) y solo entonces pide la conexión al pool interno, que
+    por lo tanto nunca se agota.
+    """
+
+    def __init__(self, inner: pool.ThreadedConnectionPool, max_size: int,
+                 timeout: float = 30.0, slow_wait_ms: float = 1000.0):
+        self._inner = inner
+        self.max_size = max_size
+        self.timeout = timeout
+        self.slow_wait_ms = slow_wait_ms
+        self._lock = threading.Lock()
+        self._available = max_size
+        self._waiters = deque()
+
+    def _acquire_permit(self, timeout: float):
+        with self._lock:
+            # Si hay gente esperando no se adelanta a nadie aunque haya permisos libres
+            if self._available > 0 and not self._waiters:
+                self._available -= 1
+                return
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+
+        started = time.perf_counter()
+        if not waiter.wait(timeout):
+            with self._lock:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    # El permiso llegó justo al vencer el plazo: ya es nuestro
+                    pass
+                else:
+                    raise PoolTimeoutError(
+                        f"No se obtuvo una conexión en {timeout:.1f}s "
+                        f"({len(self._waiters)} solicitudes en cola)"
+                    )
+
+        waited_ms = (time.perf_counter() - started) * 1000
+        if waited_ms >= self.slow_wait_ms:
+            logger.warning(f"Espera prolongada por una conexión del pool: {waited_ms:.0f} ms")
+
+    def _release_permit(self):
+        with self._lock:
+            if self._waiters:
+                # Entregar el permiso directamente al solicitante más antiguo
+                self._waiters.popleft().set()
+            else:
+                self._available += 1
+
+    def getconn(self, timeout: float = None):
+        """Obtiene una conexión esperando en cola (FIFO) hasta `timeout` segundos si el pool está lleno"""
+        self._acquire_permit(self.timeout if timeout is None else timeout)
+        try:
+            return self._inner.getconn()
+        except Exception:
+            self._release_permit()
+            raise
+
+    def putconn(self, conn, close: bool = False):
+        """Devuelve una conexión al pool y despierta al siguiente solicitante en cola"""
+        try:
+            self._inner.putconn(conn, close=close)
+        finally:
+            self._release_permit()
+
+    def replace(self, conn):
+        """Cierra `conn` y devuelve una conexión nueva conservando el permiso del solicitante"""
+        try:
+            self._inner.putconn(conn, close=True)
+            return self._inner.getconn()
+        except Exception:
+            self._release_permit()
+            raise
+
+    def idle_count(self) -> int:
+        return len(self._inner._pool)
+
+    def waiting_count(self) -> int:
+        with self._lock:
+            return len(self._waiters)
+
+    def closeall(self):
+        self._inner.closeall()
@@ -1,15 +1,95 @@
 import psycopg2
 from psycopg2 import pool
-from contextlib import contextmanager
+from psycopg2.extras import execute_values
+from contextlib import contextmanager, asynccontextmanager
+import asyncio
+import contextvars
+import itertools
+import json
 import logging
+import re
+import threading
+import time
+from typing import Callable, Optional
 from .config import settings
+from .connection_pool import FairConnectionPool, PoolMetrics
+from .query_tracing import TracingCursor, WriteTrackingCursor, is_write, query_stats, slow_query_config
+
+# asyncpg es opcional: solo lo necesita la capa asíncrona
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
 
 # Configuración del logger para este módulo
 logger = logging.getLogger(__name__)
 
+
+# Los servicios escriben sus consultas con el estilo de psycopg2 (%s);
+# asyncpg y PREPARE esperan parámetros posicionales ($1, $2, ...)
+_PLACEHOLDER_RE = re.compile(r"%%|%s")
+
+# Sentencias que devuelven filas (AsyncCursor usa fetch para estas y execute para el resto)
+_RETURNS_ROWS_RE = re.compile(r"^\s*(SELECT|WITH|VALUES|TABLE|SHOW|EXPLAIN)\b|\bRETURNING\b", re.IGNORECASE)
+
+
+def _to_positional_query(query: str) -> str:
+    """Convierte los marcadores %s de psycopg2 en parámetros posicionales $n"""
+    counter = 0
+
+    def _replace(match):
+        nonlocal counter
+        if match.group(0) == "%%":
+            return "%"
+        counter += 1
+        return f"${counter}"
+
+    return _PLACEHOLDER_RE.sub(_replace, query)
+
+
+class _SessionState:
+    """Conexión fijada por Database.session() para el contexto actual"""
+
+    def __init__(self, conn, readonly: bool, pool: str):
+        self.conn = conn
+        self.readonly = readonly
+        self.pool = pool  # pool del que salió la conexión (la réplica si se enrutó allí)
+        self.savepoints = itertools.count(1)
+        self.after_commit = []  # callbacks a ejecutar cuando la sesión confirme
+
+
+# Sesiones activas en el hilo/tarea actual, una por pool (cada hilo y cada tarea
+# asyncio tiene su propio contexto). El diccionario nunca se modifica: se reemplaza.
+_current_sessions = contextvars.ContextVar("db_sessions", default={})
+
+
 class Database:
-    _connection_pool = None
+    # Pools con nombre: el interactivo atiende la operación diaria y el de reportes
+    # las agregaciones pesadas, cada uno con su tamaño y ajustes de sesión
+    INTERACTIVE = "interactive"
+    REPORTING = "reporting"
+    # Réplica de lectura: recibe las lecturas de get_db(readonly=True) cuando está al día
+    REPLICA = "replica"
+
+    _pools = {}
+    _pool_configs = {}
+    _pool_metrics = {}
+    _pools_lock = threading.Lock()
     _initialized = False
+    # Momento (time.monotonic) en que cada conexión volvió al pool, para el reciclaje por inactividad
+    _returned_at = {}
+    # Sentencias preparadas registradas por los servicios: nombre -> SQL (con marcadores %s)
+    _statements = {}
+    # Los servicios registran sentencias al importarse, quizá mientras otro hilo prepara
+    # las ya registradas (p. ej. los pasos paralelos de core.startup)
+    _statements_lock = threading.Lock()
+    # Sentencias ya preparadas en cada conexión viva, indexadas por _connection_key()
+    _prepared = {}
+    # Última escritura confirmada en el primario (time.monotonic), para read-your-writes
+    _last_write_at = None
+    # Último control de retraso de la réplica
+    _replica_status = {'checked_at': None, 'lag_seconds': None, 'healthy': False}
+    _replica_lock = threading.Lock()
 
     # En database.py, modifica el método initialize:
     @classmethod
@@ -19,17 +99,12 @@ class Database:
         try:
             db_config = settings.get_database_config()
             logger.info(f"Intentando conectar a la base de datos con config: {db_config}")
-            cls._connection_pool = pool.ThreadedConnectionPool(
-                minconn=1,
-                maxconn=10,
-                host=db_config["host"],
-                database=db_config["database"],
-                user=db_config["user"],
-                password=db_config["password"],
-                port=db_config["port"]
-            )
+            cls._returned_at = {}
+            slow_query_config['threshold_ms'] = settings.DB_SLOW_QUERY_MS
+            slow_query_config['explain'] = settings.DB_SLOW_QUERY_EXPLAIN
+            # El pool interactivo se crea ahora; el de reportes, en su primer uso
+            cls._create_pool(cls.INTERACTIVE)
             cls._initialized = True
-            logger.info("Pool de conexiones a la base de datos inicializado correctamente")
             
             # Registrar el cierre al salir
             #atexit.register(cls.close_all_connections)
@@ -42,31 +117,415 @@ class Database:
             logger.critical(f"No se pudo conectar a la base de datos: {str(e)}")
             raise ConnectionError(f"No se pudo conectar a la base de datos: {str(e)}")
 
+    @classmethod
+    def _create_pool(cls, name: str):
+        """Crea el pool `name` aplicando sus ajustes de sesión en el arranque de cada conexión"""
+        db_config = settings.get_database_config(replica=(name == cls.REPLICA))
+        pool_config = settings.get_pool_config(name)
+        # Los ajustes viajan en el paquete de arranque de la conexión: no cuestan viajes extra
+        options = " ".join(f"-c {key}={value}" for key, value in pool_config["session_settings"].items())
+        inner_pool = pool.ThreadedConnectionPool(
+            minconn=pool_config["min_size"],
+            maxconn=pool_config["max_size"],
+            host=db_config["host"],
+            database=db_config["database"],
+            user=db_config["user"],
+            password=db_config["password"],
+            port=db_config["port"],
+            connect_timeout=pool_config["connect_timeout"],
+            application_name=pool_config["application_name"],
+            options=options
+        )
+        # Con el pool lleno las solicitudes esperan en cola en lugar de fallar con PoolError
+        cls._pools[name] = FairConnectionPool(
+            inner_pool,
+            max_size=pool_config["max_size"],
+            timeout=pool_config["checkout_timeout"],
+            slow_wait_ms=pool_config["slow_wait_ms"]
+        )
+        cls._pool_configs[name] = pool_config
+        cls._pool_metrics[name] = PoolMetrics()
+        logger.info(
+            f"Pool de conexiones '{name}' inicializado correctamente "
+            f"(min={pool_config['min_size']}, max={pool_config['max_size']}, {options})"
+        )
+
+    @classmethod
+    def _get_pool(cls, name: str) -> FairConnectionPool:
+        if name not in cls._pools:
+            with cls._pools_lock:
+                if name not in cls._pools:
+                    cls._create_pool(name)
+        return cls._pools[name]
+
+    @classmethod
+    def _checkout(cls, name: str):
+        """Obtiene una conexión del pool descartando las que llevan demasiado tiempo inactivas"""
+        connection_pool = cls._get_pool(name)
+        max_idle = cls._pool_configs[name]["max_idle"]
+        conn = connection_pool.getconn()
+        while True:
+            returned_at = cls._returned_at.pop(id(conn), None)
+            if max_idle and returned_at is not None and time.monotonic() - returned_at > max_idle:
+                # Conexión ociosa demasiado tiempo: cerrarla y pedir otra sin volver a la cola
+                cls._prepared.pop(cls._connection_key(conn), None)
+                conn = connection_pool.replace(conn)
+                cls._pool_metrics[name].record_recycle()
+                logger.debug(f"Conexión inactiva reciclada en el pool '{name}'")
+                continue
+            return conn
+
     @classmethod
     @contextmanager
-    def get_connection(cls):
-        """Obtiene una conexión del pool"""
+    def get_connection(cls, pool: str = INTERACTIVE):
+        """Obtiene una conexión del pool indicado (por defecto, el interactivo)"""
         if not cls._initialized:
             cls.initialize()
         
-        conn = cls._connection_pool.getconn()
+        wait_started = time.perf_counter()
+        conn = cls._checkout(pool)
+        checked_out = time.perf_counter()
+        metrics = cls._pool_metrics[pool]
+        metrics.record_checkout((checked_out - wait_started) * 1000)
         try:
+            cls._prepare_statements(conn)
             yield conn
         except Exception as e:
             logger.error(f"Error en la conexión: {str(e)}")
             raise
         finally:
-            cls._connection_pool.putconn(conn)
+            metrics.record_release((time.perf_counter() - checked_out) * 1000)
+            key = cls._connection_key(conn)
+            cls._returned_at[id(conn)] = time.monotonic()
+            cls._pools[pool].putconn(conn)
+            if conn.closed:
+                # El pool cierra las conexiones que exceden minconn: olvidar su estado
+                cls._returned_at.pop(id(conn), None)
+                cls._prepared.pop(key, None)
+
+    @staticmethod
+    def _connection_key(conn):
+        """Identifica una conexión viva (id() solo puede repetirse si el PID del backend también coincide)"""
+        return (id(conn), conn.get_backend_pid() if not conn.closed else None)
+
+    @classmethod
+    def register_statement(cls, name: str, query: str):
+        """
+        Registra una consulta para ejecutarla como sentencia preparada en el servidor.
+        Se prepara (PREPARE) en cada conexión del pool la primera vez que se obtiene
+        después del registro, y se ejecuta con Database.execute_prepared().
+
+        Args:
+            name: Nombre de la sentencia (identificador SQL válido)
+            query: SQL con marcadores %s, igual que en cursor.execute
+        """
+        if not re.fullmatch(r"[a-z_][a-z0-9_]*", name):
+            raise ValueError(f"Nombre de sentencia inválido: {name}")
+        with cls._statements_lock:
+            cls._statements[name] = query
+
+    @classmethod
+    def _prepare_statements(cls, conn):
+        """Prepara en `conn` las sentencias registradas que aún no lo estén"""
+        with cls._statements_lock:
+            statements = dict(cls._statements)
+        if not statements:
+            return
+        key = cls._connection_key(conn)
+        prepared = cls._prepared.setdefault(key, set())
+        missing = [name for name in statements if name not in prepared]
+        if not missing:
+            return
+
+        cursor = conn.cursor()
+        try:
+            for name in missing:
+                try:
+                    cursor.execute(f"PREPARE {name} AS {_to_positional_query(statements[name])}")
+                    prepared.add(name)
+                except Exception as e:
+                    # Si falla, execute_prepared usará la consulta ad hoc en esta conexión
+                    logger.error(f"No se pudo preparar la sentencia '{name}': {str(e)}")
+                    if not conn.autocommit:
+                        conn.rollback()
+            if not conn.autocommit:
+                conn.commit()
+        finally:
+            cursor.close()
+
+    @classmethod
+    def execute_prepared(cls, cursor, name: str, params=()):
+        """
+        Ejecuta en `cursor` la sentencia registrada `name` con EXECUTE. Si no está
+        preparada en la conexión del cursor, ejecuta la consulta original.
+        """
+        params = tuple(params)
+        prepared = cls._prepared.get(cls._connection_key(cursor.connection), ())
+        if name in prepared:
+            placeholders = ", ".join(["%s"] * len(params))
+            cursor.execute(f"EXECUTE {name} ({placeholders})" if params else f"EXECUTE {name}", params)
+        else:
+            cursor.execute(cls._statements[name], params)
+
+    @staticmethod
+    def insert_many(cursor, table: str, columns, rows, template: str = None,
+                    returning: str = None, page_size: int = 500) -> list:
+        """
+        Inserta `rows` en `table` con un único INSERT ... VALUES (...), (...) por cada
+        `page_size` filas (execute_values) en lugar de un INSERT por fila.
+
+        `template` permite valores fijos por fila, p. ej. "(%s, %s, NOW())".
+        Con `returning` devuelve las filas de RETURNING en el orden de `rows`.
+        """
+        rows = list(rows)
+        if not rows:
+            return []
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s"
+        if returning:
+            query += f" RETURNING {returning}"
+        result = execute_values(
+            cursor, query, rows, template=template, page_size=page_size, fetch=bool(returning)
+        )
+        return result or []
+
+    @classmethod
+    def pool_stats(cls, pool: str = INTERACTIVE) -> dict:
+        """
+        Retorna el estado del pool indicado: conexiones en uso, ociosas y solicitudes en cola,
+        pico de saturación e histogramas del tiempo de espera en checkout y del tiempo de retención.
+        """
+        if not cls._initialized or pool not in cls._pools:
+            return {'initialized': False}
+        connection_pool = cls._pools[pool]
+        stats = cls._pool_metrics[pool].snapshot(
+            max_size=cls._pool_configs[pool]["max_size"],
+            idle=connection_pool.idle_count()
+        )
+        stats['waiting'] = connection_pool.waiting_count()
+        stats['initialized'] = True
+        stats['min_size'] = cls._pool_configs[pool]["min_size"]
+        return stats
+
+    @classmethod
+    def query_stats(cls, limit: int = None) -> list:
+        """
+        Retorna, por huella de SQL normalizada, llamadas, tiempo total y percentiles
+        (p50/p95/p99), filas promedio y los métodos que la ejecutan, ordenado por
+        tiempo total acumulado.
+        """
+        return query_stats.summary(limit)
+
+    @classmethod
+    def reset_query_stats(cls):
+        """Reinicia las estadísticas de consultas acumuladas"""
+        query_stats.reset()
+
+    @staticmethod
+    def _new_cursor(conn):
+        """Crea un cursor, con trazado de consultas si está habilitado en la configuración"""
+        if settings.DB_QUERY_TRACING:
+            return conn.cursor(cursor_factory=TracingCursor)
+        return conn.cursor(cursor_factory=WriteTrackingCursor)
+
+    @classmethod
+    def _route(cls, pool: str, readonly: bool) -> str:
+        """
+        Decide qué pool atiende una solicitud: las lecturas van a la réplica si está
+        configurada, no hubo escrituras recientes (read-your-writes) y su retraso está
+        dentro del umbral; en cualquier otro caso se usa el pool pedido en el primario.
+        """
+        if not readonly or not settings.DB_REPLICA_HOST:
+            return pool
+        if cls._last_write_at is not None and \
+                time.monotonic() - cls._last_write_at < settings.DB_READ_YOUR_WRITES_SECONDS:
+            return pool
+        return cls.REPLICA if cls._replica_is_fresh() else pool
+
+    @classmethod
+    def _replica_is_fresh(cls) -> bool:
+        """Indica si la réplica está al día, midiendo su retraso como mucho cada DB_REPLICA_LAG_CHECK_INTERVAL"""
+        status = cls._replica_status
+        if status['checked_at'] is not None and \
+                time.monotonic() - status['checked_at'] < settings.DB_REPLICA_LAG_CHECK_INTERVAL:
+            return status['healthy']
+
+        with cls._replica_lock:
+            # Otro hilo pudo haber hecho el control mientras esperábamos el lock
+            if status['checked_at'] is not None and \
+                    time.monotonic() - status['checked_at'] < settings.DB_REPLICA_LAG_CHECK_INTERVAL:
+                return status['healthy']
+            lag = None
+            try:
+                with cls.get_connection(cls.REPLICA) as conn:
+                    cursor = conn.cursor()
+                    try:
+                        cursor.execute("""
+                            SELECT CASE
+                                WHEN NOT pg_is_in_recovery() THEN 0
+                                WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                                ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+                            END
+                        """)
+                        lag = float(cursor.fetchone()[0])
+                        conn.commit()
+                    finally:
+                        cursor.close()
+            except Exception as e:
+                logger.warning(f"Réplica no disponible, las lecturas irán al primario: {str(e)}")
+
+            healthy = lag is not None and lag <= settings.DB_REPLICA_MAX_LAG_SECONDS
+            if lag is not None and not healthy:
+                logger.warning(f"Réplica con {lag:.1f}s de retraso, las lecturas irán al primario")
+            status.update(checked_at=time.monotonic(), lag_seconds=lag, healthy=healthy)
+            return healthy
+
+    @classmethod
+    def replica_status(cls) -> dict:
+        """Estado del último control de la réplica (retraso en segundos y si recibe lecturas)"""
+        return {
+            'configured': bool(settings.DB_REPLICA_HOST),
+            'lag_seconds': cls._replica_status['lag_seconds'],
+            'healthy': cls._replica_status['healthy']
+        }
+
+    @staticmethod
+    def note_write(cursor):
+        """
+        Marca que `cursor` escribió aunque el SQL no lo muestre (p. ej. una función que
+        modifica datos): al confirmarse, las lecturas siguientes van al primario.
+        """
+        cursor.wrote = True
+
+    @classmethod
+    def _note_writes(cls, pool: str, cursor):
+        """Registra una escritura confirmada en el primario para garantizar read-your-writes"""
+        if pool != cls.REPLICA and getattr(cursor, "wrote", False):
+            cls._last_write_at = time.monotonic()
+
+    @classmethod
+    @contextmanager
+    def session(cls, readonly: bool = False, pool: str = INTERACTIVE):
+        """
+        Fija una única conexión para todas las llamadas a get_db() del bloque, de modo
+        que una carga de pantalla o una operación compuesta cueste un solo checkout.
+
+        - readonly=False: todo el bloque es una transacción; cada get_db() anidado
+          usa un SAVEPOINT para conservar su atomicidad individual.
+        - readonly=True: la conexión trabaja en autocommit (sin transacción abierta
+          ni COMMIT extra), pensado para lecturas como el dashboard.
+
+        Las sesiones anidadas sobre el mismo pool se integran en la sesión exterior;
+        cada pool tiene su propia sesión. La excepción es una sesión de escritura dentro
+        de una de solo lectura (que está en autocommit y puede ser la réplica): esa abre
+        su propia conexión y transacción (ver _joins_session).
+        """
+        sessions = _current_sessions.get()
+        if cls._joins_session(sessions.get(pool), readonly):
+            yield sessions[pool].conn
+            return
+
+        # Una sesión de solo lectura puede atenderse desde la réplica
+        routed_pool = cls._route(pool, readonly)
+        with cls.get_connection(routed_pool) as conn:
+            if readonly:
+                conn.autocommit = True
+            state = _SessionState(conn, readonly, routed_pool)
+            token = _current_sessions.set({**sessions, pool: state})
+            try:
+                yield conn
+                if not readonly:
+                    conn.commit()
+            except Exception:
+                if not readonly:
+                    conn.rollback()
+                raise
+            finally:
+                _current_sessions.reset(token)
+                if readonly:
+                    conn.autocommit = False
+        # Ya confirmada y con la conexión devuelta al pool
+        for callback in state.after_commit:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Error en un callback posterior al commit: {str(e)}")
+
+    @classmethod
+    def after_commit(cls, callback: Callable, pool: str = INTERACTIVE):
+        """
+        Ejecuta callback() cuando se confirme lo escrito: al cerrar la sesión de escritura
+        activa sobre `pool` o, si no hay ninguna, en el momento (fuera de una sesión,
+        get_db() confirma al salir de su bloque). Si la sesión se revierte, se descarta.
+        """
+        state = _current_sessions.get().get(pool)
+        if state is not None and not state.readonly:
+            state.after_commit.append(callback)
+        else:
+            callback()
+
+    @staticmethod
+    def _joins_session(state: Optional[_SessionState], readonly: bool) -> bool:
+        """
+        Indica si un acceso con intención `readonly` puede usar la sesión activa. Una
+        escritura no se integra en una sesión de solo lectura: allí no tendría
+        transacción ni savepoint (autocommit) y la conexión puede ser la réplica.
+        """
+        return state is not None and (readonly or not state.readonly)
+
+    @classmethod
+    @contextmanager
+    def _session_cursor(cls, state: _SessionState):
+        """Cursor sobre la conexión de la sesión activa"""
+        cursor = cls._new_cursor(state.conn)
+        if state.readonly:
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+            return
+
+        savepoint = f"sp_{next(state.savepoints)}"
+        cursor.execute(f"SAVEPOINT {savepoint}")
+        try:
+            yield cursor
+            cursor.execute(f"RELEASE SAVEPOINT {savepoint}")
+            cls._note_writes(state.pool, cursor)
+        except Exception as e:
+            # Deshacer solo el trabajo de este bloque; la sesión sigue siendo utilizable
+            logger.error(f"Error en transacción: {str(e)}")
+            try:
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+                cursor.execute(f"RELEASE SAVEPOINT {savepoint}")
+            except Exception as rollback_error:
+                # Conexión rota: la sesión completa se revertirá al propagarse el error original
+                logger.error(f"No se pudo revertir el savepoint {savepoint}: {str(rollback_error)}")
+            raise
+        finally:
+            cursor.close()
 
     @classmethod
     @contextmanager
-    def get_cursor(cls):
-        """Obtiene un cursor de la base de datos"""
-        with cls.get_connection() as conn:
-            cursor = conn.cursor()
+    def get_cursor(cls, pool: str = INTERACTIVE, readonly: bool = False):
+        """
+        Obtiene un cursor de la base de datos del pool indicado (reutiliza la conexión
+        de Database.session() si hay una activa sobre ese pool, salvo que se pida
+        escribir dentro de una sesión de solo lectura: eso usa su propia transacción).
+
+        Con readonly=True la lectura puede atenderse desde la réplica (ver _route).
+        """
+        state = _current_sessions.get().get(pool)
+        if cls._joins_session(state, readonly):
+            with cls._session_cursor(state) as cursor:
+                yield cursor
+            return
+
+        routed_pool = cls._route(pool, readonly)
+        with cls.get_connection(routed_pool) as conn:
+            cursor = cls._new_cursor(conn)
             try:
                 yield cursor
                 conn.commit()
+                cls._note_writes(routed_pool, cursor)
             except Exception as e:
                 conn.rollback()
                 logger.error(f"Error en transacción: {str(e)}")
@@ -76,10 +535,13 @@ class Database:
 
     @classmethod
     def close_all_connections(cls):
-        """Cierra todas las conexiones del pool"""
-        if cls._connection_pool and cls._initialized:
+        """Cierra todas las conexiones de todos los pools"""
+        if cls._pools and cls._initialized:
             try:
-                cls._connection_pool.closeall()
+                for connection_pool in cls._pools.values():
+                    connection_pool.closeall()
+                cls._pools = {}
+                cls._prepared.clear()
                 logger.info("Todas las conexiones de la base de datos cerradas")
                 cls._initialized = False
             except Exception as e:
@@ -87,5 +549,167 @@ class Database:
 
 #atexit.register(Database.close_all_connections)
 
+
+class AsyncCursor:
+    """
+    Cursor mínimo sobre una conexión asyncpg con la misma interfaz que usan
+    los servicios con psycopg2 (execute / fetchone / fetchall / rowcount),
+    de modo que las consultas existentes se puedan reutilizar sin cambios.
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._rows = []
+        self._position = 0
+        self.rowcount = -1
+        self.description = None
+        self.wrote = False
+
+    async def execute(self, query: str, params=None):
+        # fetch/execute con argumentos pasan por la caché de sentencias de la conexión:
+        # cada consulta distinta se prepara una sola vez (prepare() no usa esa caché)
+        if not self.wrote and is_write(query):
+            self.wrote = True
+        query = _to_positional_query(query)
+        args = tuple(params or ())
+        self._position = 0
+        if _RETURNS_ROWS_RE.search(query):
+            self._rows = await self._connection.fetch(query, *args)
+            self.rowcount = len(self._rows)
+            self.description = [(key,) for key in self._rows[0].keys()] if self._rows else None
+            return
+
+        # El mensaje de estado tiene la forma "UPDATE 3", "INSERT 0 1", "DELETE 2"
+        status = await self._connection.execute(query, *args) or ""
+        self._rows = []
+        self.description = None
+        last = status.rsplit(" ", 1)[-1]
+        self.rowcount = int(last) if last.isdigit() else -1
+
+    async def fetchone(self):
+        if self._position >= len(self._rows):
+            return None
+        row = self._rows[self._position]
+        self._position += 1
+        return row
+
+    async def fetchall(self):
+        rows = self._rows[self._position:]
+        self._position = len(self._rows)
+        return rows
+
+
+class AsyncDatabase:
+    """
+    Equivalente asíncrono de Database: un pool de asyncpg por cada pool de Database
+    que se use (interactivo, reportes, réplica), con los mismos límites y ajustes de
+    sesión, creado la primera vez que se pide.
+    """
+    _pools = {}
+    _init_lock = None
+
+    @staticmethod
+    def is_available() -> bool:
+        """Indica si la capa asíncrona puede usarse (asyncpg instalado)"""
+        return asyncpg is not None
+
+    @staticmethod
+    async def _init_connection(conn):
+        """Decodifica json/jsonb igual que psycopg2 para no cambiar el formato de los resultados"""
+        for type_name in ("json", "jsonb"):
+            await conn.set_type_codec(
+                type_name,
+                encoder=json.dumps,
+                decoder=json.loads,
+                schema="pg_catalog"
+            )
+
+    @classmethod
+    async def initialize(cls, pool: str = Database.INTERACTIVE):
+        """Inicializa el pool asíncrono `pool` (no hace nada si ya existe)"""
+        if asyncpg is None:
+            raise ConnectionError("asyncpg no está instalado; la capa asíncrona no está disponible")
+
+        if cls._init_lock is None:
+            cls._init_lock = asyncio.Lock()
+        # Dos primeras conexiones concurrentes no deben crear (y perder) un pool cada una
+        async with cls._init_lock:
+            if pool in cls._pools:
+                return
+            try:
+                db_config = settings.get_database_config(replica=pool == Database.REPLICA)
+                pool_config = settings.get_pool_config(pool)
+                cls._pools[pool] = await asyncpg.create_pool(
+                    min_size=pool_config["min_size"],
+                    max_size=pool_config["max_size"],
+                    timeout=pool_config["connect_timeout"],
+                    max_inactive_connection_lifetime=pool_config["max_idle"],
+                    host=db_config["host"],
+                    database=db_config["database"],
+                    user=db_config["user"],
+                    password=db_config["password"],
+                    port=int(db_config["port"]),
+                    init=cls._init_connection,
+                    server_settings={
+                        "application_name": f"{pool_config['application_name']}-async",
+                        **{key: str(value) for key, value in pool_config["session_settings"].items()}
+                    }
+                )
+                logger.info(f"Pool asíncrono {pool} inicializado correctamente")
+            except Exception as e:
+                logger.critical(f"No se pudo crear el pool asíncrono {pool}: {str(e)}")
+                raise ConnectionError(f"No se pudo conectar a la base de datos: {str(e)}")
+
+    @classmethod
+    @asynccontextmanager
+    async def get_connection(cls, pool: str = Database.INTERACTIVE):
+        """Obtiene una conexión del pool asíncrono indicado"""
+        if pool not in cls._pools:
+            await cls.initialize(pool)
+
+        async with cls._pools[pool].acquire() as conn:
+            try:
+                yield conn
+            except Exception as e:
+                logger.error(f"Error en la conexión asíncrona: {str(e)}")
+                raise
+
+    @classmethod
+    @asynccontextmanager
+    async def get_cursor(cls, pool: str = Database.INTERACTIVE, readonly: bool = False):
+        """
+        Obtiene un cursor asíncrono dentro de una transacción (commit/rollback automáticos).
+        Con readonly=True la lectura puede atenderse desde la réplica, como en Database.get_cursor.
+        """
+        routed_pool = pool
+        if readonly and settings.DB_REPLICA_HOST:
+            # _route puede medir el retraso de la réplica con la capa síncrona: fuera del bucle
+            routed_pool = await asyncio.to_thread(Database._route, pool, readonly)
+        async with cls.get_connection(routed_pool) as conn:
+            transaction = conn.transaction(readonly=readonly)
+            await transaction.start()
+            cursor = AsyncCursor(conn)
+            try:
+                yield cursor
+                await transaction.commit()
+            except Exception as e:
+                await transaction.rollback()
+                logger.error(f"Error en transacción asíncrona: {str(e)}")
+                raise
+        Database._note_writes(routed_pool, cursor)
+
+    @classmethod
+    async def close_all_connections(cls):
+        """Cierra todas las conexiones de los pools asíncronos"""
+        pools, cls._pools = cls._pools, {}
+        for name, connection_pool in pools.items():
+            try:
+                await connection_pool.close()
+                logger.info(f"Conexiones asíncronas del pool {name} cerradas")
+            except Exception as e:
+                logger.error(f"Error al cerrar conexiones asíncronas: {str(e)}")
+
+
 # Alias para compatibilidad con el código existente
-get_db = Database.get_cursor
\ No newline at end of file
+get_db = Database.get_cursor
+get_db_async = AsyncDatabase.get_cursor
\ No newline at end of file
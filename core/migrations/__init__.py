@@ -0,0 +1,4 @@
+from .runner import MigrationRunner, PLAN_QUERIES
+from .versions import MIGRATIONS
+
+__all__ = ["MigrationRunner", "MIGRATIONS", "PLAN_QUERIES"]
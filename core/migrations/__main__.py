@@ -0,0 +1,47 @@
+"""
+Ejecuta las migraciones del esquema.
+
+Uso (desde la raíz del proyecto, con la base de datos configurada en .env):
+    python -m core.migrations status
+    python -m core.migrations upgrade [versión]
+    python -m core.migrations downgrade <versión>
+    python -m core.migrations plans
+"""
+import logging
+import sys
+from .runner import MigrationRunner
+
+
+def main(argv) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    command = argv[0] if argv else "status"
+    target = int(argv[1]) if len(argv) > 1 else None
+
+    # MigrationRunner abre su propia conexión (sin los pools de la aplicación)
+    if command == "status":
+        for migration in MigrationRunner.status():
+            mark = "x" if migration['applied'] else " "
+            print(f"[{mark}] {migration['version']:04d} {migration['description']}")
+    elif command == "upgrade":
+        report = MigrationRunner.upgrade(target, report_plans=True)
+        if report:
+            print(MigrationRunner.format_plan_report(report))
+        print(f"Versión actual del esquema: {MigrationRunner.current_version()}")
+    elif command == "downgrade":
+        if target is None:
+            print("Indique la versión destino, p. ej.: python -m core.migrations downgrade 0")
+            return 1
+        MigrationRunner.downgrade(target)
+        print(f"Versión actual del esquema: {MigrationRunner.current_version()}")
+    elif command == "plans":
+        for name, plan in MigrationRunner.explain_queries().items():
+            print(f"== {name}")
+            print("\n".join(f"    {line}" for line in plan))
+    else:
+        print(__doc__)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,239 @@
+import logging
+import re
+from contextlib import contextmanager
+from datetime import date
+import psycopg2
+from core.config import settings
+from .versions import MIGRATIONS
+
+logger = logging.getLogger(__name__)
+
+_CONCURRENT_INDEX_RE = re.compile(r"CREATE\s+INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)", re.IGNORECASE)
+
+# Consultas de los servicios cuyos planes se comparan antes y después de migrar
+PLAN_QUERIES = {
+    "appointment_slot_taken": (
+        "SELECT id FROM appointments WHERE date = %s AND time = '09:00' AND status = 'pending'",
+        (date.today(),)
+    ),
+    "appointment_booked_times": (
+        "SELECT time FROM appointments WHERE date = %s AND status = 'pending'",
+        (date.today(),)
+    ),
+    "dashboard_revenue": (
+        "SELECT COALESCE(SUM(amount), 0) FROM payments "
+        "WHERE status = 'completed' AND payment_date BETWEEN %s AND %s",
+        (date.today().replace(day=1), date.today())
+    ),
+    "client_pending_debt": (
+        "SELECT COALESCE(SUM(amount - paid_amount), 0) FROM debts WHERE client_id = %s AND status = 'pending'",
+        (1,)
+    ),
+    "overdue_debts": (
+        "SELECT COUNT(*) FROM debts WHERE status = 'pending' AND due_date < CURRENT_DATE",
+        ()
+    ),
+    "client_treatment_history": (
+        "SELECT id, completed_quantity, total_quantity FROM client_treatments "
+        "WHERE client_id = %s AND treatment_id = %s AND quote_id = %s AND appointment_id IS NULL",
+        (1, 1, 1)
+    ),
+    "client_search": (
+        "SELECT id, name FROM clients WHERE immutable_unaccent(lower(coalesce(name, '') || ' ' || "
+        "coalesce(cedula, '') || ' ' || coalesce(phone, '') || ' ' || coalesce(email, ''))) "
+        "LIKE immutable_unaccent(lower(%s)) "
+        "ORDER BY word_similarity(immutable_unaccent(lower(%s)), immutable_unaccent(lower(name))) DESC, name LIMIT 10",
+        ("%maria%", "maria")
+    ),
+    "client_cedula_prefix": (
+        "SELECT id, name FROM clients WHERE cedula LIKE %s OR phone LIKE %s ORDER BY name LIMIT 10",
+        ("1234%", "1234%")
+    ),
+}
+
+
+class MigrationRunner:
+    """
+    Aplica y revierte las migraciones de core/migrations/versions, registrándolas en schema_migrations.
+
+    Usa una conexión propia, fuera de los pools de la aplicación y sin statement_timeout:
+    los rellenos y la creación de índices tardan lo que haga falta. Las migraciones con
+    TRANSACTIONAL = False (índices CONCURRENTLY) corren en autocommit, sentencia por
+    sentencia; las demás, en una transacción junto con su registro de versión.
+    """
+
+    VERSION_TABLE = "schema_migrations"
+
+    @staticmethod
+    @contextmanager
+    def _connection():
+        conn = psycopg2.connect(
+            **settings.get_database_config(),
+            connect_timeout=settings.DB_CONNECT_TIMEOUT,
+            application_name=f"{settings.APP_NAME}-migrations"
+        )
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SET statement_timeout = 0")
+            conn.commit()
+            yield conn
+        finally:
+            conn.close()
+
+    @classmethod
+    def _run(cls, conn, migration, statements: list, record: tuple):
+        """Ejecuta las sentencias de la migración y el registro (consulta, parámetros) de su versión"""
+        if getattr(migration, "TRANSACTIONAL", True):
+            # Contexto de psycopg2: commit al terminar, rollback si hay error
+            with conn:
+                with conn.cursor() as cursor:
+                    for statement in statements:
+                        cursor.execute(statement)
+                    cursor.execute(*record)
+            return
+
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cursor:
+                for statement in statements:
+                    cls._drop_invalid_index(cursor, statement)
+                    cursor.execute(statement)
+                cursor.execute(*record)
+        finally:
+            conn.autocommit = False
+
+    @staticmethod
+    def _drop_invalid_index(cursor, statement: str):
+        """
+        Un CREATE INDEX CONCURRENTLY interrumpido deja el índice marcado como inválido, e
+        IF NOT EXISTS lo daría por creado: se elimina antes de reintentarlo.
+        """
+        match = _CONCURRENT_INDEX_RE.search(statement)
+        if not match:
+            return
+        cursor.execute(
+            """
+            SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = %s AND NOT i.indisvalid
+            """,
+            (match.group(1),)
+        )
+        if cursor.fetchone():
+            logger.warning(f"Índice inválido {match.group(1)} de un intento anterior: se vuelve a crear")
+            cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {match.group(1)}")
+
+    @classmethod
+    def _ensure_version_table(cls, cursor):
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {cls.VERSION_TABLE} (
+                version integer PRIMARY KEY,
+                description text NOT NULL,
+                applied_at timestamp without time zone DEFAULT CURRENT_TIMESTAMP NOT NULL
+            )
+        """)
+
+    @classmethod
+    def applied_versions(cls) -> list:
+        """Versiones ya aplicadas, en orden ascendente"""
+        with cls._connection() as conn, conn, conn.cursor() as cursor:
+            cls._ensure_version_table(cursor)
+            cursor.execute(f"SELECT version FROM {cls.VERSION_TABLE} ORDER BY version")
+            return [row[0] for row in cursor.fetchall()]
+
+    @classmethod
+    def current_version(cls) -> int:
+        applied = cls.applied_versions()
+        return applied[-1] if applied else 0
+
+    @classmethod
+    def status(cls) -> list:
+        """Lista de migraciones conocidas con su estado (aplicada o pendiente)"""
+        applied = set(cls.applied_versions())
+        return [
+            {
+                'version': migration.VERSION,
+                'description': migration.DESCRIPTION,
+                'applied': migration.VERSION in applied
+            }
+            for migration in MIGRATIONS
+        ]
+
+    @classmethod
+    def upgrade(cls, target: int = None, report_plans: bool = False) -> dict:
+        """
+        Aplica, en orden, las migraciones pendientes hasta `target` (todas si es None).
+        Cada migración corre en su propia transacción junto con su registro de versión,
+        salvo las no transaccionales (ver _run).
+        Con report_plans=True retorna los planes de PLAN_QUERIES antes y después.
+        """
+        applied = set(cls.applied_versions())
+        pending = [
+            m for m in MIGRATIONS
+            if m.VERSION not in applied and (target is None or m.VERSION <= target)
+        ]
+        before = cls.explain_queries() if report_plans and pending else None
+
+        with cls._connection() as conn:
+            for migration in pending:
+                cls._run(conn, migration, migration.UP, (
+                    f"INSERT INTO {cls.VERSION_TABLE} (version, description) VALUES (%s, %s)",
+                    (migration.VERSION, migration.DESCRIPTION)
+                ))
+                logger.info(f"Migración {migration.VERSION} aplicada: {migration.DESCRIPTION}")
+
+        if before is None:
+            return {}
+        return cls._compare_plans(before, cls.explain_queries())
+
+    @classmethod
+    def downgrade(cls, target: int = 0) -> list:
+        """Revierte, de la más reciente a la más antigua, las migraciones con versión mayor a `target`"""
+        applied = set(cls.applied_versions())
+        reverted = []
+        with cls._connection() as conn:
+            for migration in reversed(MIGRATIONS):
+                if migration.VERSION <= target or migration.VERSION not in applied:
+                    continue
+                cls._run(conn, migration, migration.DOWN, (
+                    f"DELETE FROM {cls.VERSION_TABLE} WHERE version = %s",
+                    (migration.VERSION,)
+                ))
+                logger.info(f"Migración {migration.VERSION} revertida: {migration.DESCRIPTION}")
+                reverted.append(migration.VERSION)
+        return reverted
+
+    @classmethod
+    def explain_queries(cls) -> dict:
+        """Plan (EXPLAIN, sin ejecutar la consulta) de cada consulta de PLAN_QUERIES"""
+        plans = {}
+        with cls._connection() as conn, conn, conn.cursor() as cursor:
+            for name, (query, params) in PLAN_QUERIES.items():
+                try:
+                    cursor.execute("SAVEPOINT explain_plan")
+                    cursor.execute(f"EXPLAIN {query}", params)
+                    plans[name] = [row[0] for row in cursor.fetchall()]
+                    cursor.execute("RELEASE SAVEPOINT explain_plan")
+                except Exception as e:
+                    # Una tabla ausente en esta base no debe impedir el reporte del resto
+                    cursor.execute("ROLLBACK TO SAVEPOINT explain_plan")
+                    plans[name] = [f"No disponible: {str(e).strip()}"]
+        return plans
+
+    @staticmethod
+    def _compare_plans(before: dict, after: dict) -> dict:
+        return {
+            name: {'before': before.get(name, []), 'after': after.get(name, [])}
+            for name in PLAN_QUERIES
+        }
+
+    @staticmethod
+    def format_plan_report(report: dict) -> str:
+        """Texto legible con el plan anterior y posterior de cada consulta"""
+        lines = []
+        for name, plans in report.items():
+            lines.append(f"== {name}")
+            lines.append("  antes:")
+            lines.extend(f"    {line}" for line in plans['before'])
+            lines.append("  después:")
+            lines.extend(f"    {line}" for line in plans['after'])
+        return "\n".join(lines)
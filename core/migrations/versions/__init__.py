@@ -0,0 +1,21 @@
+# Migraciones en orden de versión. Se listan explícitamente (en lugar de descubrirlas
+# en disco) para que PyInstaller las incluya en el ejecutable.
+from . import (
+    m0001_composite_indexes,
+    m0002_partial_indexes,
+    m0003_client_trigram_search,
+    m0004_keyset_pagination_indexes,
+    m0005_count_estimate,
+    m0006_daily_metrics,
+    m0007_report_snapshots,
+)
+
+MIGRATIONS = [
+    m0001_composite_indexes,
+    m0002_partial_indexes,
+    m0003_client_trigram_search,
+    m0004_keyset_pagination_indexes,
+    m0005_count_estimate,
+    m0006_daily_metrics,
+    m0007_report_snapshots,
+]
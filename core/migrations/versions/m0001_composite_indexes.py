@@ -0,0 +1,31 @@
+"""Índices compuestos para los filtros más usados por los servicios"""
+
+VERSION = 1
+DESCRIPTION = "Índices compuestos: citas por fecha/hora/estado, pagos por fecha, deudas e historial por cliente"
+
+# Índices sobre tablas en uso: CONCURRENTLY no bloquea las escrituras mientras se
+# construyen, pero no puede ejecutarse dentro de una transacción (ver MigrationRunner)
+TRANSACTIONAL = False
+
+UP = [
+    # AppointmentService.search_available_slots / validate_appointment_time, calendario
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_appointments_date_time_status ON appointments (date, time, status)",
+    # StatsService: ingresos por rango de fechas y del día
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_payments_payment_date ON payments (payment_date)",
+    # PaymentService/ClientService: deuda pendiente por cliente y vencimientos
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_debts_client_status_due_date ON debts (client_id, status, due_date)",
+    # HistoryService.add_client_treatment / presupuestos: búsqueda del registro de historial
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_client_treatments_client_treatment_quote "
+    "ON client_treatments (client_id, treatment_id, quote_id)",
+    "ANALYZE appointments",
+    "ANALYZE payments",
+    "ANALYZE debts",
+    "ANALYZE client_treatments",
+]
+
+DOWN = [
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_client_treatments_client_treatment_quote",
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_debts_client_status_due_date",
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_payments_payment_date",
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_appointments_date_time_status",
+]
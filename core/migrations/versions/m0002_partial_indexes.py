@@ -0,0 +1,24 @@
+"""Índices parciales sobre las filas 'pending', que son las que consultan la agenda y el dashboard"""
+
+VERSION = 2
+DESCRIPTION = "Índices parciales: citas pendientes por fecha/hora y deudas pendientes por vencimiento"
+
+# Índices sobre tablas en uso: CONCURRENTLY no bloquea las escrituras mientras se
+# construyen, pero no puede ejecutarse dentro de una transacción (ver MigrationRunner)
+TRANSACTIONAL = False
+
+UP = [
+    # Citas pendientes: disponibilidad de horarios, citas del día y cancelación de citas vencidas
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_appointments_pending_date_time "
+    "ON appointments (date, time) WHERE status = 'pending'",
+    # Deudas pendientes: total por cobrar y deudas vencidas del dashboard
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_debts_pending_due_date "
+    "ON debts (due_date) INCLUDE (amount, paid_amount) WHERE status = 'pending'",
+    "ANALYZE appointments",
+    "ANALYZE debts",
+]
+
+DOWN = [
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_debts_pending_due_date",
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_appointments_pending_date_time",
+]
@@ -0,0 +1,40 @@
+"""Búsqueda de clientes por trigramas sin acentos y prefijo de cédula/teléfono (ver ClientService._build_search_filter)"""
+
+VERSION = 3
+DESCRIPTION = "Búsqueda de clientes: índice GIN pg_trgm sin acentos y btree de prefijo para cédula/teléfono"
+
+# Índices sobre tablas en uso: CONCURRENTLY no bloquea las escrituras mientras se
+# construyen, pero no puede ejecutarse dentro de una transacción (ver MigrationRunner)
+TRANSACTIONAL = False
+
+UP = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    # unaccent() es STABLE y no puede usarse en un índice; con el diccionario explícito
+    # el resultado solo depende del argumento, por lo que es seguro declararla IMMUTABLE
+    """
+    CREATE OR REPLACE FUNCTION immutable_unaccent(text)
+    RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+    """,
+    # Misma expresión que ClientService._SEARCH_DOCUMENT (concat_ws no es IMMUTABLE)
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_clients_search_trgm ON clients USING gin (
+        immutable_unaccent(lower(coalesce(name, '') || ' ' || coalesce(cedula, '') || ' ' ||
+                                 coalesce(phone, '') || ' ' || coalesce(email, ''))) gin_trgm_ops
+    )
+    """,
+    # Ruta rápida de términos numéricos: LIKE 'prefijo%' con btree independiente de la collation
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_clients_cedula_prefix ON clients (cedula text_pattern_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_clients_phone_prefix ON clients (phone text_pattern_ops)",
+    "ANALYZE clients",
+]
+
+# Las extensiones se conservan: unaccent ya la usaban otras consultas
+DOWN = [
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_clients_phone_prefix",
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_clients_cedula_prefix",
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_clients_search_trgm",
+    "DROP FUNCTION IF EXISTS immutable_unaccent(text)",
+]
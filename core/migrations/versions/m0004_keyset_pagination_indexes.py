@@ -0,0 +1,29 @@
+"""Índices con la clave de orden completa (incluido el id) de los listados paginados por keyset"""
+
+VERSION = 4
+DESCRIPTION = "Índices de paginación por clave: clientes por nombre, citas por fecha/hora y presupuestos por fecha"
+
+# Índices sobre tablas en uso: CONCURRENTLY no bloquea las escrituras mientras se
+# construyen, pero no puede ejecutarse dentro de una transacción (ver MigrationRunner)
+TRANSACTIONAL = False
+
+UP = [
+    # ClientService.get_clients_page
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_clients_name_id ON clients (name, id)",
+    # AppointmentService.get_appointments_page (se recorre hacia atrás para el orden descendente).
+    # date y time admiten nulos: la página ordena y compara por estas mismas expresiones
+    # (ver APPOINTMENT_KEYSET_NULLS), no por las columnas
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_appointments_keyset "
+    "ON appointments ((COALESCE(date, 'infinity'::date)), (COALESCE(time, '24:00'::time)), id)",
+    # QuoteService.get_quotes_page
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_quotes_quote_date_id ON quotes (quote_date, id)",
+    "ANALYZE clients",
+    "ANALYZE appointments",
+    "ANALYZE quotes",
+]
+
+DOWN = [
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_quotes_quote_date_id",
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_appointments_keyset",
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_clients_name_id",
+]
@@ -0,0 +1,22 @@
+"""Función count_estimate: total aproximado de una consulta a partir del plan, sin ejecutarla"""
+
+VERSION = 5
+DESCRIPTION = "Función count_estimate para los totales estimados de los listados"
+
+UP = [
+    """
+    CREATE OR REPLACE FUNCTION count_estimate(query text) RETURNS bigint
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        plan json;
+    BEGIN
+        EXECUTE 'EXPLAIN (FORMAT JSON) ' || query INTO plan;
+        RETURN (plan -> 0 -> 'Plan' ->> 'Plan Rows')::bigint;
+    END
+    $$
+    """,
+]
+
+DOWN = [
+    "DROP FUNCTION IF EXISTS count_estimate(text)",
+]
@@ -0,0 +1,264 @@
+"""
+Tablas de agregados diarios (daily_metrics y daily_payment_metrics) mantenidas por triggers.
+
+Cada fila de origen aporta una contribución a uno o más días; los triggers restan la
+contribución de OLD y suman la de NEW, de modo que el agregado siempre coincide con
+recalcularlo desde cero (daily_metrics_backfill, que también se usa para repararlo).
+
+- appointments: citas por estado, en su fecha
+- clients: clientes nuevos, en DATE(created_at)
+- debts: deudas creadas (cantidad y monto) en DATE(created_at) y monto pagado
+  (paid_amount) en DATE(COALESCE(paid_at, created_at)); no en updated_at, que
+  movería todo lo pagado al día de cualquier edición posterior de la deuda
+- payments: cantidad y monto por método y estado, en DATE(payment_date)
+"""
+
+VERSION = 6
+DESCRIPTION = "Agregados diarios de citas, clientes, deudas y pagos (daily_metrics)"
+
+UP = [
+    """
+    CREATE TABLE IF NOT EXISTS daily_metrics (
+        day date PRIMARY KEY,
+        appointments_pending integer DEFAULT 0 NOT NULL,
+        appointments_completed integer DEFAULT 0 NOT NULL,
+        appointments_cancelled integer DEFAULT 0 NOT NULL,
+        new_clients integer DEFAULT 0 NOT NULL,
+        debts_created integer DEFAULT 0 NOT NULL,
+        debt_created_amount numeric(14,2) DEFAULT 0 NOT NULL,
+        debt_paid_amount numeric(14,2) DEFAULT 0 NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS daily_payment_metrics (
+        day date NOT NULL,
+        method character varying(50) NOT NULL,
+        status character varying(20) NOT NULL,
+        payment_count integer DEFAULT 0 NOT NULL,
+        amount numeric(14,2) DEFAULT 0 NOT NULL,
+        PRIMARY KEY (day, method, status)
+    )
+    """,
+    """
+    CREATE OR REPLACE FUNCTION daily_metrics_add(
+        p_day date,
+        p_pending integer DEFAULT 0,
+        p_completed integer DEFAULT 0,
+        p_cancelled integer DEFAULT 0,
+        p_new_clients integer DEFAULT 0,
+        p_debts_created integer DEFAULT 0,
+        p_debt_created_amount numeric DEFAULT 0,
+        p_debt_paid_amount numeric DEFAULT 0
+    ) RETURNS void
+    LANGUAGE sql AS $$
+        INSERT INTO daily_metrics AS m (
+            day, appointments_pending, appointments_completed, appointments_cancelled,
+            new_clients, debts_created, debt_created_amount, debt_paid_amount
+        )
+        VALUES (
+            p_day, p_pending, p_completed, p_cancelled,
+            p_new_clients, p_debts_created, p_debt_created_amount, p_debt_paid_amount
+        )
+        ON CONFLICT (day) DO UPDATE SET
+            appointments_pending = m.appointments_pending + EXCLUDED.appointments_pending,
+            appointments_completed = m.appointments_completed + EXCLUDED.appointments_completed,
+            appointments_cancelled = m.appointments_cancelled + EXCLUDED.appointments_cancelled,
+            new_clients = m.new_clients + EXCLUDED.new_clients,
+            debts_created = m.debts_created + EXCLUDED.debts_created,
+            debt_created_amount = m.debt_created_amount + EXCLUDED.debt_created_amount,
+            debt_paid_amount = m.debt_paid_amount + EXCLUDED.debt_paid_amount
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION daily_payment_metrics_add(
+        p_day date, p_method text, p_status text, p_count integer, p_amount numeric
+    ) RETURNS void
+    LANGUAGE sql AS $$
+        INSERT INTO daily_payment_metrics AS m (day, method, status, payment_count, amount)
+        VALUES (p_day, p_method, p_status, p_count, p_amount)
+        ON CONFLICT (day, method, status) DO UPDATE SET
+            payment_count = m.payment_count + EXCLUDED.payment_count,
+            amount = m.amount + EXCLUDED.amount
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION daily_metrics_appointments() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.date IS NOT NULL THEN
+            PERFORM daily_metrics_add(
+                OLD.date,
+                p_pending => -(OLD.status = 'pending')::integer,
+                p_completed => -(OLD.status = 'completed')::integer,
+                p_cancelled => -(OLD.status = 'cancelled')::integer
+            );
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.date IS NOT NULL THEN
+            PERFORM daily_metrics_add(
+                NEW.date,
+                p_pending => (NEW.status = 'pending')::integer,
+                p_completed => (NEW.status = 'completed')::integer,
+                p_cancelled => (NEW.status = 'cancelled')::integer
+            );
+        END IF;
+        RETURN NULL;
+    END
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION daily_metrics_clients() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM daily_metrics_add(DATE(OLD.created_at), p_new_clients => -1);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM daily_metrics_add(DATE(NEW.created_at), p_new_clients => 1);
+        END IF;
+        RETURN NULL;
+    END
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION daily_metrics_debts() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM daily_metrics_add(
+                DATE(OLD.created_at), p_debts_created => -1, p_debt_created_amount => -OLD.amount
+            );
+            IF COALESCE(OLD.paid_amount, 0) <> 0 THEN
+                PERFORM daily_metrics_add(
+                    DATE(COALESCE(OLD.paid_at, OLD.created_at)), p_debt_paid_amount => -OLD.paid_amount
+                );
+            END IF;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM daily_metrics_add(
+                DATE(NEW.created_at), p_debts_created => 1, p_debt_created_amount => NEW.amount
+            );
+            IF COALESCE(NEW.paid_amount, 0) <> 0 THEN
+                PERFORM daily_metrics_add(
+                    DATE(COALESCE(NEW.paid_at, NEW.created_at)), p_debt_paid_amount => NEW.paid_amount
+                );
+            END IF;
+        END IF;
+        RETURN NULL;
+    END
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION daily_metrics_payments() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM daily_payment_metrics_add(DATE(OLD.payment_date), OLD.method, OLD.status, -1, -OLD.amount);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM daily_payment_metrics_add(DATE(NEW.payment_date), NEW.method, NEW.status, 1, NEW.amount);
+        END IF;
+        RETURN NULL;
+    END
+    $$
+    """,
+    # Solo se disparan cuando cambian las columnas que forman la contribución
+    "DROP TRIGGER IF EXISTS trg_daily_metrics ON appointments",
+    """
+    CREATE TRIGGER trg_daily_metrics
+    AFTER INSERT OR DELETE OR UPDATE OF date, status ON appointments
+    FOR EACH ROW EXECUTE FUNCTION daily_metrics_appointments()
+    """,
+    "DROP TRIGGER IF EXISTS trg_daily_metrics ON clients",
+    """
+    CREATE TRIGGER trg_daily_metrics
+    AFTER INSERT OR DELETE OR UPDATE OF created_at ON clients
+    FOR EACH ROW EXECUTE FUNCTION daily_metrics_clients()
+    """,
+    "DROP TRIGGER IF EXISTS trg_daily_metrics ON debts",
+    """
+    CREATE TRIGGER trg_daily_metrics
+    AFTER INSERT OR DELETE OR UPDATE OF amount, paid_amount, paid_at, created_at ON debts
+    FOR EACH ROW EXECUTE FUNCTION daily_metrics_debts()
+    """,
+    "DROP TRIGGER IF EXISTS trg_daily_metrics ON payments",
+    """
+    CREATE TRIGGER trg_daily_metrics
+    AFTER INSERT OR DELETE OR UPDATE OF payment_date, method, status, amount ON payments
+    FOR EACH ROW EXECUTE FUNCTION daily_metrics_payments()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION daily_metrics_backfill(p_from date DEFAULT NULL, p_to date DEFAULT NULL)
+    RETURNS integer
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        lo date := COALESCE(p_from, '-infinity'::date);
+        hi date := COALESCE(p_to, 'infinity'::date);
+        days integer;
+    BEGIN
+        -- Bloquea los triggers mientras se recalcula para no perder ni duplicar contribuciones
+        LOCK TABLE daily_metrics, daily_payment_metrics IN EXCLUSIVE MODE;
+        DELETE FROM daily_metrics WHERE day BETWEEN lo AND hi;
+        DELETE FROM daily_payment_metrics WHERE day BETWEEN lo AND hi;
+
+        INSERT INTO daily_metrics (
+            day, appointments_pending, appointments_completed, appointments_cancelled,
+            new_clients, debts_created, debt_created_amount, debt_paid_amount
+        )
+        SELECT day, SUM(pending), SUM(completed), SUM(cancelled),
+               SUM(new_clients), SUM(debts_created), SUM(debt_created_amount), SUM(debt_paid_amount)
+        FROM (
+            SELECT date AS day,
+                   (status = 'pending')::integer AS pending,
+                   (status = 'completed')::integer AS completed,
+                   (status = 'cancelled')::integer AS cancelled,
+                   0 AS new_clients, 0 AS debts_created,
+                   0::numeric AS debt_created_amount, 0::numeric AS debt_paid_amount
+            FROM appointments
+            WHERE date BETWEEN lo AND hi
+            UNION ALL
+            SELECT DATE(created_at), 0, 0, 0, 1, 0, 0, 0
+            FROM clients
+            WHERE DATE(created_at) BETWEEN lo AND hi
+            UNION ALL
+            SELECT DATE(created_at), 0, 0, 0, 0, 1, amount, 0
+            FROM debts
+            WHERE DATE(created_at) BETWEEN lo AND hi
+            UNION ALL
+            SELECT DATE(COALESCE(paid_at, created_at)), 0, 0, 0, 0, 0, 0, paid_amount
+            FROM debts
+            WHERE COALESCE(paid_amount, 0) <> 0
+            AND DATE(COALESCE(paid_at, created_at)) BETWEEN lo AND hi
+        ) contributions
+        GROUP BY day;
+        GET DIAGNOSTICS days = ROW_COUNT;
+
+        INSERT INTO daily_payment_metrics (day, method, status, payment_count, amount)
+        SELECT DATE(payment_date), method, status, COUNT(*), SUM(amount)
+        FROM payments
+        WHERE DATE(payment_date) BETWEEN lo AND hi
+        GROUP BY DATE(payment_date), method, status;
+
+        RETURN days;
+    END
+    $$
+    """,
+    "SELECT daily_metrics_backfill()",
+    "ANALYZE daily_metrics",
+    "ANALYZE daily_payment_metrics",
+]
+
+DOWN = [
+    "DROP TRIGGER IF EXISTS trg_daily_metrics ON payments",
+    "DROP TRIGGER IF EXISTS trg_daily_metrics ON debts",
+    "DROP TRIGGER IF EXISTS trg_daily_metrics ON clients",
+    "DROP TRIGGER IF EXISTS trg_daily_metrics ON appointments",
+    "DROP FUNCTION IF EXISTS daily_metrics_backfill(date, date)",
+    "DROP FUNCTION IF EXISTS daily_metrics_payments()",
+    "DROP FUNCTION IF EXISTS daily_metrics_debts()",
+    "DROP FUNCTION IF EXISTS daily_metrics_clients()",
+    "DROP FUNCTION IF EXISTS daily_metrics_appointments()",
+    "DROP FUNCTION IF EXISTS daily_payment_metrics_add(date, text, text, integer, numeric)",
+    "DROP FUNCTION IF EXISTS daily_metrics_add(date, integer, integer, integer, integer, integer, numeric, numeric)",
+    "DROP TABLE IF EXISTS daily_payment_metrics",
+    "DROP TABLE IF EXISTS daily_metrics",
+]
@@ -0,0 +1,132 @@
+"""
+Instantáneas de reportes de periodos cerrados (report_snapshots).
+
+Para detectar ediciones tardías, los agregados diarios registran en updated_at la
+hora de inicio de la transacción que los modificó por última vez. Una instantánea
+queda obsoleta si algún día de su periodo tiene un updated_at posterior a su
+computed_at. El trigger de deudas pasa a dispararse también con cambios de estado
+o de vencimiento, que alteran los montos pendientes y vencidos de los reportes.
+"""
+
+VERSION = 7
+DESCRIPTION = "Instantáneas de reportes de periodos cerrados y marca de modificación de los agregados diarios"
+
+UP = [
+    "ALTER TABLE daily_metrics ADD COLUMN IF NOT EXISTS updated_at timestamp without time zone DEFAULT now() NOT NULL",
+    "ALTER TABLE daily_payment_metrics ADD COLUMN IF NOT EXISTS updated_at timestamp without time zone DEFAULT now() NOT NULL",
+    """
+    CREATE OR REPLACE FUNCTION daily_metrics_add(
+        p_day date,
+        p_pending integer DEFAULT 0,
+        p_completed integer DEFAULT 0,
+        p_cancelled integer DEFAULT 0,
+        p_new_clients integer DEFAULT 0,
+        p_debts_created integer DEFAULT 0,
+        p_debt_created_amount numeric DEFAULT 0,
+        p_debt_paid_amount numeric DEFAULT 0
+    ) RETURNS void
+    LANGUAGE sql AS $$
+        INSERT INTO daily_metrics AS m (
+            day, appointments_pending, appointments_completed, appointments_cancelled,
+            new_clients, debts_created, debt_created_amount, debt_paid_amount, updated_at
+        )
+        VALUES (
+            p_day, p_pending, p_completed, p_cancelled,
+            p_new_clients, p_debts_created, p_debt_created_amount, p_debt_paid_amount, now()
+        )
+        ON CONFLICT (day) DO UPDATE SET
+            appointments_pending = m.appointments_pending + EXCLUDED.appointments_pending,
+            appointments_completed = m.appointments_completed + EXCLUDED.appointments_completed,
+            appointments_cancelled = m.appointments_cancelled + EXCLUDED.appointments_cancelled,
+            new_clients = m.new_clients + EXCLUDED.new_clients,
+            debts_created = m.debts_created + EXCLUDED.debts_created,
+            debt_created_amount = m.debt_created_amount + EXCLUDED.debt_created_amount,
+            debt_paid_amount = m.debt_paid_amount + EXCLUDED.debt_paid_amount,
+            updated_at = now()
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION daily_payment_metrics_add(
+        p_day date, p_method text, p_status text, p_count integer, p_amount numeric
+    ) RETURNS void
+    LANGUAGE sql AS $$
+        INSERT INTO daily_payment_metrics AS m (day, method, status, payment_count, amount, updated_at)
+        VALUES (p_day, p_method, p_status, p_count, p_amount, now())
+        ON CONFLICT (day, method, status) DO UPDATE SET
+            payment_count = m.payment_count + EXCLUDED.payment_count,
+            amount = m.amount + EXCLUDED.amount,
+            updated_at = now()
+    $$
+    """,
+    "DROP TRIGGER IF EXISTS trg_daily_metrics ON debts",
+    """
+    CREATE TRIGGER trg_daily_metrics
+    AFTER INSERT OR DELETE OR UPDATE OF amount, paid_amount, paid_at, created_at, status, due_date ON debts
+    FOR EACH ROW EXECUTE FUNCTION daily_metrics_debts()
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS report_snapshots (
+        report_type character varying(50) NOT NULL,
+        period_start date NOT NULL,
+        period_end date NOT NULL,
+        data jsonb NOT NULL,
+        computed_at timestamp without time zone NOT NULL,
+        valid_until date,
+        PRIMARY KEY (report_type, period_start, period_end)
+    )
+    """,
+]
+
+DOWN = [
+    "DROP TABLE IF EXISTS report_snapshots",
+    "DROP TRIGGER IF EXISTS trg_daily_metrics ON debts",
+    """
+    CREATE TRIGGER trg_daily_metrics
+    AFTER INSERT OR DELETE OR UPDATE OF amount, paid_amount, paid_at, created_at ON debts
+    FOR EACH ROW EXECUTE FUNCTION daily_metrics_debts()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION daily_payment_metrics_add(
+        p_day date, p_method text, p_status text, p_count integer, p_amount numeric
+    ) RETURNS void
+    LANGUAGE sql AS $$
+        INSERT INTO daily_payment_metrics AS m (day, method, status, payment_count, amount)
+        VALUES (p_day, p_method, p_status, p_count, p_amount)
+        ON CONFLICT (day, method, status) DO UPDATE SET
+            payment_count = m.payment_count + EXCLUDED.payment_count,
+            amount = m.amount + EXCLUDED.amount
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION daily_metrics_add(
+        p_day date,
+        p_pending integer DEFAULT 0,
+        p_completed integer DEFAULT 0,
+        p_cancelled integer DEFAULT 0,
+        p_new_clients integer DEFAULT 0,
+        p_debts_created integer DEFAULT 0,
+        p_debt_created_amount numeric DEFAULT 0,
+        p_debt_paid_amount numeric DEFAULT 0
+    ) RETURNS void
+    LANGUAGE sql AS $$
+        INSERT INTO daily_metrics AS m (
+            day, appointments_pending, appointments_completed, appointments_cancelled,
+            new_clients, debts_created, debt_created_amount, debt_paid_amount
+        )
+        VALUES (
+            p_day, p_pending, p_completed, p_cancelled,
+            p_new_clients, p_debts_created, p_debt_created_amount, p_debt_paid_amount
+        )
+        ON CONFLICT (day) DO UPDATE SET
+            appointments_pending = m.appointments_pending + EXCLUDED.appointments_pending,
+            appointments_completed = m.appointments_completed + EXCLUDED.appointments_completed,
+            appointments_cancelled = m.appointments_cancelled + EXCLUDED.appointments_cancelled,
+            new_clients = m.new_clients + EXCLUDED.new_clients,
+            debts_created = m.debts_created + EXCLUDED.debts_created,
+            debt_created_amount = m.debt_created_amount + EXCLUDED.debt_created_amount,
+            debt_paid_amount = m.debt_paid_amount + EXCLUDED.debt_paid_amount
+    $$
+    """,
+    "ALTER TABLE daily_payment_metrics DROP COLUMN IF EXISTS updated_at",
+    "ALTER TABLE daily_metrics DROP COLUMN IF EXISTS updated_at",
+]
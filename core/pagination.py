@@ -0,0 +1,323 @@
+"""
+Paginación por clave (keyset) para los listados.
+
+En lugar de LIMIT/OFFSET, cada página se pide a partir de la clave de orden
+(más el id) de la última fila de la página anterior, de modo que la página N
+cuesta lo mismo que la primera. La clave viaja en un cursor opaco (base64)
+que la vista solo guarda y devuelve.
+
+fetch_page trae además, en la misma sentencia, el total de filas del listado:
+exacto (COUNT) o estimado por el planificador (count_estimate, migración 5).
+
+Una comparación con NULL no es verdadera ni falsa: una clave que admite nulos se
+ordena y compara por un sustituto (`null_keys`), si no las filas con la clave
+nula desaparecerían al paginar.
+"""
+import base64
+import json
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Callable, Mapping, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+AFTER = "after"
+BEFORE = "before"
+
+# Modos de total de fetch_page
+EXACT = "exact"
+ESTIMATED = "estimated"
+
+# None hasta comprobar si la base tiene la función count_estimate
+_count_estimate_available = None
+
+
+def _encode_value(value):
+    # json no serializa fechas ni Decimal: se etiquetan para reconstruir el tipo exacto
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    if isinstance(value, time):
+        return {"t": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"n": str(value)}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        if "t" in value:
+            return time.fromisoformat(value["t"])
+        if "n" in value:
+            return Decimal(value["n"])
+    return value
+
+
+def encode_cursor(values: Sequence, direction: str = AFTER) -> str:
+    """Cursor opaco con la clave de orden de una fila y el sentido en que se continúa"""
+    payload = json.dumps(
+        {"dir": direction, "key": [_encode_value(v) for v in values]},
+        separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[str, list]:
+    """Retorna (sentido, clave) de un cursor; ValueError si no es válido"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        direction = payload["dir"]
+        if direction not in (AFTER, BEFORE):
+            raise ValueError(direction)
+        return direction, [_decode_value(v) for v in payload["key"]]
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Cursor de paginación inválido: {token!r}") from e
+
+
+@dataclass
+class Page:
+    """Una página de resultados y los cursores para pedir la siguiente y la anterior"""
+    items: list
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+    # Total de filas del listado (None si no se pidió) y si es una estimación del planificador
+    total: Optional[int] = None
+    total_is_estimate: bool = False
+
+
+@dataclass
+class KeysetQuery:
+    sql: str
+    params: list
+    direction: str
+    has_cursor: bool
+    # Orden en que la consulta devuelve las filas (para reordenar en consultas externas)
+    order_by: str
+
+
+def keyset_query(
+    base_query: str,
+    params: Sequence,
+    sort_keys: Sequence[str],
+    limit: int,
+    cursor: Optional[str] = None,
+    descending: bool = False,
+    from_end: bool = False,
+    total_sql: Optional[str] = None,
+    total_params: Sequence = (),
+    extra_columns: str = "",
+    extra_joins: str = "",
+    null_keys: Optional[Mapping[str, str]] = None
+) -> KeysetQuery:
+    """
+    Envuelve `base_query` (un SELECT que expone las columnas `sort_keys`, la última
+    única, normalmente id) para traer `limit` filas a partir de `cursor`.
+    Todas las claves se ordenan en el mismo sentido (`descending`).
+    Sin cursor trae la primera página, o la última si `from_end` es True.
+    Se pide una fila de más para saber si hay otra página.
+
+    - `total_sql`: expresión escalar (con `total_params`) que se agrega como columna
+      keyset_total; la página se une con LEFT JOIN para que el total llegue aunque esté vacía.
+    - `extra_columns`/`extra_joins`: columnas y joins (p. ej. LATERAL) que se calculan solo
+      para las filas de la página, referidas a ella como `keyset_page`.
+    - `null_keys`: clave que admite nulos -> expresión SQL que la reemplaza en el orden y
+      en la comparación con el cursor (p. ej. 'infinity'::date, que ordena los nulos
+      después de todo valor, igual que el orden por defecto de Postgres).
+    """
+    null_keys = null_keys or {}
+
+    def key_sql(key: str, table: str = "") -> str:
+        if key in null_keys:
+            return f"COALESCE({table}{key}, {null_keys[key]})"
+        return f"{table}{key}"
+
+    if cursor:
+        direction, values = decode_cursor(cursor)
+        if len(values) != len(sort_keys):
+            raise ValueError(f"Cursor de paginación inválido: {cursor!r}")
+    else:
+        direction, values = (BEFORE if from_end else AFTER), None
+
+    # Hacia atrás se recorre en el sentido inverso y luego se invierten las filas
+    scan_descending = descending != (direction == BEFORE)
+    keys = ", ".join(key_sql(key) for key in sort_keys)
+    page_sql = f"SELECT * FROM ({base_query}) AS keyset_rows"
+    page_params = list(params)
+    if values is not None:
+        operator = "<" if scan_descending else ">"
+        placeholders = ", ".join(
+            f"COALESCE(%s, {null_keys[key]})" if key in null_keys else "%s" for key in sort_keys
+        )
+        page_sql += f" WHERE ({keys}) {operator} ({placeholders})"
+        page_params.extend(values)
+
+    suffix = " DESC" if scan_descending else " ASC"
+    order_by = ", ".join(f"{key_sql(key)}{suffix}" for key in sort_keys)
+    page_sql += f" ORDER BY {order_by} LIMIT %s"
+    page_params.append(limit + 1)
+
+    if not total_sql and not extra_columns and not extra_joins:
+        return KeysetQuery(page_sql, page_params, direction, values is not None, order_by)
+
+    outer_order_by = ", ".join(f"{key_sql(key, 'keyset_page.')}{suffix}" for key in sort_keys)
+    if total_sql:
+        sql = f"""
+            SELECT keyset_page.*{extra_columns}, keyset_count.total AS keyset_total
+            FROM (SELECT {total_sql} AS total) AS keyset_count
+            LEFT JOIN LATERAL ({page_sql}) AS keyset_page ON true
+            {extra_joins}
+            ORDER BY {outer_order_by}
+        """
+        query_params = list(total_params) + page_params
+    else:
+        sql = f"""
+            SELECT keyset_page.*{extra_columns}
+            FROM ({page_sql}) AS keyset_page
+            {extra_joins}
+            ORDER BY {outer_order_by}
+        """
+        query_params = page_params
+    return KeysetQuery(sql, query_params, direction, values is not None, outer_order_by)
+
+
+def build_page(rows: list, limit: int, key_of: Callable, query: KeysetQuery) -> Page:
+    """Recorta las filas de keyset_query a `limit`, las deja en orden natural y genera los cursores"""
+    has_more = len(rows) > limit
+    rows = list(rows[:limit])
+    if query.direction == BEFORE:
+        rows.reverse()
+        has_prev, has_next = has_more, query.has_cursor
+    else:
+        has_prev, has_next = query.has_cursor, has_more
+
+    return Page(
+        items=rows,
+        next_cursor=encode_cursor(key_of(rows[-1]), AFTER) if rows and has_next else None,
+        prev_cursor=encode_cursor(key_of(rows[0]), BEFORE) if rows and has_prev else None
+    )
+
+
+def _count_estimate_ready(db_cursor) -> bool:
+    """Indica (una vez por proceso) si la base tiene la función count_estimate"""
+    global _count_estimate_available
+    if _count_estimate_available is None:
+        db_cursor.execute("SELECT to_regprocedure('count_estimate(text)') IS NOT NULL")
+        _count_estimate_available = bool(db_cursor.fetchone()[0])
+        if not _count_estimate_available:
+            logger.warning("count_estimate no disponible (python -m core.migrations upgrade); se usan totales exactos")
+    return _count_estimate_available
+
+
+def fetch_page(
+    db_cursor,
+    base_query: str,
+    params: Sequence,
+    sort_keys: Sequence[str],
+    limit: int,
+    key_of: Callable,
+    cursor: Optional[str] = None,
+    descending: bool = False,
+    from_end: bool = False,
+    total: Optional[str] = None,
+    extra_columns: str = "",
+    extra_joins: str = "",
+    as_dict: bool = False,
+    null_keys: Optional[Mapping[str, str]] = None
+) -> Page:
+    """
+    Ejecuta en una sola sentencia la página de keyset_query y, si `total` es EXACT o
+    ESTIMATED, el total de filas de `base_query` (sin la columna keyset_total en los items).
+    `key_of` recibe cada fila (tupla, o diccionario con `as_dict`) y retorna su clave de orden.
+    """
+    total_sql, total_params, estimated = None, (), False
+    if total == ESTIMATED and _count_estimate_ready(db_cursor):
+        # El planificador estima sobre el texto final de la consulta, con los valores ya escapados
+        rendered = db_cursor.mogrify(base_query, list(params))
+        if isinstance(rendered, bytes):
+            rendered = rendered.decode("utf-8")
+        total_sql, total_params, estimated = "count_estimate(%s)", (rendered,), True
+    elif total in (EXACT, ESTIMATED):
+        total_sql, total_params = _exact_total_sql(base_query), params
+
+    query = keyset_query(
+        base_query, params, sort_keys, limit, cursor=cursor, descending=descending, from_end=from_end,
+        total_sql=total_sql, total_params=total_params, extra_columns=extra_columns, extra_joins=extra_joins,
+        null_keys=null_keys
+    )
+    db_cursor.execute(query.sql, query.params)
+    columns = [desc[0] for desc in db_cursor.description or ()]
+    rows = db_cursor.fetchall()
+    page = _page_from_rows(rows, columns, sort_keys, limit, key_of, query, total_sql is not None, as_dict)
+    page.total_is_estimate = estimated
+    return page
+
+
+async def fetch_page_async(
+    db_cursor,
+    base_query: str,
+    params: Sequence,
+    sort_keys: Sequence[str],
+    limit: int,
+    key_of: Callable,
+    cursor: Optional[str] = None,
+    descending: bool = False,
+    from_end: bool = False,
+    total: Optional[str] = None,
+    extra_columns: str = "",
+    extra_joins: str = "",
+    as_dict: bool = False,
+    null_keys: Optional[Mapping[str, str]] = None
+) -> Page:
+    """
+    fetch_page sobre un cursor asíncrono (core.database.AsyncCursor). asyncpg no puede
+    convertir la consulta con sus valores en el texto que recibe count_estimate, así
+    que ESTIMATED se resuelve con el total exacto.
+    """
+    total_sql, total_params = None, ()
+    if total in (EXACT, ESTIMATED):
+        total_sql, total_params = _exact_total_sql(base_query), params
+
+    query = keyset_query(
+        base_query, params, sort_keys, limit, cursor=cursor, descending=descending, from_end=from_end,
+        total_sql=total_sql, total_params=total_params, extra_columns=extra_columns, extra_joins=extra_joins,
+        null_keys=null_keys
+    )
+    await db_cursor.execute(query.sql, query.params)
+    columns = [desc[0] for desc in db_cursor.description or ()]
+    # Los Record de asyncpg se pasan a tuplas, como las filas de psycopg2
+    rows = [tuple(row) for row in await db_cursor.fetchall()]
+    return _page_from_rows(rows, columns, sort_keys, limit, key_of, query, total_sql is not None, as_dict)
+
+
+def _exact_total_sql(base_query: str) -> str:
+    return f"(SELECT COUNT(*) FROM ({base_query}) AS keyset_count_rows)"
+
+
+def _page_from_rows(rows: list, columns: list, sort_keys: Sequence[str], limit: int, key_of: Callable,
+                    query: KeysetQuery, with_total: bool, as_dict: bool) -> Page:
+    """Separa la columna keyset_total de las filas de la página y arma la Page"""
+    total_count = None
+    if with_total:
+        total_index = columns.index("keyset_total")
+        key_index = columns.index(sort_keys[-1])
+        total_count = int(rows[0][total_index] or 0) if rows else 0
+        del columns[total_index]
+        # Con la página vacía, el LEFT JOIN deja una única fila sin datos (id nulo)
+        rows = [
+            row[:total_index] + row[total_index + 1:]
+            for row in rows if row[key_index] is not None
+        ]
+    if as_dict:
+        rows = [dict(zip(columns, row)) for row in rows]
+
+    page = build_page(rows, limit, key_of, query)
+    page.total = total_count
+    return page
@@ -0,0 +1,258 @@
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from psycopg2 import extensions
+
+logger = logging.getLogger(__name__)
+# Logger dedicado para poder enviar las consultas lentas a su propio archivo/handler
+slow_query_logger = logging.getLogger("core.database.slow_queries")
+
+# Normalización de SQL: literales y parámetros se sustituyen por "?" para que
+# todas las ejecuciones de la misma consulta compartan una huella
+_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_PARAM_RE = re.compile(r"%\(\w+\)s|%s|\$\d+")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Directorios cuyo código se considera "llamador" al atribuir una consulta
+_CALLER_DIRS = tuple(os.sep + d + os.sep for d in ("services", "views"))
+
+
+def fingerprint(query) -> str:
+    """Devuelve la huella normalizada de una consulta SQL"""
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", errors="replace")
+    elif not isinstance(query, str):
+        # psycopg2.sql.Composed u otros objetos: usar su representación
+        query = str(query)
+    normalized = _COMMENT_RE.sub(" ", query)
+    normalized = _STRING_RE.sub("?", normalized)
+    normalized = _PARAM_RE.sub("?", normalized)
+    normalized = _NUMBER_RE.sub("?", normalized)
+    normalized = _IN_LIST_RE.sub("(...)", normalized)
+    return _WHITESPACE_RE.sub(" ", normalized).strip().rstrip(";").strip()
+
+
+def _find_caller() -> str:
+    """Identifica el método de servicio/vista que originó la consulta"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if any(d in filename for d in _CALLER_DIRS):
+            name = getattr(frame.f_code, "co_qualname", frame.f_code.co_name)
+            return f"{os.path.splitext(os.path.basename(filename))[0]}.{name}"
+        frame = frame.f_back
+    return "<desconocido>"
+
+
+def _percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class _FingerprintStats:
+    # Cantidad de duraciones recientes que se conservan para calcular percentiles
+    SAMPLE_SIZE = 1000
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.callers = {}
+        self.samples = deque(maxlen=self.SAMPLE_SIZE)
+
+
+class QueryStats:
+    """Agregado en memoria de tiempos de ejecución por huella de consulta"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, query_fingerprint: str, duration_ms: float, rowcount: int, caller: str):
+        with self._lock:
+            stats = self._stats.get(query_fingerprint)
+            if stats is None:
+                stats = self._stats[query_fingerprint] = _FingerprintStats()
+            stats.calls += 1
+            stats.total_ms += duration_ms
+            stats.max_ms = max(stats.max_ms, duration_ms)
+            stats.rows += max(rowcount, 0)
+            stats.callers[caller] = stats.callers.get(caller, 0) + 1
+            stats.samples.append(duration_ms)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def summary(self, limit: int = None) -> list:
+        """Lista de huellas ordenada por tiempo total acumulado (las que más pesan primero)"""
+        with self._lock:
+            items = [(fp, s, sorted(s.samples)) for fp, s in self._stats.items()]
+        report = [
+            {
+                'fingerprint': fp,
+                'calls': s.calls,
+                'total_ms': s.total_ms,
+                'avg_ms': s.total_ms / s.calls,
+                'p50_ms': _percentile(samples, 50),
+                'p95_ms': _percentile(samples, 95),
+                'p99_ms': _percentile(samples, 99),
+                'max_ms': s.max_ms,
+                'avg_rows': s.rows / s.calls,
+                'callers': dict(sorted(s.callers.items(), key=lambda kv: kv[1], reverse=True))
+            }
+            for fp, s, samples in items
+        ]
+        report.sort(key=lambda r: r['total_ms'], reverse=True)
+        return report[:limit] if limit else report
+
+
+# Registro global del proceso y configuración del log de consultas lentas
+query_stats = QueryStats()
+slow_query_config = {
+    'threshold_ms': 500.0,
+    'explain': False
+}
+
+
+# Sentencias que modifican datos (se usa para el enrutamiento read-your-writes). Las
+# escrituras hechas dentro de una función no se ven en el texto: las funciones de las
+# migraciones que escriben se listan aquí; para otras, Database.note_write(cursor)
+_WRITE_FUNCTIONS = ("daily_metrics_backfill",)
+_WRITE_RE = re.compile(
+    r"\b(?:(?:insert\s+into|update\s+\w+(?:\s+\w+)?\s+set|delete\s+from|truncate|create|alter|drop)\b"
+    + "".join(rf"|{name}\s*\(" for name in _WRITE_FUNCTIONS)
+    + r")",
+    re.IGNORECASE
+)
+
+
+def is_write(query) -> bool:
+    """Indica si una consulta modifica datos"""
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", errors="replace")
+    return bool(_WRITE_RE.search(str(query)))
+
+
+# EXPLAIN ANALYZE ejecuta la consulta: solo se usa con un SELECT cuyas llamadas a
+# funciones sean todas de esta lista (sin efectos); con cualquier otra, EXPLAIN a secas
+_CALL_RE = re.compile(r"\b(\w+)\s*\(")
+_EXPLAIN_ANALYZE_SAFE_CALLS = frozenset((
+    # Palabras clave seguidas de paréntesis
+    "select", "from", "join", "in", "exists", "as", "on", "and", "or", "not", "any", "all",
+    "over", "filter", "lateral", "values", "using", "where", "by", "then", "else", "when",
+    # Funciones de PostgreSQL y de las migraciones sin efectos
+    "count", "sum", "avg", "min", "max", "coalesce", "nullif", "greatest", "least", "lower",
+    "upper", "trim", "length", "concat", "substring", "replace", "date", "date_trunc", "extract",
+    "to_char", "round", "abs", "cast", "age", "now", "array_agg", "string_agg", "json_agg",
+    "json_build_object", "jsonb_agg", "jsonb_build_object", "row_number", "rank", "lag", "lead",
+    "generate_series", "unaccent", "immutable_unaccent", "similarity", "word_similarity",
+    "to_regclass", "to_regprocedure", "interval", "numeric", "timestamp", "time", "varchar",
+))
+
+
+def can_explain_analyze(query) -> bool:
+    """Indica si ejecutar la consulta otra vez (EXPLAIN ANALYZE) no puede modificar nada"""
+    query_fingerprint = fingerprint(query).lower()
+    if not query_fingerprint.startswith("select") or is_write(query_fingerprint):
+        return False
+    return all(name in _EXPLAIN_ANALYZE_SAFE_CALLS for name in _CALL_RE.findall(query_fingerprint))
+
+
+class WriteTrackingCursor(extensions.cursor):
+    """Cursor que recuerda si ejecutó alguna escritura (atributo `wrote`)"""
+    wrote = False
+
+    def execute(self, query, vars=None):
+        if not self.wrote and is_write(query):
+            self.wrote = True
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        if not self.wrote and is_write(query):
+            self.wrote = True
+        return super().executemany(query, vars_list)
+
+
+class TracingCursor(WriteTrackingCursor):
+    """Cursor de psycopg2 que mide cada execute y lo registra en query_stats"""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = super().execute(query, vars)
+            failed = False
+            return result
+        finally:
+            self._trace(query, vars, (time.perf_counter() - started) * 1000, failed)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = super().executemany(query, vars_list)
+            failed = False
+            return result
+        finally:
+            self._trace(query, None, (time.perf_counter() - started) * 1000, failed)
+
+    def _trace(self, query, vars, duration_ms: float, failed: bool = False):
+        try:
+            query_fingerprint = fingerprint(query)
+            caller = _find_caller()
+            query_stats.record(query_fingerprint, duration_ms, self.rowcount, caller)
+            if duration_ms >= slow_query_config['threshold_ms']:
+                # Tras un error la transacción está abortada: no se puede pedir el plan
+                self._log_slow_query(query, vars, query_fingerprint, duration_ms, caller, explain=not failed)
+        except Exception as e:
+            # La instrumentación nunca debe romper la consulta original
+            logger.debug(f"No se pudo registrar la consulta: {str(e)}")
+
+    def _log_slow_query(self, query, vars, query_fingerprint: str, duration_ms: float, caller: str,
+                        explain: bool = True):
+        message = (
+            f"Consulta lenta ({duration_ms:.1f} ms, {self.rowcount} filas) en {caller}: {query_fingerprint}"
+        )
+        if explain and slow_query_config['explain'] and query_fingerprint.lower().startswith(("select", "with")):
+            plan = self._explain(query, vars)
+            if plan:
+                message += "\n" + plan
+        slow_query_logger.warning(message)
+
+    def _explain(self, query, vars):
+        """
+        Obtiene el plan sin afectar la transacción ni el resultado del cursor. EXPLAIN
+        (ANALYZE, BUFFERS) vuelve a ejecutar la consulta: solo se usa con SELECT sin
+        funciones con efectos y dentro de una transacción, en un savepoint que siempre se
+        deshace. En los demás casos (incluido autocommit) se pide EXPLAIN a secas.
+        """
+        conn = self.connection
+        analyze = not conn.autocommit and can_explain_analyze(query)
+        explain_cursor = conn.cursor(cursor_factory=extensions.cursor)
+        try:
+            if not analyze:
+                explain_cursor.execute(f"EXPLAIN {query}", vars)
+                return "\n".join(row[0] for row in explain_cursor.fetchall())
+            explain_cursor.execute("SAVEPOINT explain_slow_query")
+            try:
+                explain_cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {query}", vars)
+                return "\n".join(row[0] for row in explain_cursor.fetchall())
+            finally:
+                explain_cursor.execute("ROLLBACK TO SAVEPOINT explain_slow_query")
+                explain_cursor.execute("RELEASE SAVEPOINT explain_slow_query")
+        except Exception as e:
+            logger.debug(f"No se pudo obtener el plan de la consulta lenta: {str(e)}")
+            return None
+        finally:
+            explain_cursor.close()
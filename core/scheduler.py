@@ -0,0 +1,260 @@
+"""
+Planificador de tareas en segundo plano dentro del proceso de la aplicación.
+
+- Tareas por intervalo (cada N segundos, con una primera ejecución diferida), de una
+  sola ejecución tras una demora, o con una expresión tipo cron de cinco campos: minuto
+  hora día-del-mes mes día-de-la-semana (admite *, listas a,b, rangos a-b y pasos */n
+  o a-b/n; domingo = 0 o 7).
+- Las tareas se ejecutan en un grupo de hilos (SCHEDULER_WORKERS); el hilo del
+  planificador solo calcula vencimientos y despacha.
+- Una tarea nunca se solapa consigo misma: si al vencer sigue en curso, esa ejecución
+  se omite (y se cuenta).
+- stats() expone por tarea ejecuciones, fallos, omisiones, duración (última, promedio
+  y máxima), último error y próxima ejecución.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CronSchedule:
+    """Expresión cron de cinco campos (hora local)"""
+    # (mínimo, máximo) de minuto, hora, día del mes, mes y día de la semana (7 también es domingo)
+    FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression: str):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Expresión cron inválida (se esperan 5 campos): {expression!r}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse(part, low, high) for part, (low, high) in zip(parts, self.FIELDS)
+        )
+        self.weekdays = frozenset(day % 7 for day in self.weekdays)
+        # Como en cron: si se restringen día del mes y de la semana, basta con que coincida uno
+        self._any_day = parts[2] == '*'
+        self._any_weekday = parts[4] == '*'
+
+    @staticmethod
+    def _parse(field: str, low: int, high: int) -> frozenset:
+        values = set()
+        for part in field.split(','):
+            step = 1
+            if '/' in part:
+                part, step_text = part.split('/', 1)
+                step = int(step_text)
+            if part == '*':
+                start, end = low, high
+            elif '-' in part:
+                start, end = (int(value) for value in part.split('-', 1))
+            else:
+                start = int(part)
+                end = high if step > 1 else start
+            if step < 1 or start < low or end > high or start > end:
+                raise ValueError(f"Campo cron fuera de rango: {field!r}")
+            values.update(range(start, end + 1, step))
+        return frozenset(values)
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        if self._any_day:
+            return weekday_ok
+        if self._any_weekday:
+            return day_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, moment: datetime) -> datetime:
+        """Primer minuto posterior a `moment` que cumple la expresión"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Avanza por mes, día u hora completos mientras no coincidan; alcanza para varios años
+        for _ in range(100000):
+            if candidate.month not in self.months:
+                year, month = divmod(candidate.month, 12)
+                candidate = candidate.replace(year=candidate.year + year, month=month + 1, day=1, hour=0, minute=0)
+            elif not self._day_matches(candidate):
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+            elif candidate.hour not in self.hours:
+                candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"La expresión cron {self.expression!r} no tiene próximas ejecuciones")
+
+
+class _Job:
+    def __init__(self, name: str, func: Callable, next_run: datetime,
+                 interval: Optional[float] = None, cron: Optional[CronSchedule] = None):
+        self.name = name
+        self.func = func
+        # Sin intervalo ni cron la tarea se ejecuta una sola vez
+        self.interval = interval
+        self.cron = cron
+        # None: no tiene más ejecuciones
+        self.next_run: Optional[datetime] = next_run
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = None
+        self.last_started = None
+        self.last_error = None
+
+    def schedule_next(self, now: datetime):
+        if self.cron:
+            self.next_run = self.cron.next_after(now)
+        elif self.interval:
+            self.next_run = now + timedelta(seconds=self.interval)
+        else:
+            self.next_run = None
+
+    def describe(self) -> str:
+        if self.cron:
+            return self.cron.expression
+        return f"cada {self.interval:g} s" if self.interval else "una vez"
+
+
+class Scheduler:
+    def __init__(self, workers: Optional[int] = None):
+        self._workers = workers
+        self._jobs: Dict[str, _Job] = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._executor = None
+        self._stopped = False
+
+    def add_interval_job(self, name: str, func: Callable, seconds: float, first_run_in: float = 0):
+        """Ejecuta func() cada `seconds` segundos; la primera vez a los `first_run_in` segundos de iniciar"""
+        if seconds <= 0:
+            raise ValueError("El intervalo debe ser positivo")
+        self._add(_Job(name, func, datetime.now() + timedelta(seconds=first_run_in), interval=seconds))
+
+    def add_once_job(self, name: str, func: Callable, delay: float = 0):
+        """Ejecuta func() una sola vez, a los `delay` segundos (la tarea queda en stats())"""
+        self._add(_Job(name, func, datetime.now() + timedelta(seconds=delay)))
+
+    def add_cron_job(self, name: str, func: Callable, expression: str):
+        """Ejecuta func() según la expresión cron (hora local)"""
+        cron = CronSchedule(expression)
+        self._add(_Job(name, func, cron.next_after(datetime.now()), cron=cron))
+
+    def _add(self, job: _Job):
+        with self._cond:
+            if job.name in self._jobs:
+                logger.info(f"Tarea {job.name} reemplazada")
+            self._jobs[job.name] = job
+            self._cond.notify()
+
+    def remove_job(self, name: str):
+        with self._cond:
+            self._jobs.pop(name, None)
+
+    def run_now(self, name: str):
+        """Adelanta la próxima ejecución de la tarea a este momento"""
+        with self._cond:
+            self._jobs[name].next_run = datetime.now()
+            self._cond.notify()
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._workers or settings.SCHEDULER_WORKERS,
+                thread_name_prefix="scheduler-job"
+            )
+            self._thread = threading.Thread(target=self._run_loop, name="scheduler", daemon=True)
+            self._thread.start()
+        logger.info(f"Planificador iniciado con {len(self._jobs)} tareas")
+
+    def shutdown(self, wait: bool = False):
+        """Detiene el planificador; con wait=True espera a las tareas en curso"""
+        with self._cond:
+            if self._thread is None:
+                return
+            self._stopped = True
+            self._cond.notify()
+            thread, executor = self._thread, self._executor
+            self._thread = self._executor = None
+        thread.join(timeout=5)
+        executor.shutdown(wait=wait, cancel_futures=True)
+        logger.info("Planificador detenido")
+
+    def _run_loop(self):
+        with self._cond:
+            while not self._stopped:
+                now = datetime.now()
+                for job in self._jobs.values():
+                    if job.next_run is not None and job.next_run <= now:
+                        self._dispatch(job, now)
+                next_run = min(
+                    (job.next_run for job in self._jobs.values() if job.next_run is not None), default=None
+                )
+                # Se despierta al menos cada minuto por si cambia el reloj del sistema
+                timeout = 60.0 if next_run is None else min(60.0, max(0.0, (next_run - now).total_seconds()))
+                self._cond.wait(timeout)
+
+    def _dispatch(self, job: _Job, now: datetime):
+        job.schedule_next(now)
+        if job.running:
+            job.skipped += 1
+            logger.warning(f"Tarea {job.name} omitida: la ejecución anterior sigue en curso")
+            return
+        job.running = True
+        job.last_started = now
+        self._executor.submit(self._execute, job)
+
+    def _execute(self, job: _Job):
+        started = time.perf_counter()
+        error = None
+        try:
+            job.func()
+        except Exception as e:
+            error = str(e)
+            logger.error(f"Error en la tarea {job.name}: {error}")
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._cond:
+                job.running = False
+                job.runs += 1
+                job.last_ms = elapsed_ms
+                job.total_ms += elapsed_ms
+                job.max_ms = max(job.max_ms, elapsed_ms)
+                if error is not None:
+                    job.failures += 1
+                    job.last_error = error
+            logger.info(f"Tarea {job.name} terminada en {elapsed_ms:.0f} ms")
+
+    def stats(self) -> List[Dict]:
+        """Métricas por tarea (tiempos en ms)"""
+        with self._cond:
+            return [
+                {
+                    'name': job.name,
+                    'schedule': job.describe(),
+                    'running': job.running,
+                    'runs': job.runs,
+                    'failures': job.failures,
+                    'skipped': job.skipped,
+                    'last_started': job.last_started,
+                    'last_ms': job.last_ms,
+                    'avg_ms': job.total_ms / job.runs if job.runs else None,
+                    'max_ms': job.max_ms,
+                    'last_error': job.last_error,
+                    'next_run': job.next_run,
+                }
+                for job in self._jobs.values()
+            ]
+
+
+scheduler = Scheduler()
@@ -0,0 +1,176 @@
+"""
+Pipeline de arranque de la aplicación y su informe de tiempos.
+
+- Cada paso declara de qué pasos depende; los independientes corren a la vez en un
+  grupo de hilos y cada uno empieza apenas terminan sus dependencias.
+- El progreso que se informa es real: la fracción de pasos terminados.
+- Los pasos diferidos (no necesarios para mostrar el login) corren después, con
+  run_deferred(), una vez que la primera pantalla ya está dibujada.
+- StartupReport registra el inicio y la duración de cada paso y las marcas del
+  arranque (por ejemplo, login visible) en ms desde que se inició el proceso, y al
+  terminar escribe una línea JSON en el logger core.startup.timing para comparar
+  el tiempo hasta el login entre versiones.
+"""
+import json
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+timing_logger = logging.getLogger('core.startup.timing')
+
+# Referencia para todas las marcas: este módulo se importa al comienzo de main.py
+PROCESS_STARTED = time.perf_counter()
+
+
+def elapsed_ms() -> float:
+    """Milisegundos desde el inicio del proceso"""
+    return (time.perf_counter() - PROCESS_STARTED) * 1000
+
+
+class StartupReport:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.steps: Dict[str, Dict] = {}
+        self.marks: Dict[str, float] = {}
+        self._written = False
+
+    def step_started(self, name: str):
+        with self._lock:
+            self.steps[name] = {'start_ms': elapsed_ms(), 'duration_ms': None, 'error': None}
+
+    def step_finished(self, name: str, error: Optional[str] = None):
+        with self._lock:
+            step = self.steps[name]
+            step['duration_ms'] = elapsed_ms() - step['start_ms']
+            step['error'] = error
+
+    def mark(self, name: str):
+        """Registra un hito del arranque (ms desde el inicio del proceso)"""
+        with self._lock:
+            self.marks[name] = elapsed_ms()
+
+    def as_dict(self) -> Dict:
+        with self._lock:
+            return {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'version': settings.APP_VERSION,
+                'marks': {name: round(ms, 1) for name, ms in self.marks.items()},
+                'steps': {
+                    name: {
+                        'start_ms': round(step['start_ms'], 1),
+                        'duration_ms': None if step['duration_ms'] is None else round(step['duration_ms'], 1),
+                        'error': step['error'],
+                    }
+                    for name, step in self.steps.items()
+                },
+            }
+
+    def write(self):
+        """Escribe el informe una sola vez (una línea JSON por arranque)"""
+        with self._lock:
+            if self._written:
+                return
+            self._written = True
+        report = self.as_dict()
+        timing_logger.info(json.dumps(report, ensure_ascii=False))
+        summary = ", ".join(
+            f"{name} {step['duration_ms']} ms" for name, step in report['steps'].items()
+        )
+        logger.info(f"Arranque: {report['marks']} | pasos: {summary}")
+
+
+class _Step:
+    def __init__(self, name: str, func: Callable, requires: Iterable[str], label: str, deferred: bool):
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.label = label
+        self.deferred = deferred
+
+
+class StartupPipeline:
+    def __init__(self, report: Optional[StartupReport] = None, workers: Optional[int] = None):
+        self.report = report or StartupReport()
+        self._workers = workers or settings.STARTUP_WORKERS
+        self._steps: Dict[str, _Step] = {}
+
+    def add(self, name: str, func: Callable, requires: Iterable[str] = (), label: Optional[str] = None,
+            deferred: bool = False):
+        """
+        Agrega un paso. `label` es el texto a mostrar mientras corre; un paso diferido
+        solo puede depender de pasos ya completados en run().
+        """
+        unknown = set(requires) - self._steps.keys()
+        if unknown:
+            raise ValueError(f"El paso {name} depende de pasos no registrados: {', '.join(sorted(unknown))}")
+        self._steps[name] = _Step(name, func, requires, label or name, deferred)
+
+    def run(self, on_progress: Optional[Callable[[str, float], None]] = None):
+        """
+        Ejecuta los pasos no diferidos respetando sus dependencias. on_progress(texto,
+        fracción) se llama cada vez que termina un paso. Si un paso falla, no se inician
+        los que dependen de él y, al terminar los que estén en curso, se relanza el error.
+        """
+        self._run([step for step in self._steps.values() if not step.deferred], on_progress)
+
+    def run_deferred(self):
+        """Ejecuta los pasos diferidos en segundo plano y escribe el informe al terminar"""
+        deferred = [step for step in self._steps.values() if step.deferred]
+
+        def _run_all():
+            try:
+                self._run(deferred)
+            except Exception as e:
+                logger.error(f"Error en un paso diferido del arranque: {str(e)}")
+            finally:
+                self.report.write()
+        threading.Thread(target=_run_all, name="startup-deferred", daemon=True).start()
+
+    def _run(self, steps: List[_Step], on_progress: Optional[Callable[[str, float], None]] = None):
+        if not steps:
+            return
+        pending = {step.name: step for step in steps}
+        done = {name for name in self._steps if name not in pending}
+        running = {}
+        first_error = None
+
+        with ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="startup") as executor:
+            while pending or running:
+                if first_error is None:
+                    for step in [s for s in pending.values() if set(s.requires) <= done]:
+                        del pending[step.name]
+                        running[executor.submit(self._execute, step)] = step
+                if not running:
+                    # Un error dejó pasos sin poder iniciarse
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    step = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        first_error = first_error or error
+                        continue
+                    done.add(step.name)
+                    if on_progress:
+                        completed = len(steps) - len(pending) - len(running)
+                        labels = [s.label for s in running.values()]
+                        on_progress(labels[0] if labels else step.label, completed / len(steps))
+
+        if first_error is not None:
+            raise first_error
+
+    def _execute(self, step: _Step):
+        self.report.step_started(step.name)
+        error = None
+        try:
+            step.func()
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            self.report.step_finished(step.name, error)
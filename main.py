@@ -1,3 +1,4 @@
+from core import startup  # Primero: sus marcas de tiempo cuentan desde aquí
 import flet as ft
 import logging
 import os
@@ -5,7 +6,9 @@ from datetime import datetime
 import sys
 from core.config import settings
 from core.database import Database
+from core.scheduler import scheduler
 from views.splash import SplashView
+from utils.refresh_scheduler import close_view
 # Lazy loading imports will be inside route_change
 
 # Configuración de logging
@@ -23,6 +26,16 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
+# Las consultas lentas (ver core/query_tracing.py) se registran también en su propio archivo
+slow_query_handler = logging.FileHandler(os.path.join(log_dir, 'slow_queries.log'))
+slow_query_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+logging.getLogger('core.database.slow_queries').addHandler(slow_query_handler)
+
+# Informe de tiempos de cada arranque (una línea JSON; ver core/startup.py)
+startup_timing_handler = logging.FileHandler(os.path.join(log_dir, 'startup_timing.log'))
+startup_timing_handler.setFormatter(logging.Formatter('%(message)s'))
+logging.getLogger('core.startup.timing').addHandler(startup_timing_handler)
+
 logger = logging.getLogger(__name__)
 
 def resource_path(relative_path):
@@ -51,6 +64,9 @@ def main(page: ft.Page):
     def window_event(e):
         if e.data == "close":
             logger.info("Cerrando aplicación...")
+            scheduler.shutdown()
+            for view in page.views:
+                close_view(view)
             Database.close_all_connections()
             page.close()
     
@@ -93,8 +109,10 @@ def main(page: ft.Page):
             current_route = page.route
 
             if len(page.views) > 1:
-                page.views.pop()
+                close_view(page.views.pop())
             else:
+                for view in page.views:
+                    close_view(view)
                 page.views.clear()
 
             page.overlay.clear()
@@ -200,6 +218,7 @@ if __name__ == "__main__":
             # Database.initialize() # Se inicializa en el Splash
             ft.app(target=main, view=ft.AppView.FLET_APP)
         finally:
+            scheduler.shutdown()
             Database.close_all_connections()
     except Exception as e:
         logger.critical(f"Error crítico al iniciar la aplicación: {e}")
@@ -1,27 +1,39 @@
 import psycopg2
 from datetime import datetime, time, date, timedelta
 from typing import List, Optional, Tuple
-from core.database import get_db
+from core.config import settings
+from core.database import get_db, get_db_async, Database
+from core.pagination import Page, fetch_page, fetch_page_async
 from models.appointment import Appointment
 from services.payment_service import PaymentService # Importa PaymentService
 from utils.validators import Validators
 from utils.date_utils import is_working_hours, is_future_datetime
-from .observable import Observable
+from services.event_bus import event_bus, APPOINTMENT_STATUS_CHANGED
 import logging
 from services.history_service import HistoryService # Importar HistoryService
 from services.quote_service import QuoteService # Importar QuoteService
 
 logger = logging.getLogger(__name__)
 
-# Define or import the notify_all function
-def notify_all(event_type: str, data: dict):
+# Consultas más frecuentes del agendamiento, preparadas en el servidor (ver Database.register_statement)
+Database.register_statement(
+    "appointment_slot_taken",
     """
-    Mock implementation of notify_all.
-    Replace this with the actual implementation or import it from the correct module.
+    SELECT id FROM appointments 
+    WHERE date = %s AND time = %s AND status = 'pending'
+    AND id <> COALESCE(%s, -1)
     """
-    logger.info(f"Notification sent: {event_type} with data {data}")
+)
+Database.register_statement(
+    "appointment_booked_times",
+    "SELECT time FROM appointments WHERE date = %s AND status = 'pending'"
+)
 
-class AppointmentService(Observable):
+# date y time admiten nulos: al paginar por clave cuentan como mayores que cualquier valor,
+# como en el orden de get_appointments (el índice de la migración 4 usa estas expresiones)
+APPOINTMENT_KEYSET_NULLS = {"date": "'infinity'::date", "time": "'24:00'::time"}
+
+class AppointmentService:
     @staticmethod
     def delete_client_appointments(client_id: int) -> bool:
         """Elimina todas las citas de un cliente"""
@@ -32,6 +44,67 @@ class AppointmentService(Observable):
             )
             return cursor.rowcount > 0
     
+    @staticmethod
+    def _resolve_treatment_names(treatments: Optional[List[dict]], cursor) -> List[dict]:
+        """
+        Normaliza los tratamientos de una cita a {'name', 'price', 'quantity'}, completando
+        con una sola consulta el nombre/precio de los que solo traen 'id'.
+        """
+        if not treatments:
+            return []
+        missing_ids = [t['id'] for t in treatments if not t.get('name') and 'id' in t]
+        catalog = {}
+        if missing_ids:
+            cursor.execute(
+                "SELECT id, name, price FROM treatments WHERE id = ANY(%s)",
+                (missing_ids,)
+            )
+            catalog = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+        resolved = []
+        for t in treatments:
+            name = t.get('name')
+            price = t.get('price')
+            if not name and t.get('id') in catalog:
+                name, db_price = catalog[t['id']]
+                if price is None:
+                    price = float(db_price)
+            if name:
+                resolved.append({
+                    'name': name,
+                    'price': float(price) if price is not None else 0.0,
+                    'quantity': t.get('quantity', 1)
+                })
+        return resolved
+
+    @staticmethod
+    def _insert_appointment_lines(cursor, appointment_id: int, client_id: int,
+                                  treatments: List[dict], treatment_date: date) -> None:
+        """
+        Inserta los tratamientos de la cita y los registra como pendientes en el historial
+        del cliente con un número fijo de consultas, sin importar cuántas líneas tenga.
+        """
+        rows = [
+            (appointment_id, t['id'], t['price'],
+             f"Tratamiento: {t.get('name', 'Desconocido')}", t.get('quantity', 1))
+            for t in treatments if 'id' in t and 'price' in t
+        ]
+        if not rows:
+            return
+        Database.insert_many(
+            cursor,
+            "appointment_treatments",
+            ("appointment_id", "treatment_id", "price", "notes", "quantity"),
+            rows
+        )
+        HistoryService.add_pending_treatments_from_source(
+            client_id=client_id,
+            notes=f"Asociado a cita ID: {appointment_id}",
+            treatment_date=treatment_date,
+            cursor=cursor,
+            appointment_id=appointment_id
+        )
+
     @staticmethod
     def sync_appointment_treatments_with_quote(client_id: int, old_treatments: Optional[List[dict]], new_treatments: Optional[List[dict]], cursor) -> None:
         """Sincroniza los tratamientos de la cita con el presupuesto pendiente (pendiente de pago) del cliente."""
@@ -64,29 +137,12 @@ class AppointmentService(Observable):
                                 del quote_map[key]
                                 
                 # Sumar los nuevos tratamientos de la cita
-                if new_treatments:
-                    for t in new_treatments:
-                        name = t.get('name')
-                        price = t.get('price')
-                        if not name and 'id' in t:
-                            cursor.execute("SELECT name, price FROM treatments WHERE id = %s", (t['id'],))
-                            row = cursor.fetchone()
-                            if row:
-                                name, db_price = row
-                                if price is None:
-                                    price = float(db_price)
-                        
-                        if name:
-                            key = name.lower().strip()
-                            qty = t.get('quantity', 1)
-                            if key in quote_map:
-                                quote_map[key]['quantity'] += qty
-                            else:
-                                quote_map[key] = {
-                                    'name': name,
-                                    'price': float(price) if price is not None else 0.0,
-                                    'quantity': qty
-                                }
+                for t in AppointmentService._resolve_treatment_names(new_treatments, cursor):
+                    key = t['name'].lower().strip()
+                    if key in quote_map:
+                        quote_map[key]['quantity'] += t['quantity']
+                    else:
+                        quote_map[key] = t
                                 
                 # Convertir el mapa de vuelta a la lista para el presupuesto
                 updated_quote_treatments = list(quote_map.values())
@@ -108,23 +164,7 @@ class AppointmentService(Observable):
             else:
                 # Si no existe presupuesto, y hay nuevos tratamientos, se crea uno nuevo
                 if new_treatments:
-                    formatted_treatments = []
-                    for t in new_treatments:
-                        name = t.get('name')
-                        price = t.get('price')
-                        if not name and 'id' in t:
-                            cursor.execute("SELECT name, price FROM treatments WHERE id = %s", (t['id'],))
-                            row = cursor.fetchone()
-                            if row:
-                                name, db_price = row
-                                if price is None:
-                                    price = float(db_price)
-                        if name:
-                            formatted_treatments.append({
-                                'name': name,
-                                'price': float(price) if price is not None else 0.0,
-                                'quantity': t.get('quantity', 1)
-                            })
+                    formatted_treatments = AppointmentService._resolve_treatment_names(new_treatments, cursor)
                     
                     if formatted_treatments:
                         QuoteService.create_quote(
@@ -149,6 +189,7 @@ class AppointmentService(Observable):
             bool: True si la actualización fue exitosa, False en caso contrario.
         """
         try:
+            updated = False
             with get_db() as cursor: # Usamos un cursor para esta operación también
                 # Obtener el client_id antes de la actualización
                 cursor.execute(
@@ -166,10 +207,7 @@ class AppointmentService(Observable):
                     (new_status, appointment_id)
                 )
                 if cursor.rowcount > 0:
-                    notify_all('APPOINTMENT_STATUS_CHANGED', {
-                        'id': appointment_id,
-                        'status': new_status
-                    })
+                    updated = True
 
                     # Si la cita se marca como 'completed', actualizar los tratamientos en el historial del cliente
                     if new_status == 'completed':
@@ -188,8 +226,13 @@ class AppointmentService(Observable):
                                 logger.error(f"Error al marcar tratamiento {treatment['name']} (ID: {treatment['id']}) como completado para cliente {client_id}: {msg}")
                                 # No revertimos toda la operación si falla un tratamiento individual,
                                 # pero registramos el error.
-                    return True
-            return False
+            # Notificar después del commit: los suscriptores releen la cita actualizada
+            if updated:
+                event_bus.publish(APPOINTMENT_STATUS_CHANGED, {
+                    'id': appointment_id,
+                    'status': new_status
+                })
+            return updated
         except Exception as e:
             logger.error(f"Error al actualizar estado de cita {appointment_id}: {str(e)}")
             return False
@@ -218,7 +261,8 @@ class AppointmentService(Observable):
             if not is_future_datetime(appointment_dt):
                 return False, "No se pueden agendar citas en el pasado"
             
-            with get_db() as cursor: # Inicia la transacción para la cita y sus deudas
+            # La sesión hace que QuoteService/HistoryService/TreatmentService reutilicen esta conexión y transacción
+            with Database.session(), get_db() as cursor: # Inicia la transacción para la cita y sus deudas
                 # Obtener datos del cliente
                 cursor.execute(
                     "SELECT name, cedula FROM clients WHERE id = %s",
@@ -264,36 +308,18 @@ class AppointmentService(Observable):
                     for treatment in treatments:
                         # Asegúrate de que 'id' y 'price' estén presentes en el diccionario de tratamiento
                         if 'id' in treatment and 'price' in treatment:
-                            # Insertar tratamiento asociado a la cita
                             quantity = treatment.get('quantity', 1) # Obtener la cantidad del tratamiento
-                            item_total = float(treatment['price']) * quantity
-                            total_debt_amount += item_total
-                            
+                            total_debt_amount += float(treatment['price']) * quantity
                             debt_description_parts.append(f"{treatment.get('name', 'Desconocido')} ({quantity}x)")
-
-                            cursor.execute(
-                                """
-                                INSERT INTO appointment_treatments 
-                                (appointment_id, treatment_id, price, notes, quantity)
-                                VALUES (%s, %s, %s, %s, %s)
-                                """,
-                                (appointment_id, treatment['id'], treatment['price'], 
-                                f"Tratamiento: {treatment.get('name', 'Desconocido')}", quantity) # Usar .get para seguridad
-                            )
-                            
-                            # Al crear una cita, también se añade el tratamiento al historial del cliente
-                            # inicialmente con completed_quantity = 0, y total_quantity = quantity
-                            HistoryService.add_client_treatment(
-                                client_id=client_id,
-                                treatment_id=treatment['id'],
-                                notes=f"Asociado a cita ID: {appointment_id}",
-                                treatment_date=appointment_date, # Fecha de la cita como fecha de origen
-                                appointment_id=appointment_id,
-                                quantity_to_mark_completed=0, # Inicialmente, no hay cantidad completada
-                                cursor=cursor # Pasa el cursor
-                            )
                         else:
                             logger.warning(f"Tratamiento incompleto, no se pudo añadir a la cita: {treatment}")
+
+                    # Al crear una cita, también se añaden los tratamientos al historial del cliente
+                    # inicialmente con completed_quantity = 0, y total_quantity = quantity
+                    AppointmentService._insert_appointment_lines(
+                        cursor, appointment_id, client_id, treatments,
+                        treatment_date=appointment_date # Fecha de la cita como fecha de origen
+                    )
                 
                 # Sincronizar con el presupuesto pendiente
                 AppointmentService.sync_appointment_treatments_with_quote(
@@ -378,7 +404,7 @@ class AppointmentService(Observable):
             return False, "No hay campos válidos para actualizar"
             
         try:
-            with get_db() as cursor: # Inicia la transacción para la actualización
+            with Database.session(), get_db() as cursor: # Inicia la transacción para la actualización
                 # Obtener client_id si no se pasa en kwargs
                 client_id = kwargs.get('client_id')
                 if client_id is None:
@@ -452,30 +478,14 @@ class AppointmentService(Observable):
                     for treatment in treatments:
                         if 'id' in treatment and 'price' in treatment:
                             quantity = treatment.get('quantity', 1)
-                            item_total = float(treatment['price']) * quantity
-                            total_debt_amount += item_total
-                            
+                            total_debt_amount += float(treatment['price']) * quantity
                             debt_description_parts.append(f"{treatment.get('name', 'Desconocido')} ({quantity}x)")
 
-                            cursor.execute(
-                                """
-                                INSERT INTO appointment_treatments 
-                                (appointment_id, treatment_id, price, notes, quantity)
-                                VALUES (%s, %s, %s, %s, %s)
-                                """,
-                                (appointment_id, treatment['id'], treatment['price'], 
-                                f"Tratamiento: {treatment.get('name', 'Desconocido')}", quantity)
-                            )
-                            # Añadir el tratamiento al historial del cliente (si no existe ya)
-                            HistoryService.add_client_treatment(
-                                client_id=client_id,
-                                treatment_id=treatment['id'],
-                                notes=f"Asociado a cita ID: {appointment_id}",
-                                treatment_date=kwargs.get('date', date.today()), # Usar la nueva fecha si se actualiza, sino hoy
-                                appointment_id=appointment_id,
-                                quantity_to_mark_completed=0, # No se completa al actualizar la cita
-                                cursor=cursor # Pasa el cursor
-                            )
+                    # Añadir los tratamientos a la cita y al historial del cliente (si no existen ya)
+                    AppointmentService._insert_appointment_lines(
+                        cursor, appointment_id, client_id, treatments,
+                        treatment_date=kwargs.get('date', date.today()) # Usar la nueva fecha si se actualiza, sino hoy
+                    )
 
                     # Sincronizar con el presupuesto pendiente
                     AppointmentService.sync_appointment_treatments_with_quote(
@@ -500,10 +510,7 @@ class AppointmentService(Observable):
         
         with get_db() as cursor:
             # Obtener citas existentes para la fecha
-            cursor.execute(
-                "SELECT time FROM appointments WHERE date = %s AND status = 'pending'",
-                (date,)
-            )
+            Database.execute_prepared(cursor, "appointment_booked_times", (date,))
             booked_times = {t[0] for t in cursor.fetchall()}
             
             # Generar slots cada 30 minutos
@@ -539,17 +546,7 @@ class AppointmentService(Observable):
             
         # Validar colisión con otras citas
         with get_db() as cursor:
-            query = """
-                SELECT id FROM appointments 
-                WHERE date = %s AND time = %s AND status = 'pending'
-            """
-            params = [date, time]
-            
-            if exclude_id:
-                query += " AND id != %s"
-                params.append(exclude_id)
-                
-            cursor.execute(query, params)
+            Database.execute_prepared(cursor, "appointment_slot_taken", (date, time, exclude_id or None))
             if cursor.fetchone():
                 return False, "Horario ya reservado"
                 
@@ -578,7 +575,7 @@ class AppointmentService(Observable):
     def get_upcoming_appointments(limit: int = 5) -> List[Appointment]:
         """Versión optimizada con eager loading de tratamientos"""
         try:
-            with get_db() as cursor:
+            with get_db(readonly=True) as cursor:
                 # Utilizamos json_agg para agrupar los tratamientos en la misma consulta
                 # y evitar el problema N+1
                 cursor.execute("""
@@ -646,120 +643,170 @@ class AppointmentService(Observable):
             return []
     
     @staticmethod
-    def get_appointments(limit: int = 10, offset: int = 0, filters: dict = None) -> List[Appointment]:
-        """Obtiene citas paginadas con filtros e incluye tratamientos para evitar N+1"""
-        filters = filters or {}
-        
-        # 1. Obtener los IDs de las citas paginadas primero
-        id_query = """
-            SELECT a.id
-            FROM appointments a
-            JOIN clients c ON a.client_id = c.id
-            LEFT JOIN dentists d ON a.dentist_id = d.id
-            WHERE 1=1
-        """
-        id_params = []
-    
+    def _build_appointment_filters(filters: dict) -> Tuple[str, list]:
+        """Construye la cláusula WHERE (sin el WHERE) y sus parámetros para los listados de citas"""
+        clause = "1=1"
+        params = []
+
         if filters.get('date_from'):
-            id_query += " AND a.date >= %s"
-            id_params.append(filters['date_from'])
+            clause += " AND a.date >= %s"
+            params.append(filters['date_from'])
         if filters.get('date_to'):
-            id_query += " AND a.date <= %s"
-            id_params.append(filters['date_to'])
+            clause += " AND a.date <= %s"
+            params.append(filters['date_to'])
         if filters.get('status'):
-            id_query += " AND a.status = %s"
-            id_params.append(filters['status'])
+            clause += " AND a.status = %s"
+            params.append(filters['status'])
         if filters.get('search_term'):
-            id_query += " AND (unaccent(c.name) ILIKE unaccent(%s) OR c.cedula ILIKE %s OR unaccent(a.notes) ILIKE unaccent(%s))"
-            id_params.extend([f"%{filters['search_term']}%"] * 3)
-        
-        id_query += " ORDER BY a.date DESC, a.time DESC LIMIT %s OFFSET %s"
-        id_params.extend([limit, offset])
-        
+            clause += " AND (unaccent(c.name) ILIKE unaccent(%s) OR c.cedula ILIKE %s OR unaccent(a.notes) ILIKE unaccent(%s))"
+            params.extend([f"%{filters['search_term']}%"] * 3)
+
+        return clause, params
+
+    # Columnas de los listados de citas (en el orden que espera _appointment_from_row)
+    _LIST_COLUMNS = """
+        a.id, a.client_id, c.name AS client_name, c.cedula AS client_cedula,
+        a.date, a.time, a.status, a.notes,
+        a.created_at, a.updated_at,
+        a.dentist_id, d.name AS dentist_name
+    """
+
+    # Tratamientos de cada cita de la página agregados como JSON, en la misma consulta
+    _TREATMENTS_LATERAL = """
+        LEFT JOIN LATERAL (
+            SELECT COALESCE(
+                JSON_AGG(
+                    JSON_BUILD_OBJECT(
+                        'id', t.id,
+                        'name', t.name,
+                        'price', at.price,
+                        'notes', at.notes,
+                        'quantity', at.quantity
+                    )
+                ),
+                '[]'::json
+            ) AS treatments
+            FROM appointment_treatments at
+            JOIN treatments t ON at.treatment_id = t.id
+            WHERE at.appointment_id = {page}.id
+        ) appt_treatments ON true
+    """
+
+    @staticmethod
+    def _appointment_list_query(where_clause: str) -> str:
+        """SELECT de las columnas de listado de las citas que cumplen `where_clause` (sin orden ni límite)"""
+        return f"""
+            SELECT {AppointmentService._LIST_COLUMNS}
+            FROM appointments a
+            JOIN clients c ON a.client_id = c.id
+            LEFT JOIN dentists d ON a.dentist_id = d.id
+            WHERE {where_clause}
+        """
+
+    @staticmethod
+    def _appointment_from_row(row) -> Appointment:
+        """Mapea una fila (_LIST_COLUMNS y, si viene, el JSON de tratamientos) a un objeto Appointment"""
+        appt = Appointment(
+            id=row[0],
+            client_id=row[1],
+            client_name=row[2],
+            client_cedula=row[3],
+            date=row[4],
+            time=row[5],
+            status=row[6],
+            notes=row[7],
+            created_at=row[8],
+            updated_at=row[9],
+            dentist_id=row[10],
+            dentist_name=row[11]
+        )
+        treatments = row[12] if len(row) > 12 else []
+        appt.treatments = [
+            {
+                'id': t['id'],
+                'name': t['name'],
+                'price': float(t['price']),
+                'notes': t['notes'],
+                'quantity': t['quantity']
+            }
+            for t in treatments or []
+        ]
+        return appt
+
+    @staticmethod
+    def _appointments_offset_query(filters: dict, limit: int, offset: int) -> Tuple[str, list]:
+        """Página por LIMIT/OFFSET (fecha y hora descendentes) con sus tratamientos, en una sola consulta"""
+        where_clause, params = AppointmentService._build_appointment_filters(filters or {})
+        query = f"""
+            SELECT p.*, appt_treatments.treatments
+            FROM (
+                {AppointmentService._appointment_list_query(where_clause)}
+                ORDER BY a.date DESC, a.time DESC LIMIT %s OFFSET %s
+            ) p
+            {AppointmentService._TREATMENTS_LATERAL.format(page="p")}
+            ORDER BY p.date DESC, p.time DESC
+        """
+        params.extend([limit, offset])
+        return query, params
+
+    @staticmethod
+    def get_appointments(limit: int = 10, offset: int = 0, filters: dict = None) -> List[Appointment]:
+        """Obtiene citas paginadas con filtros e incluye tratamientos (agregados en la misma consulta)"""
+        query, params = AppointmentService._appointments_offset_query(filters, limit, offset)
         with get_db() as cursor:
-            cursor.execute(id_query, id_params)
-            appointment_ids = [row[0] for row in cursor.fetchall()]
-            
-            if not appointment_ids:
-                return []
-            
-            # 2. Obtener datos completos de las citas encontradas
-            placeholders = ', '.join(['%s'] * len(appointment_ids))
-            query = f"""
-                SELECT a.id, a.client_id, c.name, c.cedula, 
-                    a.date, a.time, a.status, a.notes,
-                    a.created_at, a.updated_at,
-                    a.dentist_id, d.name AS dentist_name
-                FROM appointments a
-                JOIN clients c ON a.client_id = c.id
-                LEFT JOIN dentists d ON a.dentist_id = d.id
-                WHERE a.id IN ({placeholders})
-                ORDER BY a.date DESC, a.time DESC
-            """
-            cursor.execute(query, appointment_ids)
-            appointments_map = {}
-            for row in cursor.fetchall():
-                appt = Appointment(
-                    id=row[0],
-                    client_id=row[1],
-                    client_name=row[2],
-                    client_cedula=row[3],
-                    date=row[4],
-                    time=row[5],
-                    status=row[6],
-                    notes=row[7],
-                    created_at=row[8],
-                    updated_at=row[9],
-                    dentist_id=row[10],
-                    dentist_name=row[11]
-                )
-                appt.treatments = [] # Inicializar lista de tratamientos
-                appointments_map[appt.id] = appt
+            cursor.execute(query, params)
+            return [AppointmentService._appointment_from_row(row) for row in cursor.fetchall()]
 
-            # 3. Obtener tratamientos para esas citas (Eager Loading)
-            treatments_query = f"""
-                SELECT at.appointment_id, t.id, t.name, at.price, at.notes, at.quantity
-                FROM appointment_treatments at
-                JOIN treatments t ON at.treatment_id = t.id
-                WHERE at.appointment_id IN ({placeholders})
-            """
-            cursor.execute(treatments_query, appointment_ids)
-            
-            for row in cursor.fetchall():
-                appt_id = row[0]
-                if appt_id in appointments_map:
-                    appointments_map[appt_id].treatments.append({
-                        'id': row[1],
-                        'name': row[2],
-                        'price': float(row[3]),
-                        'notes': row[4],
-                        'quantity': row[5]
-                    })
-            
-            # Devolver lista ordenada según ids originales
-            return [appointments_map[aid] for aid in appointment_ids]
+    @staticmethod
+    def get_appointments_page(limit: int = 10, filters: dict = None, cursor: Optional[str] = None,
+                              from_end: bool = False, total: Optional[str] = settings.LIST_TOTAL_MODE) -> Page:
+        """
+        Página de citas por clave (keyset) en el orden de get_appointments (fecha y hora
+        descendentes, id como desempate): `cursor` es el next_cursor/prev_cursor anterior.
+        Filas, tratamientos y total ('exact', 'estimated' o None) llegan en una sola consulta.
+        """
+        with get_db(readonly=True) as db_cursor:
+            page = fetch_page(db_cursor, *AppointmentService._appointments_page_args(filters, limit),
+                              **AppointmentService._appointments_page_options(cursor, from_end, total))
+        page.items = [AppointmentService._appointment_from_row(row) for row in page.items]
+        return page
+
+    @staticmethod
+    async def get_appointments_page_async(limit: int = 10, filters: dict = None, cursor: Optional[str] = None,
+                                          from_end: bool = False,
+                                          total: Optional[str] = settings.LIST_TOTAL_MODE) -> Page:
+        """Versión asíncrona de get_appointments_page para handlers de page.run_task"""
+        async with get_db_async(readonly=True) as db_cursor:
+            page = await fetch_page_async(db_cursor, *AppointmentService._appointments_page_args(filters, limit),
+                                          **AppointmentService._appointments_page_options(cursor, from_end, total))
+        page.items = [AppointmentService._appointment_from_row(row) for row in page.items]
+        return page
 
+    @staticmethod
+    def _appointments_page_args(filters: Optional[dict], limit: int) -> tuple:
+        """Consulta, parámetros, claves, límite y key_of de la página de citas (fetch_page)"""
+        where_clause, params = AppointmentService._build_appointment_filters(filters or {})
+        return (
+            AppointmentService._appointment_list_query(where_clause), params,
+            ["date", "time", "id"], limit, lambda row: (row[4], row[5], row[0])
+        )
+
+    @staticmethod
+    def _appointments_page_options(cursor: Optional[str], from_end: bool, total: Optional[str]) -> dict:
+        return dict(
+            cursor=cursor, descending=True, from_end=from_end, total=total,
+            extra_columns=", appt_treatments.treatments",
+            extra_joins=AppointmentService._TREATMENTS_LATERAL.format(page="keyset_page"),
+            null_keys=APPOINTMENT_KEYSET_NULLS
+        )
 
     @staticmethod
     def count_appointments(filters: dict = None) -> int:
         """Cuenta el total de citas que coinciden con los filtros"""
         filters = filters or {}
-        query = "SELECT COUNT(*) FROM appointments a JOIN clients c ON a.client_id = c.id WHERE 1=1"
-        params = []
-        
         # Aplicar filtros (igual que en get_appointments)
-        if filters.get('date_from'):
-            query += " AND a.date >= %s"
-            params.append(filters['date_from'])
-        if filters.get('date_to'):
-            query += " AND a.date <= %s"
-            params.append(filters['date_to'])
-        if filters.get('status'):
-            query += " AND a.status = %s"
-            params.append(filters['status'])
-        if filters.get('search_term'):
-            query += " AND (unaccent(c.name) ILIKE unaccent(%s) OR c.cedula ILIKE %s OR unaccent(a.notes) ILIKE unaccent(%s))"
-            params.extend([f"%{filters['search_term']}%"] * 3)
+        where_clause, params = AppointmentService._build_appointment_filters(filters)
+        query = f"SELECT COUNT(*) FROM appointments a JOIN clients c ON a.client_id = c.id WHERE {where_clause}"
         
         with get_db() as cursor:
             cursor.execute(query, params)
@@ -884,17 +931,19 @@ class AppointmentService(Observable):
 
                 for appt_id, client_name, appt_date, appt_time in cancelled_appointments:
                     logger.info(f"Cita pasada ID {appt_id} ({client_name} - {appt_date} {appt_time}) marcada como 'cancelled'.")
-                    notify_all('APPOINTMENT_STATUS_CHANGED', {
-                        'id': appt_id,
-                        'status': 'cancelled'
-                    })
                 
                 if cancelled_appointments:
                     logger.info(f"Total de {len(cancelled_appointments)} citas pendientes pasadas marcadas como canceladas.")
                 else:
                     logger.info("No se encontraron citas pendientes pasadas para cancelar.")
 
-                return True
+            # Notificar después del commit
+            for appt_id, _, _, _ in cancelled_appointments:
+                event_bus.publish(APPOINTMENT_STATUS_CHANGED, {
+                    'id': appt_id,
+                    'status': 'cancelled'
+                })
+            return True
         except Exception as e:
             logger.error(f"Error al cancelar citas pendientes pasadas: {str(e)}")
             return False
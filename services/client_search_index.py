@@ -0,0 +1,268 @@
+import logging
+import threading
+import time
+import unicodedata
+from datetime import timedelta
+from typing import List, Optional
+from core.config import settings
+from core.database import get_db
+from services.event_bus import CLIENT_EVENTS
+from models.client import Client
+
+logger = logging.getLogger(__name__)
+
+# updated_at es el inicio de la transacción que escribió: una que confirma después de un
+# sondeo puede traer un valor anterior a él, así que cada sondeo relee este margen
+_POLL_OVERLAP = timedelta(minutes=1)
+
+
+def normalize(text: Optional[str]) -> str:
+    """Minúsculas y sin acentos, para comparar igual que immutable_unaccent(lower(...))"""
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+class _Entry:
+    __slots__ = ("id", "name", "cedula", "phone", "text", "name_key", "words")
+
+    def __init__(self, row):
+        self.id, self.name, self.cedula, self.phone = row[:4]
+        self.name_key = normalize(self.name)
+        self.words = self.name_key.split()
+        # Documento buscable: el cliente se encuentra por subcadena de cualquiera de los campos
+        self.text = " ".join(p for p in (self.name_key, self.cedula or "", normalize(self.phone)) if p)
+
+
+class ClientSearchIndex:
+    """
+    Índice en memoria de (id, nombre, cédula, teléfono) para el autocompletado de clientes.
+
+    - Se construye de forma perezosa en la primera búsqueda, con una sola consulta.
+    - Se mantiene al día con los eventos CLIENT_CREATED/UPDATED/DELETED de este proceso:
+      los IDs afectados se marcan y se releen juntos antes de la siguiente búsqueda.
+    - Los cambios hechos desde otra instancia no emiten eventos aquí: antes de buscar, como
+      mucho cada CLIENT_SEARCH_INDEX_POLL_SECONDS, se releen los clientes con updated_at
+      posterior al último visto, y cada CLIENT_SEARCH_INDEX_MAX_AGE_SECONDS se reconstruye
+      el índice completo (lo único que recoge las eliminaciones ajenas).
+    - La memoria queda acotada por CLIENT_SEARCH_INDEX_MAX_CLIENTS: si la tabla supera
+      ese tamaño, search() retorna None (búsqueda en la base) hasta la siguiente
+      reconstrucción, que vuelve a contar los clientes por si se eliminaron.
+    """
+    NGRAM = 3
+
+    def __init__(self, max_clients: int, poll_seconds: float = 30, max_age_seconds: float = 900):
+        self._lock = threading.RLock()
+        self._max_clients = max_clients
+        self._poll_seconds = poll_seconds
+        self._max_age_seconds = max_age_seconds
+        self._built_at = 0.0
+        self._polled_at = 0.0
+        self._last_seen = None  # mayor updated_at leído
+        self._entries = {}    # id -> _Entry
+        self._postings = {}   # trigrama -> conjunto de IDs
+        self._by_name = None  # entradas ordenadas por nombre (caché, se invalida al modificar)
+        self._dirty = set()
+        self._state = "empty" if max_clients > 0 else "disabled"
+
+    # --- Eventos -----------------------------------------------------------
+
+    def on_event(self, event_type, data):
+        if event_type in CLIENT_EVENTS and data:
+            client_id = data.get('client_id')
+            if client_id is not None:
+                with self._lock:
+                    self._dirty.add(client_id)
+
+    def invalidate(self):
+        """Descarta el índice; se reconstruirá en la próxima búsqueda"""
+        with self._lock:
+            self._entries.clear()
+            self._postings.clear()
+            self._by_name = None
+            self._dirty.clear()
+            self._state = "empty" if self._max_clients > 0 else "disabled"
+
+    # --- Búsqueda ----------------------------------------------------------
+
+    def search(self, search_term: str, limit: int = 50) -> Optional[List[Client]]:
+        """
+        Clientes que coinciden con `search_term` (subcadena sin acentos de nombre, cédula o
+        teléfono), los que empiezan por el término primero. Sin término, los primeros por
+        nombre. Retorna None si el índice no está disponible.
+        """
+        with self._lock:
+            if not self._ensure_ready():
+                return None
+            term = normalize(search_term).strip()
+            if not term:
+                entries = self._sorted_by_name()[:limit]
+            elif len(term) < self.NGRAM:
+                entries = self._search_prefix(term, limit)
+            else:
+                entries = self._search_ngrams(term, limit)
+            return [Client(id=e.id, name=e.name, cedula=e.cedula, phone=e.phone) for e in entries]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'state': self._state,
+                'clients': len(self._entries),
+                'ngrams': len(self._postings),
+                'postings': sum(len(ids) for ids in self._postings.values()),
+                'pending_refresh': len(self._dirty)
+            }
+
+    def _search_prefix(self, term: str, limit: int) -> list:
+        # Términos cortos: prefijo de alguna palabra del nombre, de la cédula o del teléfono
+        result = []
+        for entry in self._sorted_by_name():
+            if any(w.startswith(term) for w in entry.words) or \
+                    (entry.cedula or "").startswith(term) or normalize(entry.phone).startswith(term):
+                result.append(entry)
+                if len(result) >= limit:
+                    break
+        return result
+
+    def _search_ngrams(self, term: str, limit: int) -> list:
+        postings = []
+        for gram in self._ngrams(term):
+            ids = self._postings.get(gram)
+            if not ids:
+                return []
+            postings.append(ids)
+        postings.sort(key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+
+        matches = [e for e in (self._entries[i] for i in candidates) if term in e.text]
+        matches.sort(key=lambda e: (self._rank(e, term), e.name_key))
+        return matches[:limit]
+
+    @staticmethod
+    def _rank(entry: _Entry, term: str) -> int:
+        if entry.name_key.startswith(term) or (entry.cedula or "").startswith(term):
+            return 0
+        if any(w.startswith(term) for w in entry.words):
+            return 1
+        return 2
+
+    # --- Mantenimiento -----------------------------------------------------
+
+    def _ensure_ready(self) -> bool:
+        if self._state == "disabled":
+            return False
+        try:
+            now = time.monotonic()
+            if self._state in ("ready", "too_large") and now - self._built_at > self._max_age_seconds:
+                self.invalidate()
+            if self._state == "too_large":
+                return False
+            if self._state == "empty":
+                self._build()
+            else:
+                if now - self._polled_at > self._poll_seconds:
+                    self._poll_changes()
+                if self._dirty:
+                    self._refresh_dirty()
+        except Exception as e:
+            logger.error(f"No se pudo actualizar el índice de clientes: {str(e)}")
+            return False
+        return self._state == "ready"
+
+    def _build(self):
+        with get_db(readonly=True) as cursor:
+            cursor.execute(
+                "SELECT id, name, cedula, phone, updated_at FROM clients ORDER BY name LIMIT %s",
+                (self._max_clients + 1,)
+            )
+            rows = cursor.fetchall()
+        self._built_at = self._polled_at = time.monotonic()
+        if len(rows) > self._max_clients:
+            logger.info(
+                f"Más de {self._max_clients} clientes: el autocompletado usará la búsqueda en la base de datos"
+            )
+            self._state = "too_large"
+            return
+        self._dirty.clear()
+        for row in rows:
+            self._add(_Entry(row))
+        self._last_seen = max((row[4] for row in rows), default=None)
+        self._state = "ready"
+        logger.info(f"Índice de clientes construido: {len(self._entries)} clientes, {len(self._postings)} trigramas")
+
+    def _poll_changes(self):
+        """Relee los clientes modificados (por cualquier instancia) desde el último visto"""
+        self._polled_at = time.monotonic()
+        with get_db(readonly=True) as cursor:
+            if self._last_seen is None:
+                cursor.execute("SELECT id, name, cedula, phone, updated_at FROM clients")
+            else:
+                cursor.execute(
+                    "SELECT id, name, cedula, phone, updated_at FROM clients WHERE updated_at > %s",
+                    (self._last_seen - _POLL_OVERLAP,)
+                )
+            rows = cursor.fetchall()
+        if rows:
+            self._last_seen = max([row[4] for row in rows] + ([self._last_seen] if self._last_seen else []))
+            self._replace([row[0] for row in rows], rows)
+
+    def _refresh_dirty(self):
+        client_ids = list(self._dirty)
+        # En el primario: son cambios recién confirmados
+        with get_db() as cursor:
+            cursor.execute(
+                "SELECT id, name, cedula, phone, updated_at FROM clients WHERE id = ANY(%s)",
+                (client_ids,)
+            )
+            rows = cursor.fetchall()
+        self._dirty.difference_update(client_ids)
+        self._replace(client_ids, rows)
+
+    def _replace(self, client_ids: list, rows: list):
+        """Reemplaza en el índice las entradas de client_ids por las filas leídas"""
+        for client_id in client_ids:
+            self._remove(client_id)
+        for row in rows:
+            self._add(_Entry(row))
+        if len(self._entries) > self._max_clients:
+            logger.info("El índice de clientes superó su límite de tamaño; se reintentará al reconstruirlo")
+            self._entries.clear()
+            self._postings.clear()
+            self._by_name = None
+            self._state = "too_large"
+
+    def _add(self, entry: _Entry):
+        self._entries[entry.id] = entry
+        for gram in self._ngrams(entry.text):
+            self._postings.setdefault(gram, set()).add(entry.id)
+        self._by_name = None
+
+    def _remove(self, client_id: int):
+        entry = self._entries.pop(client_id, None)
+        if entry is None:
+            return
+        for gram in self._ngrams(entry.text):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(client_id)
+                if not ids:
+                    del self._postings[gram]
+        self._by_name = None
+
+    def _sorted_by_name(self) -> list:
+        if self._by_name is None:
+            self._by_name = sorted(self._entries.values(), key=lambda e: e.name_key)
+        return self._by_name
+
+    @classmethod
+    def _ngrams(cls, text: str) -> set:
+        return {text[i:i + cls.NGRAM] for i in range(len(text) - cls.NGRAM + 1)}
+
+
+# Instancia del proceso; ClientService la suscribe a sus eventos
+client_search_index = ClientSearchIndex(
+    settings.CLIENT_SEARCH_INDEX_MAX_CLIENTS,
+    settings.CLIENT_SEARCH_INDEX_POLL_SECONDS,
+    settings.CLIENT_SEARCH_INDEX_MAX_AGE_SECONDS
+)
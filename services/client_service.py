@@ -1,40 +1,39 @@
-from core.database import get_db, Database
+from core.config import settings
+from core.database import get_db, get_db_async, Database
+from core.pagination import Page, fetch_page, fetch_page_async
 from models.client import Client  # Asegúrate de tener este modelo
 from typing import List, Optional
 import logging
 #print
-from services.observable import Observable
+from services.event_bus import event_bus, CLIENT_CREATED, CLIENT_DELETED, CLIENT_EVENTS
+from services.client_search_index import client_search_index
 
 logger = logging.getLogger(__name__)
 
-class ClientService(Observable):
-    _instance = None
+Database.register_statement(
+    "client_by_id",
+    """
+    SELECT id, name, cedula, phone, email, address, birth_date, created_at, updated_at
+    FROM clients
+    WHERE id = %s
+    """
+)
 
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(ClientService, cls).__new__(cls)
-            # Inicializar Observable manualmente ya que __init__ podría no ser llamado si retornamos instancia existente
-            # o asegurarse de que __init__ maneje la inicialización única.
-            # Mejor opción: Inicializar aquí si es nuevo.
-            super(ClientService, cls._instance).__init__()
-        return cls._instance
+class ClientService:
+    # Búsqueda por trigramas (migración 0003): documento sin acentos y en minúsculas.
+    # Debe coincidir exactamente con la expresión del índice idx_clients_search_trgm.
+    _SEARCH_DOCUMENT = (
+        "immutable_unaccent(lower(coalesce(name, '') || ' ' || coalesce(cedula, '') || ' ' || "
+        "coalesce(phone, '') || ' ' || coalesce(email, '')))"
+    )
+    # None hasta comprobar si la base tiene la migración aplicada
+    _trigram_search = None
 
-    def __init__(self):
-        # Evitar re-inicialización si ya tiene observadores
-        if not hasattr(self, '_observers'):
-            super().__init__()
     @staticmethod
     def get_client_by_id(client_id: int) -> Optional[Client]: # Añadido este método
         """Obtiene un cliente por su ID."""
-        with get_db() as cursor:
-            cursor.execute(
-                """
-                SELECT id, name, cedula, phone, email, address, birth_date, created_at, updated_at
-                FROM clients
-                WHERE id = %s
-                """,
-                (client_id,)
-            )
+        with get_db(readonly=True) as cursor:
+            Database.execute_prepared(cursor, "client_by_id", (client_id,))
             row = cursor.fetchone()
             if row:
                 return Client(
@@ -53,7 +52,7 @@ class ClientService(Observable):
     @staticmethod
     def has_payments_or_debts(client_id: int) -> bool:
         """Verifica si el cliente tiene pagos o deudas asociadas"""
-        with get_db() as cursor:
+        with get_db(readonly=True) as cursor:
             # Verificar pagos
             cursor.execute(
                 "SELECT COUNT(*) FROM payments WHERE client_id = %s",
@@ -73,7 +72,7 @@ class ClientService(Observable):
     @staticmethod
     def get_client_quotes(client_id: int) -> List[dict]:
         """Obtiene presupuestos de un cliente"""
-        with get_db() as cursor:
+        with get_db(readonly=True) as cursor:
             cursor.execute(
                 """
                 SELECT id, quote_date, expiration_date, total_amount, status
@@ -96,7 +95,7 @@ class ClientService(Observable):
     @staticmethod
     def get_client_appointments(client_id: int) -> List[dict]:
         """Obtiene citas de un cliente"""
-        with get_db() as cursor:
+        with get_db(readonly=True) as cursor:
             cursor.execute(
                 """
                 SELECT id, date, time, status, notes
@@ -151,19 +150,20 @@ class ClientService(Observable):
                     "DELETE FROM clients WHERE id = %s RETURNING id",
                     (client_id,)
                 )
-                result = cursor.fetchone()
-                if result:
-                    ClientService().notify_all('CLIENT_DELETED', {'client_id': client_id})
-                return result is not None
+                deleted = cursor.fetchone() is not None
                 
             except Exception as e:
                 logger.error(f"Error al eliminar cliente con dependencias: {str(e)}")
                 raise
+        # Notificar después del commit
+        if deleted:
+            event_bus.publish(CLIENT_DELETED, {'client_id': client_id})
+        return deleted
     
     @staticmethod
     def has_appointments(client_id: int) -> bool:
         """Verifica si el cliente tiene citas asociadas"""
-        with get_db() as cursor:
+        with get_db(readonly=True) as cursor:
             cursor.execute(
                 "SELECT COUNT(*) FROM appointments WHERE client_id = %s",
                 (client_id,)
@@ -178,15 +178,15 @@ class ClientService(Observable):
                 "DELETE FROM clients WHERE id = %s RETURNING id",
                 (client_id,)
             )
-            result = cursor.fetchone()
-            if result:
-                ClientService().notify_all('CLIENT_DELETED', {'client_id': client_id})
-            return result is not None
+            deleted = cursor.fetchone() is not None
+        if deleted:
+            event_bus.publish(CLIENT_DELETED, {'client_id': client_id})
+        return deleted
     
     @staticmethod
     def get_recent_clients(limit: int = 5) -> List[Client]:
         """Obtiene los clientes más recientes"""
-        with get_db() as cursor:
+        with get_db(readonly=True) as cursor:
             cursor.execute("""
                 SELECT id, name, cedula, phone, email, address, birth_date, created_at, updated_at
                 FROM clients
@@ -215,21 +215,10 @@ class ClientService(Observable):
             FROM clients
             WHERE 1=1
         """
-        params = []
-        
-        if search_term:
-            query += """
-                AND (
-                    unaccent(name) ILIKE unaccent(%s) OR 
-                    unaccent(cedula) ILIKE unaccent(%s) OR 
-                    unaccent(phone) ILIKE unaccent(%s) OR 
-                    unaccent(email) ILIKE unaccent(%s)
-                )
-            """
-            search_param = f"%{search_term}%"
-            params = [search_param] * 4  # Mismo término para todos los campos
-        
-        query += " ORDER BY name ASC"  # Orden alfabético por nombre
+        search_clause, params = ClientService._build_search_filter(search_term)
+        order_clause, order_params = ClientService._build_search_order(search_term)
+        query += f"{search_clause} ORDER BY {order_clause}"  # Por relevancia al buscar, si no alfabético
+        params.extend(order_params)
         
         with Database.get_cursor() as cursor:
             cursor.execute(query, params)
@@ -247,23 +236,12 @@ class ClientService(Observable):
                 FROM clients
                 WHERE 1=1
             """
-            params = []
-            
-            if search_term:
-                query += """
-                    AND (
-                        unaccent(name) ILIKE unaccent(%s) OR 
-                        unaccent(cedula) ILIKE unaccent(%s) OR 
-                        unaccent(phone) ILIKE unaccent(%s) OR 
-                        unaccent(email) ILIKE unaccent(%s)
-                    )
-                """
-                search_param = f"%{search_term}%"
-                params = [search_param] * 4
-            
-            query += " ORDER BY name ASC"
+            search_clause, params = ClientService._build_search_filter(search_term)
+            order_clause, order_params = ClientService._build_search_order(search_term)
+            query += f"{search_clause} ORDER BY {order_clause}"
+            params.extend(order_params)
             
-            with get_db() as cursor:
+            with get_db(readonly=True) as cursor:
                 cursor.execute(query, params)
                 return [
                     Client(
@@ -282,6 +260,75 @@ class ClientService(Observable):
             logger.error(f"Error al buscar clientes (full object): {e}")
             return []
 
+    @staticmethod
+    def _trigram_search_available() -> bool:
+        """Indica (una vez por proceso) si la base tiene immutable_unaccent y el índice de trigramas"""
+        if ClientService._trigram_search is None:
+            try:
+                with get_db(readonly=True) as cursor:
+                    cursor.execute("SELECT to_regprocedure('immutable_unaccent(text)') IS NOT NULL")
+                    ClientService._trigram_search = bool(cursor.fetchone()[0])
+            except Exception as e:
+                logger.error(f"No se pudo comprobar la búsqueda por trigramas: {e}")
+                return False
+            if not ClientService._trigram_search:
+                logger.warning("Búsqueda por trigramas no disponible (python -m core.migrations upgrade); se usa ILIKE")
+        return ClientService._trigram_search
+
+    @staticmethod
+    def _build_search_filter(search_term: str) -> tuple:
+        """
+        Construye el filtro de búsqueda (nombre, cédula, teléfono o email) y sus parámetros:
+        - solo dígitos: prefijo de cédula/teléfono (índices btree text_pattern_ops)
+        - resto: subcadena sin acentos sobre el índice GIN de trigramas
+        """
+        if not search_term or not search_term.strip():
+            return "", []
+        term = search_term.strip()
+        if term.isdigit():
+            return " AND (cedula LIKE %s OR phone LIKE %s)", [f"{term}%"] * 2
+        if ClientService._trigram_search_available():
+            return (
+                f" AND {ClientService._SEARCH_DOCUMENT} LIKE immutable_unaccent(lower(%s))",
+                [f"%{term}%"]
+            )
+        clause = """
+            AND (
+                unaccent(name) ILIKE unaccent(%s) OR 
+                unaccent(cedula) ILIKE unaccent(%s) OR 
+                unaccent(phone) ILIKE unaccent(%s) OR 
+                unaccent(email) ILIKE unaccent(%s)
+            )
+        """
+        search_param = f"%{search_term}%"
+        return clause, [search_param] * 4
+
+    @staticmethod
+    def _build_search_order(search_term: str) -> tuple:
+        """Orden de los resultados: por similitud del nombre con el término y luego alfabético"""
+        term = (search_term or "").strip()
+        if term and not term.isdigit() and ClientService._trigram_search_available():
+            return (
+                "word_similarity(immutable_unaccent(lower(%s)), immutable_unaccent(lower(name))) DESC, name ASC",
+                [term]
+            )
+        return "name ASC", []
+
+    @staticmethod
+    def _client_from_row(row) -> Client:
+        """Mapea una fila (id, name, cedula, phone, email, address, birth_date, created_at, updated_at) a Client"""
+        return Client(
+            id=row[0],
+            name=row[1],
+            cedula=row[2],
+            phone=row[3],
+            email=row[4],
+            address=row[5],
+            birth_date=row[6],
+            created_at=row[7],
+            updated_at=row[8]
+        )
+
     @staticmethod
     def get_paginated_clients(page: int = 1, per_page: int = 10, search_term: str = "") -> List[Client]:
         """
@@ -290,68 +337,92 @@ class ClientService(Observable):
         limit = per_page
         offset = (page - 1) * per_page
         
-        query = """
+        search_clause, params = ClientService._build_search_filter(search_term)
+        order_clause, order_params = ClientService._build_search_order(search_term)
+        query = f"""
             SELECT id, name, cedula, phone, email, address, birth_date, created_at, updated_at 
             FROM clients
-            WHERE 1=1
+            WHERE 1=1 {search_clause}
+            ORDER BY {order_clause} LIMIT %s OFFSET %s
         """
-        params = []
-        
-        if search_term:
-            query += """
-                AND (
-                    unaccent(name) ILIKE unaccent(%s) OR 
-                    unaccent(cedula) ILIKE unaccent(%s) OR 
-                    unaccent(phone) ILIKE unaccent(%s) OR 
-                    unaccent(email) ILIKE unaccent(%s)
-                )
-            """
-            search_param = f"%{search_term}%"
-            params = [search_param] * 4
+        params.extend(order_params + [limit, offset])
         
-        query += " ORDER BY name ASC LIMIT %s OFFSET %s"
-        params.extend([limit, offset])
-        
-        with get_db() as cursor:
+        with get_db(readonly=True) as cursor:
             cursor.execute(query, params)
-            return [
-                Client(
-                    id=row[0],
-                    name=row[1],
-                    cedula=row[2],
-                    phone=row[3],
-                    email=row[4],
-                    address=row[5],
-                    birth_date=row[6],
-                    created_at=row[7],
-                    updated_at=row[8]
-                ) for row in cursor.fetchall()
-            ]
+            return [ClientService._client_from_row(row) for row in cursor.fetchall()]
+
+    @staticmethod
+    def get_clients_page(per_page: int = 10, search_term: str = "", cursor: Optional[str] = None,
+                         from_end: bool = False, total: Optional[str] = settings.LIST_TOTAL_MODE) -> Page:
+        """
+        Página de clientes por clave (keyset): `cursor` es el next_cursor/prev_cursor de la
+        página anterior. Mismo orden que get_paginated_clients, con id como desempate.
+        El total ('exact', 'estimated' o None para omitirlo) llega en la misma consulta.
+        """
+        with get_db(readonly=True) as db_cursor:
+            page = fetch_page(
+                db_cursor, *ClientService._clients_page_args(search_term, per_page),
+                cursor=cursor, from_end=from_end, total=total
+            )
+        page.items = [ClientService._client_from_row(row) for row in page.items]
+        return page
+
+    @staticmethod
+    async def get_clients_page_async(per_page: int = 10, search_term: str = "", cursor: Optional[str] = None,
+                                     from_end: bool = False,
+                                     total: Optional[str] = settings.LIST_TOTAL_MODE) -> Page:
+        """Versión asíncrona de get_clients_page para handlers de page.run_task"""
+        async with get_db_async(readonly=True) as db_cursor:
+            page = await fetch_page_async(
+                db_cursor, *ClientService._clients_page_args(search_term, per_page),
+                cursor=cursor, from_end=from_end, total=total
+            )
+        page.items = [ClientService._client_from_row(row) for row in page.items]
+        return page
+
+    @staticmethod
+    def _clients_page_args(search_term: str, per_page: int) -> tuple:
+        """Consulta, parámetros, claves, límite y key_of de la página de clientes (fetch_page)"""
+        search_clause, params = ClientService._build_search_filter(search_term)
+        order_clause, order_params = ClientService._build_search_order(search_term)
+        ranked = bool(order_params)
+        # Con búsqueda por relevancia la similitud (negada, para ordenar todo ascendente) es parte de la clave
+        rank_column = (
+            ", (-word_similarity(immutable_unaccent(lower(%s)), immutable_unaccent(lower(name))))::float8 AS sort_rank"
+            if ranked else ""
+        )
+        base_query = f"""
+            SELECT id, name, cedula, phone, email, address, birth_date, created_at, updated_at{rank_column}
+            FROM clients
+            WHERE 1=1 {search_clause}
+        """
+        sort_keys = ["sort_rank", "name", "id"] if ranked else ["name", "id"]
+        key_of = (lambda row: (row[9], row[1], row[0])) if ranked else (lambda row: (row[1], row[0]))
+        return base_query, order_params + params, sort_keys, per_page, key_of
 
     @staticmethod
     def count_clients(search_term: str = "") -> int:
         """
         Cuenta el total de clientes (con filtros opcionales).
         """
-        query = "SELECT COUNT(*) FROM clients WHERE 1=1"
-        params = []
+        search_clause, params = ClientService._build_search_filter(search_term)
+        query = f"SELECT COUNT(*) FROM clients WHERE 1=1 {search_clause}"
         
-        if search_term:
-            query += """
-                AND (
-                    unaccent(name) ILIKE unaccent(%s) OR 
-                    unaccent(cedula) ILIKE unaccent(%s) OR 
-                    unaccent(phone) ILIKE unaccent(%s) OR 
-                    unaccent(email) ILIKE unaccent(%s)
-                )
-            """
-            search_param = f"%{search_term}%"
-            params = [search_param] * 4
-        
-        with get_db() as cursor:
+        with get_db(readonly=True) as cursor:
             cursor.execute(query, params)
             return cursor.fetchone()[0]
 
+    @staticmethod
+    def typeahead(search_term: str = "", limit: int = 50) -> List[Client]:
+        """
+        Autocompletado de clientes (id, nombre, cédula, teléfono) desde el índice en memoria,
+        sin consultar la base de datos. Si el índice no está disponible usa la búsqueda paginada.
+        """
+        clients = client_search_index.search(search_term, limit)
+        if clients is None:
+            clients = ClientService.get_paginated_clients(page=1, per_page=limit, search_term=search_term)
+        return clients
+
     @staticmethod
     def get_all_clients_full_object() -> List[Client]:
         """
@@ -377,13 +448,13 @@ class ClientService(Observable):
                 client_data.get('birth_date')
             ))
             new_id = cursor.fetchone()[0]
-            ClientService().notify_all('CLIENT_CREATED', {'client_id': new_id})
-            return new_id
+        event_bus.publish(CLIENT_CREATED, {'client_id': new_id})
+        return new_id
 
     @staticmethod
     def get_clients_with_birthdays_in_month(month: int) -> List[Client]:
         """Obtiene clientes que cumplen años en el mes especificado"""
-        with get_db() as cursor:
+        with get_db(readonly=True) as cursor:
             cursor.execute("""
                 SELECT id, name, cedula, phone, email, address, birth_date, created_at, updated_at
                 FROM clients
@@ -410,7 +481,7 @@ class ClientService(Observable):
         """Obtiene la cantidad de personas que cumplen años hoy"""
         from datetime import date
         today = date.today()
-        with get_db() as cursor:
+        with get_db(readonly=True) as cursor:
             cursor.execute("""
                 SELECT COUNT(*)
                 FROM clients
@@ -418,3 +489,7 @@ class ClientService(Observable):
                 AND EXTRACT(DAY FROM birth_date) = %s
             """, (today.month, today.day))
             return cursor.fetchone()[0]
+
+
+# El índice de autocompletado se mantiene al día con los eventos de clientes
+event_bus.subscribe(client_search_index.on_event, CLIENT_EVENTS)
@@ -0,0 +1,88 @@
+"""
+Consultas sobre los agregados diarios (daily_metrics y daily_payment_metrics, migración 6).
+
+En una base sin esa migración, rollup_query() antepone a la consulta CTEs con los mismos
+nombres y columnas, calculadas en vivo desde las tablas de origen con la misma
+imputación que los triggers (ver m0006). La consulta no cambia y los reportes siguen
+funcionando, aunque recorriendo las tablas en lugar de un día por fila.
+"""
+import logging
+import re
+from core.database import get_db, Database
+
+logger = logging.getLogger(__name__)
+
+# None: aún no comprobado en este proceso
+_rollups_available = None
+
+_LIVE_ROLLUPS = """
+    daily_metrics AS (
+        SELECT
+            day,
+            SUM(pending) AS appointments_pending,
+            SUM(completed) AS appointments_completed,
+            SUM(cancelled) AS appointments_cancelled,
+            SUM(new_clients) AS new_clients,
+            SUM(debts_created) AS debts_created,
+            SUM(debt_created_amount) AS debt_created_amount,
+            SUM(debt_paid_amount) AS debt_paid_amount
+        FROM (
+            SELECT date AS day,
+                   (status = 'pending')::integer AS pending,
+                   (status = 'completed')::integer AS completed,
+                   (status = 'cancelled')::integer AS cancelled,
+                   0 AS new_clients, 0 AS debts_created,
+                   0::numeric AS debt_created_amount, 0::numeric AS debt_paid_amount
+            FROM appointments
+            WHERE date IS NOT NULL
+            UNION ALL
+            SELECT DATE(created_at), 0, 0, 0, 1, 0, 0, 0
+            FROM clients
+            UNION ALL
+            SELECT DATE(created_at), 0, 0, 0, 0, 1, amount, 0
+            FROM debts
+            UNION ALL
+            SELECT DATE(COALESCE(paid_at, created_at)), 0, 0, 0, 0, 0, 0, paid_amount
+            FROM debts
+            WHERE COALESCE(paid_amount, 0) <> 0
+        ) contributions
+        GROUP BY day
+    ),
+    daily_payment_metrics AS (
+        SELECT DATE(payment_date) AS day, method, status, COUNT(*) AS payment_count, SUM(amount) AS amount
+        FROM payments
+        GROUP BY DATE(payment_date), method, status
+    )
+"""
+
+
+def rollups_available() -> bool:
+    """Indica (una vez por proceso) si la base tiene las tablas de agregados diarios"""
+    global _rollups_available
+    if _rollups_available is None:
+        try:
+            with get_db(pool=Database.REPORTING, readonly=True) as cursor:
+                cursor.execute("""
+                    SELECT to_regclass('daily_metrics') IS NOT NULL
+                    AND to_regclass('daily_payment_metrics') IS NOT NULL
+                """)
+                _rollups_available = bool(cursor.fetchone()[0])
+        except Exception as e:
+            logger.error(f"No se pudo comprobar los agregados diarios: {e}")
+            return False
+        if not _rollups_available:
+            logger.warning(
+                "Agregados diarios no disponibles (python -m core.migrations upgrade); "
+                "los reportes se calculan desde las tablas"
+            )
+    return _rollups_available
+
+
+def rollup_query(query: str) -> str:
+    """`query` tal cual si existen los agregados diarios; si no, con sus equivalentes en vivo como CTEs"""
+    if rollups_available():
+        return query
+    body = query.lstrip()
+    if re.match(r"WITH\s", body, re.IGNORECASE):
+        return f"WITH {_LIVE_ROLLUPS},{body[4:]}"
+    return f"WITH {_LIVE_ROLLUPS} {body}"
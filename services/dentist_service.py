@@ -1,10 +1,14 @@
 from core.database import get_db, Database
+from core.cache import cached, invalidates
 from models.dentist import Dentist
 from typing import List, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Caché del listado de dentistas; la vacía cualquier alta, modificación o baja
+DENTISTS_CACHE = "dentists"
+
 class DentistService:
     @staticmethod
     def get_dentist_by_id(dentist_id: int) -> Optional[Dentist]:
@@ -31,6 +35,7 @@ class DentistService:
             return None
 
     @staticmethod
+    @cached(DENTISTS_CACHE, maxsize=64)
     def get_all_dentists(search_term=None) -> List[Dentist]:
         """Obtiene todos los dentistas, opcionalmente filtrados por un término de búsqueda."""
         query = """
@@ -57,6 +62,7 @@ class DentistService:
             return [Dentist(*row) for row in cursor.fetchall()]
 
     @staticmethod
+    @invalidates(DENTISTS_CACHE)
     def create_dentist(dentist_data: dict) -> Tuple[bool, str]:
         """Crea un nuevo dentista."""
         dentist = Dentist(
@@ -89,6 +95,7 @@ class DentistService:
             return False, f"Error al crear dentista: {e}"
 
     @staticmethod
+    @invalidates(DENTISTS_CACHE)
     def update_dentist(dentist_id: int, dentist_data: dict) -> Tuple[bool, str]:
         """Actualiza un dentista existente."""
         dentist = Dentist(
@@ -124,6 +131,7 @@ class DentistService:
             return False, f"Error al actualizar dentista: {e}"
 
     @staticmethod
+    @invalidates(DENTISTS_CACHE)
     def delete_dentist(dentist_id: int) -> Tuple[bool, str]:
         """Elimina un dentista por su ID."""
         # Antes de eliminar, verificar si el dentista tiene citas asociadas.
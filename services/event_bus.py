@@ -0,0 +1,190 @@
+"""
+Bus de eventos de la aplicación.
+
+- Los eventos son de tipos declarados en EVENT_TYPES, con los datos que requiere
+  cada uno; publicar un tipo desconocido o sin esos datos es un error de programación.
+- Las suscripciones son débiles cuando el manejador es un método: una vista que
+  ya no se usa no queda retenida por el bus y su suscripción desaparece sola.
+- Cada suscripción filtra por tipos de evento (todos si no se indican).
+- threaded=True entrega el evento en el hilo del bus, fuera de quien lo publica:
+  un manejador lento (recargar una vista) no demora la operación que lo originó.
+- Se mide el tiempo de cada manejador (ver stats); los que superan
+  EVENT_SLOW_HANDLER_MS quedan registrados en el log.
+"""
+import logging
+import queue
+import threading
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Tipos de evento
+CLIENT_CREATED = 'CLIENT_CREATED'
+CLIENT_UPDATED = 'CLIENT_UPDATED'
+CLIENT_DELETED = 'CLIENT_DELETED'
+APPOINTMENT_STATUS_CHANGED = 'APPOINTMENT_STATUS_CHANGED'
+
+# Tipo de evento -> datos obligatorios
+EVENT_TYPES = {
+    CLIENT_CREATED: ('client_id',),
+    CLIENT_UPDATED: ('client_id',),
+    CLIENT_DELETED: ('client_id',),
+    APPOINTMENT_STATUS_CHANGED: ('id', 'status'),
+}
+
+CLIENT_EVENTS = (CLIENT_CREATED, CLIENT_UPDATED, CLIENT_DELETED)
+
+
+@dataclass(frozen=True)
+class Event:
+    event_type: str
+    data: dict
+    published_at: float = field(default_factory=time.monotonic)
+
+
+class _Subscription:
+    """Manejador suscrito, con sus filtros y sus tiempos de entrega"""
+
+    def __init__(self, handler: Callable, event_types: Optional[Iterable[str]], threaded: bool, weak: bool):
+        if weak and hasattr(handler, '__self__'):
+            self._ref = weakref.WeakMethod(handler)
+        else:
+            self._ref = lambda: handler
+        self.name = getattr(handler, '__qualname__', repr(handler))
+        self.event_types = frozenset(event_types) if event_types else None
+        self.threaded = threaded
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    @property
+    def handler(self) -> Optional[Callable]:
+        return self._ref()
+
+    def wants(self, event_type: str) -> bool:
+        return self.event_types is None or event_type in self.event_types
+
+
+class EventBus:
+    def __init__(self):
+        self._subscriptions: List[_Subscription] = []
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+
+    def subscribe(self, handler: Callable, event_types: Optional[Iterable[str]] = None,
+                  threaded: bool = False, weak: bool = True) -> Callable:
+        """
+        Suscribe handler(event_type, data) a los tipos de evento indicados (todos si es None).
+        Con weak=True (por defecto) un método no retiene a su objeto; las funciones sueltas
+        se retienen siempre. Suscribir de nuevo el mismo manejador reemplaza la suscripción.
+        Retorna el manejador, para poder desuscribirlo.
+        """
+        unknown = set(event_types or ()) - EVENT_TYPES.keys()
+        if unknown:
+            raise ValueError(f"Tipos de evento desconocidos: {', '.join(sorted(unknown))}")
+        subscription = _Subscription(handler, event_types, threaded, weak)
+        with self._lock:
+            self._subscriptions = [
+                s for s in self._subscriptions if s.handler is not None and s.handler != handler
+            ] + [subscription]
+        return handler
+
+    def unsubscribe(self, handler: Callable):
+        with self._lock:
+            self._subscriptions = [
+                s for s in self._subscriptions if s.handler is not None and s.handler != handler
+            ]
+
+    def publish(self, event_type: str, data: Optional[dict] = None):
+        """
+        Entrega el evento a los suscriptores: en este hilo a los síncronos y en el hilo del
+        bus a los threaded. Los errores de un manejador se registran y no afectan a los demás
+        ni a quien publica.
+        """
+        data = data or {}
+        required = EVENT_TYPES.get(event_type)
+        if required is None:
+            raise ValueError(f"Tipo de evento desconocido: {event_type}")
+        missing = [key for key in required if key not in data]
+        if missing:
+            raise ValueError(f"Al evento {event_type} le faltan datos: {', '.join(missing)}")
+
+        event = Event(event_type, data)
+        with self._lock:
+            # Se aprovecha la publicación para descartar suscripciones de objetos ya liberados
+            self._subscriptions = [s for s in self._subscriptions if s.handler is not None]
+            subscriptions = [s for s in self._subscriptions if s.wants(event_type)]
+
+        threaded = [s for s in subscriptions if s.threaded]
+        if threaded:
+            self._ensure_worker()
+            self._queue.put((event, threaded))
+        for subscription in subscriptions:
+            if not subscription.threaded:
+                self._deliver(subscription, event)
+
+    def _deliver(self, subscription: _Subscription, event: Event):
+        handler = subscription.handler
+        if handler is None:
+            return
+        started = time.perf_counter()
+        try:
+            handler(event.event_type, event.data)
+        except Exception as e:
+            subscription.errors += 1
+            logger.error(f"Error en el manejador {subscription.name} del evento {event.event_type}: {str(e)}")
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            subscription.calls += 1
+            subscription.total_ms += elapsed_ms
+            subscription.max_ms = max(subscription.max_ms, elapsed_ms)
+            if elapsed_ms > settings.EVENT_SLOW_HANDLER_MS:
+                logger.warning(
+                    f"Manejador lento: {subscription.name} tardó {elapsed_ms:.0f} ms en {event.event_type}"
+                    f"{'' if subscription.threaded else ' (bloqueando a quien publicó)'}"
+                )
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run_worker, name="event-bus", daemon=True)
+                self._worker.start()
+
+    def _run_worker(self):
+        while True:
+            event, subscriptions = self._queue.get()
+            try:
+                for subscription in subscriptions:
+                    self._deliver(subscription, event)
+            finally:
+                self._queue.task_done()
+
+    def wait_idle(self):
+        """Espera a que se entreguen los eventos pendientes del hilo del bus"""
+        self._queue.join()
+
+    def stats(self) -> List[Dict]:
+        """Suscripciones vigentes con sus entregas, errores y tiempos (ms)"""
+        with self._lock:
+            subscriptions = [s for s in self._subscriptions if s.handler is not None]
+        return [
+            {
+                'handler': s.name,
+                'event_types': sorted(s.event_types) if s.event_types else None,
+                'threaded': s.threaded,
+                'calls': s.calls,
+                'errors': s.errors,
+                'avg_ms': s.total_ms / s.calls if s.calls else 0.0,
+                'max_ms': s.max_ms,
+            }
+            for s in subscriptions
+        ]
+
+
+event_bus = EventBus()
@@ -484,6 +484,51 @@ class HistoryService:
             logger.error(f"Error al eliminar tratamientos de historial para cita {appointment_id}: {e}")
             raise # Re-lanza la excepción para que la transacción principal pueda hacer rollback
 
+    @staticmethod
+    def add_pending_treatments_from_source(
+        client_id: int,
+        notes: str,
+        treatment_date: date,
+        cursor: psycopg2.extensions.cursor,
+        appointment_id: Optional[int] = None,
+        quote_id: Optional[int] = None
+    ) -> int:
+        """
+        Versión por lotes de add_client_treatment con quantity_to_mark_completed=0: registra
+        en el historial, con un único INSERT ... SELECT, todos los tratamientos de la cita
+        (appointment_treatments) o del presupuesto (quote_treatments) que aún no figuren.
+        Se espera el cursor de la transacción del AppointmentService/QuoteService.
+        Returns: cantidad de registros añadidos
+        """
+        if appointment_id is not None:
+            source_table, source_column, source_id = "appointment_treatments", "appointment_id", appointment_id
+            other_column = "quote_id"
+        else:
+            source_table, source_column, source_id = "quote_treatments", "quote_id", quote_id
+            other_column = "appointment_id"
+
+        cursor.execute(
+            f"""
+            INSERT INTO client_treatments (
+                client_id, treatment_id, treatment_date, notes,
+                created_at, updated_at, appointment_id, quote_id,
+                completed_quantity, total_quantity
+            )
+            SELECT %s, src.treatment_id, %s, %s, NOW(), NOW(), %s::integer, %s::integer, 0, MAX(src.quantity)
+            FROM {source_table} src
+            WHERE src.{source_column} = %s
+              AND NOT EXISTS (
+                  SELECT 1 FROM client_treatments ct
+                  WHERE ct.client_id = %s AND ct.treatment_id = src.treatment_id
+                    AND ct.{source_column} = %s AND ct.{other_column} IS NULL
+              )
+            GROUP BY src.treatment_id
+            """,
+            (client_id, treatment_date, notes, appointment_id, quote_id,
+             source_id, client_id, source_id)
+        )
+        return cursor.rowcount
+
 
     @staticmethod
     def add_medical_record(
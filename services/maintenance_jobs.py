@@ -0,0 +1,39 @@
+"""
+Tareas periódicas de mantenimiento de datos, ejecutadas por el planificador
+(core.scheduler) en segundo plano:
+
+- Citas pendientes cuya fecha y hora ya pasaron -> 'cancelled', cada
+  PENDING_APPOINTMENTS_SWEEP_MINUTES.
+- Presupuestos pendientes con la fecha de vencimiento pasada -> 'expired', según
+  QUOTE_EXPIRY_CRON (y una vez poco después del arranque, por si la aplicación
+  estuvo cerrada a esa hora).
+
+Ninguna corre durante la carga inicial: la primera ejecución se difiere
+MAINTENANCE_FIRST_RUN_DELAY segundos.
+"""
+from core.config import settings
+from core.scheduler import scheduler
+from services.appointment_service import AppointmentService
+from services.quote_service import QuoteService
+
+CANCEL_PAST_APPOINTMENTS_JOB = "cancel_past_pending_appointments"
+EXPIRE_QUOTES_JOB = "expire_past_quotes"
+EXPIRE_QUOTES_AT_STARTUP_JOB = "expire_past_quotes_startup"
+
+
+def register_maintenance_jobs():
+    """Registra las tareas en el planificador (registrarlas de nuevo las reemplaza)"""
+    delay = settings.MAINTENANCE_FIRST_RUN_DELAY
+    scheduler.add_interval_job(
+        CANCEL_PAST_APPOINTMENTS_JOB,
+        AppointmentService.cancel_past_pending_appointments,
+        seconds=settings.PENDING_APPOINTMENTS_SWEEP_MINUTES * 60,
+        first_run_in=delay
+    )
+    scheduler.add_cron_job(EXPIRE_QUOTES_JOB, QuoteService.expire_past_quotes, settings.QUOTE_EXPIRY_CRON)
+    scheduler.add_once_job(EXPIRE_QUOTES_AT_STARTUP_JOB, QuoteService.expire_past_quotes, delay=delay)
+
+
+def start_maintenance():
+    register_maintenance_jobs()
+    scheduler.start()
@@ -0,0 +1,51 @@
+"""
+Agregados diarios (daily_metrics / daily_payment_metrics, migración 6).
+
+Los triggers de la base los mantienen al día; este módulo solo los reconstruye
+cuando hace falta (datos cargados con los triggers desactivados, restauraciones).
+
+Uso (desde la raíz del proyecto, con la base de datos configurada en .env):
+    python -m services.metrics_service backfill [desde AAAA-MM-DD] [hasta AAAA-MM-DD]
+"""
+import logging
+import sys
+from datetime import date
+from typing import Optional
+from core.database import get_db, Database
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsService:
+    @staticmethod
+    def backfill(start_date: Optional[date] = None, end_date: Optional[date] = None) -> int:
+        """
+        Recalcula desde las tablas de origen los agregados de los días entre `start_date`
+        y `end_date` (todos si son None). Retorna la cantidad de días con datos.
+        """
+        with get_db() as cursor:
+            cursor.execute("SELECT daily_metrics_backfill(%s, %s)", (start_date, end_date))
+            Database.note_write(cursor)
+            days = cursor.fetchone()[0] or 0
+        logger.info(f"Agregados diarios recalculados: {days} días ({start_date or 'inicio'} a {end_date or 'hoy'})")
+        return days
+
+
+def main(argv) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if not argv or argv[0] != "backfill":
+        print(__doc__)
+        return 1
+    start_date = date.fromisoformat(argv[1]) if len(argv) > 1 else None
+    end_date = date.fromisoformat(argv[2]) if len(argv) > 2 else None
+
+    Database.initialize()
+    try:
+        MetricsService.backfill(start_date, end_date)
+    finally:
+        Database.close_all_connections()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
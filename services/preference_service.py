@@ -1,9 +1,15 @@
 import logging
-from core.database import get_db
+from core.database import get_db, Database
+from core.cache import cache_key, cached, invalidates
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+Database.register_statement(
+    "user_theme",
+    "SELECT theme_mode FROM user_preferences WHERE user_id = %s"
+)
+
 class PreferenceService:
     @staticmethod
     def get_user_theme(user_id: int) -> str:
@@ -12,23 +18,29 @@ class PreferenceService:
         Retorna 'light' si no se encuentra o hay un error.
         """
         try:
-            with get_db() as cursor:
-                cursor.execute(
-                    "SELECT theme_mode FROM user_preferences WHERE user_id = %s",
-                    (user_id,)
-                )
-                result = cursor.fetchone()
-                if result:
-                    logger.info(f"Tema encontrado para el usuario {user_id}: {result[0]}")
-                    return result[0]
-                else:
-                    logger.info(f"No se encontró preferencia de tema para el usuario {user_id}. Usando 'light' por defecto.")
-                    return 'light' # Tema por defecto si no se encuentra preferencia
+            theme = PreferenceService._load_user_theme(user_id)
+            if theme:
+                return theme
+            logger.info(f"No se encontró preferencia de tema para el usuario {user_id}. Usando 'light' por defecto.")
+            return 'light' # Tema por defecto si no se encuentra preferencia
         except Exception as e:
             logger.error(f"Error al obtener la preferencia de tema para el usuario {user_id}: {e}")
             return 'light' # Fallback en caso de error
 
     @staticmethod
+    @cached("user_preferences", ttl=3600)
+    def _load_user_theme(user_id: int):
+        """Tema guardado del usuario, o None si no tiene preferencia"""
+        with get_db() as cursor:
+            Database.execute_prepared(cursor, "user_theme", (user_id,))
+            result = cursor.fetchone()
+            if result:
+                logger.info(f"Tema encontrado para el usuario {user_id}: {result[0]}")
+                return result[0]
+            return None
+
+    @staticmethod
+    @invalidates("user_preferences", key=lambda user_id, theme_mode: cache_key(PreferenceService._load_user_theme, user_id))
     def save_user_theme(user_id: int, theme_mode: str) -> bool:
         """
         Guarda o actualiza el modo de tema para un usuario.
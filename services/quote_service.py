@@ -1,6 +1,9 @@
 from datetime import date, datetime
+from core.cache import cache_key, cached, invalidates
+from core.config import settings
 from core.database import get_db, Database # Asegúrate de que get_db y Database estén correctamente importados
-from typing import List, Dict, Optional
+from core.pagination import Page, fetch_page
+from typing import List, Dict, Optional, Tuple
 from services.treatment_service import TreatmentService
 from services.payment_service import PaymentService # Importar PaymentService
 from services.history_service import HistoryService # Importar HistoryService
@@ -15,46 +18,85 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Caché del presupuesto pendiente por cliente (lecturas sin cursor externo)
+PENDING_QUOTES_CACHE = "pending_quotes"
+
 class QuoteService:
     @staticmethod
     def get_pending_quote_by_client_id(client_id: int, cursor=None) -> Optional[Dict]:
-        """Obtiene el presupuesto pendiente de un cliente si existe."""
-        query = """
-            SELECT id, discount, notes, total_amount
-            FROM quotes
-            WHERE client_id = %s AND status = 'pending'
-            ORDER BY created_at DESC
-            LIMIT 1
+        """
+        Obtiene el presupuesto pendiente de un cliente si existe.
+        Sin cursor se sirve desde la caché; con cursor (dentro de una transacción) se lee siempre.
         """
         try:
             if cursor:
-                cursor.execute(query, (client_id,))
-                row = cursor.fetchone()
-                if row:
-                    return {
-                        'id': row[0],
-                        'discount': float(row[1]) if row[1] is not None else 0.0,
-                        'notes': row[2],
-                        'total_amount': float(row[3]) if row[3] is not None else 0.0
-                    }
-                return None
-            else:
-                with get_db() as cursor:
-                    cursor.execute(query, (client_id,))
-                    row = cursor.fetchone()
-                    if row:
-                        return {
-                            'id': row[0],
-                            'discount': float(row[1]) if row[1] is not None else 0.0,
-                            'notes': row[2],
-                            'total_amount': float(row[3]) if row[3] is not None else 0.0
-                        }
-                    return None
+                return QuoteService._fetch_pending_quote(cursor, client_id)
+            return QuoteService._load_pending_quote(client_id)
         except Exception as e:
             logger.error(f"Error al obtener presupuesto pendiente de cliente {client_id}: {str(e)}")
             return None
 
     @staticmethod
+    @cached(PENDING_QUOTES_CACHE)
+    def _load_pending_quote(client_id: int) -> Optional[Dict]:
+        with get_db() as cursor:
+            return QuoteService._fetch_pending_quote(cursor, client_id)
+
+    @staticmethod
+    def _fetch_pending_quote(cursor, client_id: int) -> Optional[Dict]:
+        cursor.execute(
+            """
+            SELECT id, discount, notes, total_amount
+            FROM quotes
+            WHERE client_id = %s AND status = 'pending'
+            ORDER BY created_at DESC
+            LIMIT 1
+            """,
+            (client_id,)
+        )
+        row = cursor.fetchone()
+        if row:
+            return {
+                'id': row[0],
+                'discount': float(row[1]) if row[1] is not None else 0.0,
+                'notes': row[2],
+                'total_amount': float(row[3]) if row[3] is not None else 0.0
+            }
+        return None
+
+    @staticmethod
+    def _insert_quote_lines(cur, quote_id: int, client_id: int, treatments: List[Dict]) -> List[str]:
+        """
+        Inserta los tratamientos del presupuesto y los registra como "pendientes" en el
+        historial del cliente con un número fijo de consultas, sin importar cuántas líneas
+        tenga. Retorna las partes de la descripción de la deuda.
+        """
+        # Crear los tratamientos que no existan y obtener sus IDs
+        treatment_ids = TreatmentService.get_or_create_treatments(treatments, cursor=cur)
+
+        Database.insert_many(
+            cur,
+            "quote_treatments",
+            ("quote_id", "treatment_id", "quantity", "price_at_quote"),
+            [(quote_id, treatment_ids[t['name'].lower()], t['quantity'], t['price']) for t in treatments]
+        )
+
+        # Añadir los tratamientos al historial del cliente como "pendientes" del presupuesto
+        HistoryService.add_pending_treatments_from_source(
+            client_id=client_id,
+            notes=f"Asociado a presupuesto ID: {quote_id}",
+            treatment_date=date.today(), # Fecha actual como fecha de registro en historial
+            cursor=cur,
+            quote_id=quote_id
+        )
+
+        return [f"{t.get('name', 'Desconocido')} ({t.get('quantity', 1)}x)" for t in treatments]
+
+    @staticmethod
+    @invalidates(
+        PENDING_QUOTES_CACHE,
+        key=lambda client_id, *args, **kwargs: cache_key(QuoteService._load_pending_quote, client_id)
+    )
     def create_quote(
         client_id: int,
         treatments: List[Dict],
@@ -87,38 +129,8 @@ class QuoteService:
                 )
                 quote_id = cur.fetchone()[0]
                 
-                # Crear una descripción de deuda combinada para todos los tratamientos del presupuesto
-                debt_description_parts = []
-
-                # Agregar tratamientos asociados al presupuesto
-                for treatment in treatments:
-                    # Crear tratamiento si no existe y obtener su ID
-                    treatment_id = TreatmentService.create_treatment_if_not_exists(
-                        name=treatment['name'],
-                        price=treatment['price']
-                    )
-                    
-                    debt_description_parts.append(f"{treatment.get('name', 'Desconocido')} ({treatment.get('quantity', 1)}x)")
-
-                    cur.execute(
-                        """
-                        INSERT INTO quote_treatments 
-                        (quote_id, treatment_id, quantity, price_at_quote)
-                        VALUES (%s, %s, %s, %s)
-                        """,
-                        (quote_id, treatment_id, treatment['quantity'], treatment['price'])
-                    )
-
-                    # Añadir el tratamiento al historial del cliente como "pendiente" del presupuesto
-                    HistoryService.add_client_treatment(
-                        client_id=client_id,
-                        treatment_id=treatment_id,
-                        notes=f"Asociado a presupuesto ID: {quote_id}",
-                        treatment_date=date.today(), # Fecha actual como fecha de registro en historial
-                        quote_id=quote_id,
-                        quantity_to_mark_completed=0, # Inicialmente, no hay cantidad completada de este presupuesto
-                        cursor=cur # Pasa el cursor para que sea parte de la misma transacción
-                    )
+                # Agregar tratamientos asociados al presupuesto (y al historial del cliente)
+                debt_description_parts = QuoteService._insert_quote_lines(cur, quote_id, client_id, treatments)
                 
                 final_debt_description = f"Presupuesto #{quote_id}: " + ", ".join(debt_description_parts)
 
@@ -223,6 +235,109 @@ class QuoteService:
                 'treatments': treatments
             }
 
+    @staticmethod
+    def _build_quote_filters(
+        search_term: Optional[str] = None,
+        status_filter: Optional[str] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None
+    ) -> Tuple[str, list]:
+        """Construye los filtros (a continuación de WHERE 1=1) y sus parámetros para los listados de presupuestos"""
+        clause = ""
+        params = []
+
+        if search_term:
+            clause += " AND (c.name ILIKE %s OR c.cedula ILIKE %s OR c.phone ILIKE %s OR c.email ILIKE %s)"
+            params.extend([f"%{search_term}%"] * 4)
+
+        if status_filter and status_filter != "all":
+            clause += " AND q.status = %s"
+            params.append(status_filter)
+
+        if start_date:
+            clause += " AND q.quote_date >= %s"
+            params.append(start_date)
+
+        if end_date:
+            clause += " AND q.quote_date <= %s"
+            params.append(end_date)
+
+        return clause, params
+
+    @staticmethod
+    def _quote_from_row(row_dict: Dict) -> Dict:
+        """Normaliza una fila de listado de presupuestos (numéricos a float, resumen JSON a lista)"""
+        if 'total_amount' in row_dict:
+            row_dict['total_amount'] = float(row_dict['total_amount'])
+        if 'discount' in row_dict: # Asegura que el descuento sea un float
+            row_dict['discount'] = float(row_dict['discount'])
+
+        # Cargar treatments_summary si es una cadena JSON
+        if isinstance(row_dict.get('treatments_summary'), str):
+            try:
+                row_dict['treatments_summary'] = json.loads(row_dict['treatments_summary'])
+            except json.JSONDecodeError:
+                logger.error(f"Error al decodificar JSON para treatments_summary en quote ID {row_dict.get('id')}")
+                row_dict['treatments_summary'] = [] # Vacío si falla
+        return row_dict
+
+    @staticmethod
+    def get_quotes_page(
+        search_term: Optional[str] = None,
+        status_filter: Optional[str] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        from_end: bool = False,
+        total: Optional[str] = settings.LIST_TOTAL_MODE
+    ) -> Page:
+        """
+        Página de presupuestos por clave (keyset), más recientes primero (id como desempate):
+        `cursor` es el next_cursor/prev_cursor anterior. Los tratamientos se agregan solo
+        para las filas de la página y el total ('exact', 'estimated' o None) llega en la
+        misma consulta.
+        """
+        filter_clause, params = QuoteService._build_quote_filters(search_term, status_filter, start_date, end_date)
+        base_query = f"""
+            SELECT 
+                q.id, q.client_id, q.quote_date, q.expiration_date, q.total_amount, q.status, q.notes, q.discount,
+                c.name AS client_name, c.cedula AS client_cedula, c.phone AS client_phone, c.email AS client_email, c.address AS client_address
+            FROM quotes q
+            JOIN clients c ON q.client_id = c.id
+            WHERE 1=1 {filter_clause}
+        """
+        treatments_join = """
+            LEFT JOIN LATERAL (
+                SELECT COALESCE(
+                    JSON_AGG(
+                        JSON_BUILD_OBJECT(
+                            'id', t.id,
+                            'name', t.name,
+                            'quantity', qt.quantity,
+                            'price_at_quote', qt.price_at_quote,
+                            'subtotal', qt.subtotal
+                        )
+                        ORDER BY t.name
+                    ),
+                    '[]'::json
+                ) AS treatments_summary
+                FROM quote_treatments qt
+                JOIN treatments t ON qt.treatment_id = t.id
+                WHERE qt.quote_id = keyset_page.id
+            ) ts ON true
+        """
+
+        with get_db(readonly=True) as db_cursor:
+            page = fetch_page(
+                db_cursor, base_query, params, ["quote_date", "id"], limit,
+                lambda row: (row['quote_date'], row['id']),
+                cursor=cursor, descending=True, from_end=from_end, total=total,
+                extra_columns=", ts.treatments_summary", extra_joins=treatments_join, as_dict=True
+            )
+        page.items = [QuoteService._quote_from_row(row) for row in page.items]
+        return page
+
     @staticmethod
     def get_all_quotes(
         search_term: Optional[str] = None, 
@@ -256,24 +371,8 @@ class QuoteService:
             LEFT JOIN treatments t ON qt.treatment_id = t.id
             WHERE 1=1
         """
-        params = []
-
-        if search_term:
-            query += " AND (c.name ILIKE %s OR c.cedula ILIKE %s OR c.phone ILIKE %s OR c.email ILIKE %s)"
-            params.extend([f"%{search_term}%", f"%{search_term}%", f"%{search_term}%", f"%{search_term}%"])
-        
-        if status_filter and status_filter != "all":
-            query += " AND q.status = %s"
-            params.append(status_filter)
-        
-        if start_date:
-            query += " AND q.quote_date >= %s"
-            params.append(start_date)
-        
-        if end_date:
-            query += " AND q.quote_date <= %s"
-            params.append(end_date)
-            
+        filter_clause, params = QuoteService._build_quote_filters(search_term, status_filter, start_date, end_date)
+        query += filter_clause
         query += """
             GROUP BY q.id, q.client_id, q.quote_date, q.expiration_date, q.total_amount, q.status, q.notes, q.discount,
                      c.name, c.cedula, c.phone, c.email, c.address
@@ -284,28 +383,13 @@ class QuoteService:
             query += " LIMIT %s OFFSET %s"
             params.extend([limit, offset])
 
-        with get_db() as cursor:
+        with get_db(readonly=True) as cursor:
             cursor.execute(query, params)
             
             col_names = [desc[0] for desc in cursor.description]
             results = []
             for row in cursor.fetchall():
-                row_dict = dict(zip(col_names, row))
-                
-                # Convertir a float los campos numéricos que lo requieran
-                if 'total_amount' in row_dict:
-                    row_dict['total_amount'] = float(row_dict['total_amount'])
-                if 'discount' in row_dict: # Asegura que el descuento sea un float
-                    row_dict['discount'] = float(row_dict['discount'])
-
-                # Cargar treatments_summary si es una cadena JSON
-                if isinstance(row_dict.get('treatments_summary'), str):
-                    try:
-                        row_dict['treatments_summary'] = json.loads(row_dict['treatments_summary'])
-                    except json.JSONDecodeError:
-                        logger.error(f"Error al decodificar JSON para treatments_summary en quote ID {row_dict.get('id')}")
-                        row_dict['treatments_summary'] = [] # Vacío si falla
-                results.append(row_dict)
+                results.append(QuoteService._quote_from_row(dict(zip(col_names, row))))
             return results
 
     @staticmethod
@@ -322,30 +406,17 @@ class QuoteService:
             JOIN clients c ON q.client_id = c.id
             WHERE 1=1
         """
-        params = []
+        filter_clause, params = QuoteService._build_quote_filters(search_term, status_filter, start_date, end_date)
+        query += filter_clause
 
-        if search_term:
-            query += " AND (c.name ILIKE %s OR c.cedula ILIKE %s OR c.phone ILIKE %s OR c.email ILIKE %s)"
-            params.extend([f"%{search_term}%", f"%{search_term}%", f"%{search_term}%", f"%{search_term}%"])
-        
-        if status_filter and status_filter != "all":
-            query += " AND q.status = %s"
-            params.append(status_filter)
-        
-        if start_date:
-            query += " AND q.quote_date >= %s"
-            params.append(start_date)
-        
-        if end_date:
-            query += " AND q.quote_date <= %s"
-            params.append(end_date)
-            
-        with get_db() as cursor:
+        with get_db(readonly=True) as cursor:
             cursor.execute(query, params)
             count = cursor.fetchone()[0]
             return count
 
     @staticmethod
+    # Se vacía toda la caché: el presupuesto puede pasar a otro cliente
+    @invalidates(PENDING_QUOTES_CACHE)
     def update_quote(
         quote_id: int,
         client_id: int,
@@ -398,37 +469,8 @@ class QuoteService:
                     (quote_id,)
                 )
 
-                # Crear una descripción de deuda combinada para todos los tratamientos del presupuesto
-                debt_description_parts = []
-
-                # Insertar tratamientos actualizados
-                for treatment in treatments:
-                    # Crear tratamiento si no existe y obtener su ID
-                    treatment_id = TreatmentService.create_treatment_if_not_exists(
-                        name=treatment['name'],
-                        price=treatment['price']
-                    )
-                    
-                    debt_description_parts.append(f"{treatment.get('name', 'Desconocido')} ({treatment.get('quantity', 1)}x)")
-
-                    cur.execute(
-                        """
-                        INSERT INTO quote_treatments 
-                        (quote_id, treatment_id, quantity, price_at_quote)
-                        VALUES (%s, %s, %s, %s)
-                        """,
-                        (quote_id, treatment_id, treatment['quantity'], treatment['price'])
-                    )
-                    # Añadir el tratamiento al historial del cliente como "pendiente" del presupuesto
-                    HistoryService.add_client_treatment(
-                        client_id=client_id,
-                        treatment_id=treatment_id,
-                        notes=f"Asociado a presupuesto ID: {quote_id}",
-                        treatment_date=date.today(), # Fecha actual como fecha de registro en historial
-                        quote_id=quote_id,
-                        quantity_to_mark_completed=0, # Inicialmente, no hay cantidad completada de este presupuesto
-                        cursor=cur # Pasa el cursor
-                    )
+                # Insertar tratamientos actualizados (y su historial)
+                debt_description_parts = QuoteService._insert_quote_lines(cur, quote_id, client_id, treatments)
 
                 final_debt_description = f"Presupuesto #{quote_id}: " + ", ".join(debt_description_parts)
 
@@ -460,6 +502,7 @@ class QuoteService:
             return False
 
     @staticmethod
+    @invalidates(PENDING_QUOTES_CACHE)
     def delete_quote(quote_id: int) -> bool:
         """Elimina un presupuesto y sus tratamientos asociados, y la deuda asociada."""
         try:
@@ -490,6 +533,7 @@ class QuoteService:
             return False
 
     @staticmethod
+    @invalidates(PENDING_QUOTES_CACHE)
     def update_quote_status(quote_id: int, new_status: str) -> bool:
         """Actualiza el estado de un presupuesto."""
         try:
@@ -503,6 +547,33 @@ class QuoteService:
             logger.error(f"Error al actualizar estado de presupuesto {quote_id}: {str(e)}")
             return False
 
+    @staticmethod
+    @invalidates(PENDING_QUOTES_CACHE)
+    def expire_past_quotes() -> int:
+        """
+        Marca como 'expired' los presupuestos pendientes cuya fecha de vencimiento ya pasó.
+        Retorna cuántos presupuestos se vencieron.
+        """
+        try:
+            with get_db() as cursor:
+                cursor.execute(
+                    """
+                    UPDATE quotes
+                    SET status = 'expired', updated_at = NOW()
+                    WHERE status = 'pending'
+                    AND expiration_date < CURRENT_DATE
+                    RETURNING id
+                    """
+                )
+                expired_ids = [row[0] for row in cursor.fetchall()]
+
+            if expired_ids:
+                logger.info(f"Total de {len(expired_ids)} presupuestos vencidos marcados como 'expired': {expired_ids}")
+            return len(expired_ids)
+        except Exception as e:
+            logger.error(f"Error al vencer presupuestos pasados: {str(e)}")
+            return 0
+
     @staticmethod
     def get_quote_treatments(quote_id: int) -> List[Dict]:
         """Obtiene los tratamientos asociados a un presupuesto."""
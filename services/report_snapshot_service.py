@@ -0,0 +1,112 @@
+import json
+import logging
+from datetime import date
+from typing import Any, Callable, Dict
+from core.database import get_db, Database
+
+logger = logging.getLogger(__name__)
+
+
+class ReportSnapshotService:
+    """
+    Almacén persistente (report_snapshots, migración 7) de reportes de periodos cerrados.
+
+    Un periodo que terminó antes de hoy se calcula una vez y luego se sirve desde la
+    tabla. Se recalcula solo si:
+    - algún día del periodo se modificó después del cálculo (updated_at de los
+      agregados diarios, que los triggers marcan ante cualquier edición tardía), o
+    - pasó el próximo vencimiento de una deuda pendiente del periodo (valid_until),
+      porque cambia lo que se considera vencido.
+    El periodo abierto (que incluye hoy) se calcula siempre.
+    """
+
+    @staticmethod
+    def get_or_compute(report_type: str, start_date: date, end_date: date,
+                       compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Reporte `report_type` del periodo, desde la instantánea si sigue vigente o calculándolo con `compute`"""
+        if end_date >= date.today():
+            return compute()
+
+        try:
+            with get_db(pool=Database.REPORTING, readonly=True) as cursor:
+                cursor.execute("""
+                    SELECT s.data
+                    FROM report_snapshots s
+                    WHERE s.report_type = %s AND s.period_start = %s AND s.period_end = %s
+                    AND (s.valid_until IS NULL OR CURRENT_DATE <= s.valid_until)
+                    AND NOT EXISTS (
+                        SELECT 1 FROM daily_metrics
+                        WHERE day BETWEEN s.period_start AND s.period_end AND updated_at >= s.computed_at
+                    )
+                    AND NOT EXISTS (
+                        SELECT 1 FROM daily_payment_metrics
+                        WHERE day BETWEEN s.period_start AND s.period_end AND updated_at >= s.computed_at
+                    )
+                """, (report_type, start_date, end_date))
+                row = cursor.fetchone()
+            if row:
+                return row[0]
+        except Exception as e:
+            # Sin la migración 7 (o con la base en solo lectura) el reporte se calcula igual
+            logger.error(f"No se pudo leer la instantánea del reporte {report_type}: {str(e)}")
+            return compute()
+
+        computed = []
+
+        def compute_once():
+            computed.append(compute())
+            return computed[0]
+
+        try:
+            return ReportSnapshotService._store(report_type, start_date, end_date, compute_once)
+        except Exception as e:
+            # El reporte no depende de poder guardarlo: sin instantánea se sirve lo calculado
+            logger.error(f"No se pudo guardar la instantánea del reporte {report_type}: {str(e)}")
+            return computed[0] if computed else compute()
+
+    @staticmethod
+    def _store(report_type: str, start_date: date, end_date: date,
+               compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        # Una sola conexión al primario para la marca, el cálculo y el guardado: las
+        # lecturas de compute no pueden ir a una réplica atrasada respecto de la marca
+        with Database.session(pool=Database.REPORTING), get_db(pool=Database.REPORTING) as cursor:
+            # Marca del cálculo: el inicio de la transacción en curso más antigua, para que
+            # una edición aún sin confirmar (invisible para compute) lo deje obsoleto al confirmarse
+            cursor.execute("""
+                SELECT LEAST(now(), MIN(xact_start))::timestamp
+                FROM pg_stat_activity
+                WHERE datname = current_database() AND xact_start IS NOT NULL
+            """)
+            computed_at = cursor.fetchone()[0]
+            # Próximo vencimiento de una deuda pendiente del periodo
+            cursor.execute("""
+                SELECT MIN(due_date)
+                FROM debts
+                WHERE status = 'pending' AND due_date >= CURRENT_DATE
+                AND created_at >= %s AND created_at < %s::date + 1
+            """, (start_date, end_date))
+            valid_until = cursor.fetchone()[0]
+
+            data = compute()
+
+            cursor.execute("""
+                INSERT INTO report_snapshots (report_type, period_start, period_end, data, computed_at, valid_until)
+                VALUES (%s, %s, %s, %s::jsonb, %s, %s)
+                ON CONFLICT (report_type, period_start, period_end) DO UPDATE SET
+                    data = EXCLUDED.data,
+                    computed_at = EXCLUDED.computed_at,
+                    valid_until = EXCLUDED.valid_until
+            """, (report_type, start_date, end_date, json.dumps(data, default=str), computed_at, valid_until))
+        logger.info(f"Instantánea del reporte {report_type} ({start_date} a {end_date}) guardada")
+        # Se devuelve tal como se leerá luego de la tabla (fechas como texto)
+        return json.loads(json.dumps(data, default=str))
+
+    @staticmethod
+    def invalidate(report_type: str = None) -> int:
+        """Descarta las instantáneas (de un tipo de reporte o todas); se recalcularán al pedirse"""
+        with get_db(pool=Database.REPORTING) as cursor:
+            if report_type:
+                cursor.execute("DELETE FROM report_snapshots WHERE report_type = %s", (report_type,))
+            else:
+                cursor.execute("DELETE FROM report_snapshots")
+            return cursor.rowcount
@@ -1,14 +1,60 @@
+import logging
+import threading
+import time
 from datetime import date, timedelta
-from core.database import get_db
+from core.database import get_db, get_db_async, Database
 from typing import Dict, Any
+from services.timeseries_service import TimeSeriesService
+from services.daily_metrics import rollup_query
+
+# NumPy es opcional: sin él detect_anomalies no marca anomalías
+try:
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+except ImportError:
+    np = None
+    sliding_window_view = None
+
+logger = logging.getLogger(__name__)
+
+# Ventanas de StatsService.compare_windows
+COMPARE_PREVIOUS = 'previous'
+COMPARE_YEAR_AGO = 'year_ago'
+COMPARE_TRAILING = 'trailing'
+# Columnas por ventana de StatsService._window_columns: totales y KPIs derivados
+WINDOW_TOTALS = ('appointments', 'completed', 'cancelled', 'revenue', 'payment_count')
+KPI_METRICS = (
+    'conversion_rate', 'avg_revenue_per_appointment', 'cancellation_rate',
+    'revenue_per_day', 'appointments_per_day'
+)
+
+# Métricas diarias que analiza detect_anomalies (columnas de _daily_metric_series)
+ANOMALY_METRICS = ('revenue', 'appointments', 'cancellations', 'new_clients')
+ANOMALY_WINDOW_DAYS = 28
+ANOMALY_CACHE_MAX_ENTRIES = 32
+ANOMALY_CACHE_OPEN_TTL = 300  # segundos, rangos que incluyen hoy
+ANOMALY_CACHE_CLOSED_TTL = 3600  # segundos, rangos cerrados
+
 
 class StatsService:
-    """Servicio para generar estadísticas del sistema"""
+    """Servicio para generar estadísticas del sistema (usa el pool de reportes)"""
+    # Resultados de detect_anomalies: clave -> (expira, anomalías)
+    _anomaly_cache: Dict[tuple, tuple] = {}
+    _anomaly_cache_lock = threading.Lock()
     # Add these new methods to the StatsService class
 
     @staticmethod
     def get_kpi_metrics(start_date: date, end_date: date) -> Dict[str, Any]:
-        """Calcula métricas KPI para el periodo especificado
+        """Calcula métricas KPI para el periodo especificado (desde los agregados diarios)
+        
+        Desde que se calculan con los agregados diarios los valores difieren de los de las
+        consultas directas anteriores:
+        - el periodo incluye completo el último día (pagos de todo end_date);
+        - revenue_per_day y appointments_per_day dividen por la cantidad de días del
+          periodo contando ambos extremos, (fin - inicio).days + 1, en lugar de
+          (fin - inicio).days;
+        - appointments_per_day usa el total real de citas: sin citas vale 0 (antes 1/días).
+        Las tasas siguen dividiendo por max(1, total de citas).
         
         Args:
             start_date: Fecha de inicio
@@ -17,44 +63,141 @@ class StatsService:
         Returns:
             dict: Diccionario con métricas KPI
         """
-        with get_db() as cursor:
-            # Citas totales y estados
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) as total,
-                    SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as completed,
-                    SUM(CASE WHEN status = 'cancelled' THEN 1 ELSE 0 END) as cancelled
-                FROM appointments 
-                WHERE date BETWEEN %s AND %s
-            """, (start_date, end_date))
-            appointments = cursor.fetchone()
-            
-            # Ingresos
-            cursor.execute("""
-                SELECT COALESCE(SUM(amount), 0), COUNT(*)
-                FROM payments
-                WHERE status = 'completed'
-                AND payment_date BETWEEN %s AND %s
-            """, (start_date, end_date))
-            revenue, payment_count = cursor.fetchone()
-            
-            # Calcular KPIs
-            total_appointments = appointments[0] or 1  # Evitar división por cero
-            conversion_rate = (appointments[1] or 0) / total_appointments
-            avg_revenue_per_appointment = (revenue or 0) / total_appointments
-            cancellation_rate = (appointments[2] or 0) / total_appointments
+        columns = StatsService._window_columns([('current', start_date, end_date)])
+        return {key: columns[key][0] for key in KPI_METRICS}
+
+    @staticmethod
+    def compare_windows(start_date: date, end_date: date, previous: bool = True,
+                        year_ago: bool = False, trailing: int = 0) -> Dict[str, Any]:
+        """Compara el periodo con otras ventanas en una sola consulta
+        
+        Args:
+            start_date: Inicio del periodo actual
+            end_date: Fin del periodo actual
+            previous: Incluir el periodo anterior de igual duración
+            year_ago: Incluir el mismo periodo del año anterior
+            trailing: Cantidad de periodos consecutivos anteriores a incluir ('trailing_1' es el más cercano)
             
-            return {
-                'conversion_rate': conversion_rate,
-                'avg_revenue_per_appointment': avg_revenue_per_appointment,
-                'cancellation_rate': cancellation_rate,
-                'revenue_per_day': (revenue or 0) / max(1, (end_date - start_date).days),
-                'appointments_per_day': total_appointments / max(1, (end_date - start_date).days)
-            }
+        Returns:
+            Dict: Columnas alineadas por ventana: 'window' (etiquetas, la primera es 'current'),
+            'start', 'end', una lista por total y KPI, y en 'change' el cambio relativo del
+            periodo actual respecto de cada ventana (None en 'current' o si la ventana vale cero).
+            Para un gráfico basta con zip(result['window'], result['revenue'])
+            Los KPIs se calculan igual que en get_kpi_metrics (ver allí los cambios respecto
+            de las consultas directas anteriores)
+        """
+        windows = StatsService.comparison_windows(start_date, end_date, previous, year_ago, trailing)
+        return StatsService._window_columns(windows)
+
+    @staticmethod
+    def comparison_windows(start_date: date, end_date: date, previous: bool = True,
+                           year_ago: bool = False, trailing: int = 0) -> list[tuple]:
+        """Ventanas (etiqueta, inicio, fin) de compare_windows; la primera es el periodo actual"""
+        length = end_date - start_date + timedelta(days=1)
+        windows = [('current', start_date, end_date)]
+        if previous:
+            windows.append((COMPARE_PREVIOUS, start_date - length, end_date - length))
+        if year_ago:
+            windows.append((COMPARE_YEAR_AGO, StatsService._year_before(start_date), StatsService._year_before(end_date)))
+        for n in range(1, trailing + 1):
+            windows.append((f'{COMPARE_TRAILING}_{n}', start_date - length * n, end_date - length * n))
+        return windows
+
+    @staticmethod
+    def _year_before(day: date) -> date:
+        try:
+            return day.replace(year=day.year - 1)
+        except ValueError:  # 29 de febrero
+            return day.replace(year=day.year - 1, day=28)
+
+    @staticmethod
+    def _window_columns(windows: list[tuple]) -> Dict[str, Any]:
+        """
+        Totales y KPIs de cada ventana (etiqueta, inicio, fin) en una sola consulta: cada
+        agregado diario se recorre una vez sobre la unión de las ventanas y cada día se
+        suma a todas las ventanas que lo contienen (agregación condicional por ventana).
+        """
+        values = ", ".join(["(%s, %s::date, %s::date)"] * len(windows))
+        params = [value for idx, (_, start, end) in enumerate(windows) for value in (idx, start, end)]
+        low = min(start for _, start, _ in windows)
+        high = max(end for _, _, end in windows)
+
+        with get_db(pool=Database.REPORTING, readonly=True) as cursor:
+            cursor.execute(rollup_query(f"""
+                WITH windows(idx, start_day, end_day) AS (VALUES {values}),
+                days AS (
+                    SELECT 
+                        COALESCE(m.day, p.day) AS day,
+                        COALESCE(m.appointments, 0) AS appointments,
+                        COALESCE(m.completed, 0) AS completed,
+                        COALESCE(m.cancelled, 0) AS cancelled,
+                        COALESCE(p.revenue, 0) AS revenue,
+                        COALESCE(p.payment_count, 0) AS payment_count
+                    FROM (
+                        SELECT 
+                            day,
+                            appointments_pending + appointments_completed + appointments_cancelled AS appointments,
+                            appointments_completed AS completed,
+                            appointments_cancelled AS cancelled
+                        FROM daily_metrics
+                        WHERE day BETWEEN %s AND %s
+                    ) m
+                    FULL JOIN (
+                        SELECT day, SUM(amount) AS revenue, SUM(payment_count) AS payment_count
+                        FROM daily_payment_metrics
+                        WHERE status = 'completed'
+                        AND day BETWEEN %s AND %s
+                        GROUP BY day
+                    ) p ON p.day = m.day
+                )
+                SELECT 
+                    w.idx,
+                    COALESCE(SUM(d.appointments), 0),
+                    COALESCE(SUM(d.completed), 0),
+                    COALESCE(SUM(d.cancelled), 0),
+                    COALESCE(SUM(d.revenue), 0),
+                    COALESCE(SUM(d.payment_count), 0)
+                FROM windows w
+                LEFT JOIN days d ON d.day BETWEEN w.start_day AND w.end_day
+                GROUP BY w.idx
+                ORDER BY w.idx
+            """), params + [low, high, low, high])
+            rows = cursor.fetchall()
+
+        columns = {
+            'window': [label for label, _, _ in windows],
+            'start': [start for _, start, _ in windows],
+            'end': [end for _, _, end in windows],
+            'appointments': [int(row[1]) for row in rows],
+            'completed': [int(row[2]) for row in rows],
+            'cancelled': [int(row[3]) for row in rows],
+            'revenue': [float(row[4]) for row in rows],
+            'payment_count': [int(row[5]) for row in rows],
+        }
+
+        # KPIs derivados (evitando división por cero). Los días de cada ventana incluyen
+        # ambos extremos; los promedios por día usan el total real de citas
+        appointments = [max(1, total) for total in columns['appointments']]
+        days = [(end - start).days + 1 for _, start, end in windows]
+        columns['conversion_rate'] = [c / t for c, t in zip(columns['completed'], appointments)]
+        columns['avg_revenue_per_appointment'] = [r / t for r, t in zip(columns['revenue'], appointments)]
+        columns['cancellation_rate'] = [c / t for c, t in zip(columns['cancelled'], appointments)]
+        columns['revenue_per_day'] = [r / n for r, n in zip(columns['revenue'], days)]
+        columns['appointments_per_day'] = [t / n for t, n in zip(columns['appointments'], days)]
+
+        # Cambio relativo del periodo actual (primera ventana) respecto de cada ventana
+        columns['change'] = {
+            key: [None] + [
+                (columns[key][0] - other) / other if other else None
+                for other in columns[key][1:]
+            ]
+            for key in WINDOW_TOTALS + KPI_METRICS
+        }
+        return columns
 
     @staticmethod
     def get_temporal_trends(start_date: date, end_date: date, period: str = 'month') -> list[Dict]:
-        """Obtiene tendencias temporales para el periodo especificado
+        """Obtiene tendencias temporales para el periodo especificado (desde los agregados diarios)
         
         Args:
             start_date: Fecha de inicio
@@ -64,47 +207,160 @@ class StatsService:
         Returns:
             List[Dict]: Lista de datos por periodo
         """
-        with get_db() as cursor:
-            if period == 'day':
-                cursor.execute("""
-                    SELECT 
-                        DATE(date) as day,
-                        COUNT(*) as appointments,
-                        SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as completed,
-                        SUM(CASE WHEN status = 'cancelled' THEN 1 ELSE 0 END) as cancelled
-                    FROM appointments
-                    WHERE date BETWEEN %s AND %s
-                    GROUP BY DATE(date)
-                    ORDER BY DATE(date)
-                """, (start_date, end_date))
-            elif period == 'week':
-                cursor.execute("""
-                    SELECT 
-                        DATE_TRUNC('week', date) as week,
-                        COUNT(*) as appointments,
-                        SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as completed,
-                        SUM(CASE WHEN status = 'cancelled' THEN 1 ELSE 0 END) as cancelled
-                    FROM appointments
-                    WHERE date BETWEEN %s AND %s
-                    GROUP BY DATE_TRUNC('week', date)
-                    ORDER BY DATE_TRUNC('week', date)
-                """, (start_date, end_date))
-            else:  # month
-                cursor.execute("""
-                    SELECT 
-                        DATE_TRUNC('month', date) as month,
-                        COUNT(*) as appointments,
-                        SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as completed,
-                        SUM(CASE WHEN status = 'cancelled' THEN 1 ELSE 0 END) as cancelled
-                    FROM appointments
-                    WHERE date BETWEEN %s AND %s
-                    GROUP BY DATE_TRUNC('month', date)
-                    ORDER BY DATE_TRUNC('month', date)
-                """, (start_date, end_date))
+        bucket = {
+            'day': "day",
+            'week': "DATE_TRUNC('week', day)"
+        }.get(period, "DATE_TRUNC('month', day)")
+
+        with get_db(pool=Database.REPORTING, readonly=True) as cursor:
+            cursor.execute(rollup_query(f"""
+                SELECT 
+                    {bucket} as period,
+                    SUM(appointments_pending + appointments_completed + appointments_cancelled) as appointments,
+                    SUM(appointments_completed) as completed,
+                    SUM(appointments_cancelled) as cancelled
+                FROM daily_metrics
+                WHERE day BETWEEN %s AND %s
+                GROUP BY {bucket}
+                HAVING SUM(appointments_pending + appointments_completed + appointments_cancelled) > 0
+                ORDER BY {bucket}
+            """), (start_date, end_date))
                 
             return [dict(zip(['period', 'appointments', 'completed', 'cancelled'], row)) 
                 for row in cursor.fetchall()]
 
+    @staticmethod
+    def get_report_statistics(start_date: date, end_date: date) -> Dict[str, Any]:
+        """
+        Estadísticas del periodo para la vista de reportes, en una sola consulta: citas y
+        pagos desde los agregados diarios, deudas pendientes y vencidas desde la tabla
+        (dependen del estado actual). No incluye el total de clientes, que no es del periodo.
+        """
+        with get_db(pool=Database.REPORTING, readonly=True) as cursor:
+            cursor.execute(rollup_query("""
+                SELECT
+                    a.total, a.completed, a.cancelled, a.pending,
+                    p.total_revenue, p.total_payments,
+                    d.pending_amount, d.overdue_amount, d.overdue_count,
+                    m.method
+                FROM (
+                    SELECT
+                        COALESCE(SUM(appointments_pending + appointments_completed + appointments_cancelled), 0) AS total,
+                        COALESCE(SUM(appointments_completed), 0) AS completed,
+                        COALESCE(SUM(appointments_cancelled), 0) AS cancelled,
+                        COALESCE(SUM(appointments_pending), 0) AS pending
+                    FROM daily_metrics
+                    WHERE day BETWEEN %s AND %s
+                ) a, (
+                    SELECT COALESCE(SUM(amount), 0) AS total_revenue, COALESCE(SUM(payment_count), 0) AS total_payments
+                    FROM daily_payment_metrics
+                    WHERE day BETWEEN %s AND %s
+                ) p, (
+                    SELECT
+                        COALESCE(SUM(amount - paid_amount), 0) AS pending_amount,
+                        COALESCE(SUM(amount - paid_amount) FILTER (WHERE due_date < CURRENT_DATE), 0) AS overdue_amount,
+                        COUNT(*) FILTER (WHERE due_date < CURRENT_DATE) AS overdue_count
+                    FROM debts
+                    WHERE status = 'pending'
+                    AND created_at BETWEEN %s AND %s
+                ) d
+                LEFT JOIN LATERAL (
+                    -- Método de pago más usado
+                    SELECT method
+                    FROM daily_payment_metrics
+                    WHERE day BETWEEN %s AND %s
+                    GROUP BY method
+                    HAVING SUM(payment_count) > 0
+                    ORDER BY SUM(payment_count) DESC
+                    LIMIT 1
+                ) m ON true
+            """), (start_date, end_date) * 4)
+            row = cursor.fetchone()
+
+        return {
+            'total_appointments': int(row[0]),
+            'completed_appointments': int(row[1]),
+            'cancelled_appointments': int(row[2]),
+            'pending_appointments': int(row[3]),
+            'total_revenue': float(row[4]),
+            'total_payments': int(row[5]),
+            'total_pending_debts_amount': float(row[6]),
+            'overdue_debts_amount': float(row[7]),
+            'overdue_count': int(row[8]),
+            'popular_payment_method': row[9] or "N/A"
+        }
+
+    @staticmethod
+    def count_clients() -> int:
+        """Cantidad total de clientes registrados"""
+        with get_db(pool=Database.REPORTING, readonly=True) as cursor:
+            cursor.execute("SELECT COUNT(*) FROM clients")
+            return cursor.fetchone()[0] or 0
+
+    @staticmethod
+    def get_report_chart_data(start_date: date, end_date: date, report_type: str = 'monthly') -> Dict[str, Any]:
+        """
+        Datos de los gráficos de la vista de reportes. Citas e ingresos salen de los
+        agregados diarios (el costo depende de los días del rango, no de las filas);
+        las deudas por estado dependen del estado actual y se leen de la tabla.
+        """
+        chart_data = {}
+
+        with get_db(pool=Database.REPORTING, readonly=True) as cursor:
+            # Datos de citas por estado (Pie Chart)
+            cursor.execute(rollup_query("""
+                SELECT 
+                    COALESCE(SUM(appointments_pending), 0),
+                    COALESCE(SUM(appointments_completed), 0),
+                    COALESCE(SUM(appointments_cancelled), 0)
+                FROM daily_metrics
+                WHERE day BETWEEN %s AND %s
+            """), (start_date, end_date))
+            by_status = zip(('pending', 'completed', 'cancelled'), cursor.fetchone())
+            chart_data['appointments_by_status'] = {status: int(count) for status, count in by_status if count}
+
+            # Datos de ingresos por método de pago (Pie Chart)
+            cursor.execute(rollup_query("""
+                SELECT method, SUM(amount)
+                FROM daily_payment_metrics
+                WHERE day BETWEEN %s AND %s
+                GROUP BY method
+                HAVING SUM(payment_count) > 0
+            """), (start_date, end_date))
+            chart_data['revenue_by_method'] = {
+                method: float(amount) if amount is not None else 0.0
+                for method, amount in cursor.fetchall()
+            }
+
+            # Datos de deudas por estado (Pie Chart - Distinción entre pendientes y vencidas)
+            cursor.execute("""
+                SELECT 
+                    CASE 
+                        WHEN status = 'pending' AND due_date < CURRENT_DATE THEN 'Vencidas'
+                        WHEN status = 'pending' THEN 'Pendientes'
+                        ELSE 'Pagadas'
+                    END as status_category,
+                    COALESCE(
+                        CASE
+                            WHEN status = 'pending' THEN SUM(amount - paid_amount)
+                            WHEN status = 'paid' THEN SUM(amount)
+                            ELSE 0
+                        END, 0
+                    ) as total_amount
+                FROM debts
+                WHERE created_at BETWEEN %s AND %s
+                GROUP BY status_category, status
+            """, (start_date, end_date))
+            chart_data['debts_by_status'] = {
+                category: float(amount) if amount is not None else 0.0
+                for category, amount in cursor.fetchall()
+            }
+
+        # Datos temporales de ingresos (Bar Chart): serie completa y acotada en puntos
+        chart_data['revenue_over_time'] = TimeSeriesService.revenue_series(start_date, end_date, report_type)
+
+        return chart_data
+
     @staticmethod
     def compare_periods(current_start: date, current_end: date, 
                     previous_start: date, previous_end: date) -> Dict[str, Any]:
@@ -119,41 +375,139 @@ class StatsService:
         Returns:
             Dict: Comparativas con cambios porcentuales
         """
-        current_stats = StatsService.get_kpi_metrics(current_start, current_end)
-        previous_stats = StatsService.get_kpi_metrics(previous_start, previous_end)
+        columns = StatsService._window_columns([
+            ('current', current_start, current_end),
+            (COMPARE_PREVIOUS, previous_start, previous_end)
+        ])
         
-        comparisons = {}
-        for key in current_stats:
-            if key in previous_stats and previous_stats[key] != 0:
-                change = (current_stats[key] - previous_stats[key]) / previous_stats[key]
-                comparisons[f"{key}_change"] = change
+        comparisons = {
+            f"{key}_change": columns['change'][key][1]
+            for key in KPI_METRICS if columns['change'][key][1] is not None
+        }
                 
         return {
-            'current': current_stats,
-            'previous': previous_stats,
+            'current': {key: columns[key][0] for key in KPI_METRICS},
+            'previous': {key: columns[key][1] for key in KPI_METRICS},
             'comparisons': comparisons
         }
 
     @staticmethod
-    def detect_anomalies(start_date: date, end_date: date, threshold: float = 2.0) -> list[Dict]:
-        """Detecta valores atípicos en las métricas
+    def detect_anomalies(start_date: date, end_date: date, threshold: float = 2.0,
+                         window: int = ANOMALY_WINDOW_DAYS) -> list[Dict]:
+        """Detecta valores atípicos en las métricas diarias
+        
+        Compara cada día con los `window` días anteriores, para todas las métricas a la
+        vez (NumPy): z-score (media y desviación estándar) y z robusto (mediana y MAD).
+        El resultado se guarda en caché por (rango, umbral, ventana).
         
         Args:
             start_date: Fecha de inicio
             end_date: Fecha de fin
             threshold: Umbral para considerar anomalía (en desviaciones estándar)
+            window: Días de historia con los que se compara cada día
             
         Returns:
-            List[Dict]: Lista de anomalías detectadas
+            List[Dict]: Lista de anomalías detectadas (fecha, métrica, valor, valor esperado,
+            puntajes y métodos que la marcaron), ordenadas por fecha
         """
-        # Implementación de detección de anomalías basada en datos históricos
-        # (Código omitido por brevedad)
-        return []
+        if np is None:
+            logger.warning("NumPy no está instalado: la detección de anomalías no está disponible")
+            return []
+
+        key = (start_date, end_date, threshold, window)
+        now = time.monotonic()
+        with StatsService._anomaly_cache_lock:
+            cached = StatsService._anomaly_cache.get(key)
+            if cached and cached[0] > now:
+                return cached[1]
+
+        days, values = StatsService._daily_metric_series(start_date - timedelta(days=window), end_date)
+        anomalies = StatsService._flag_anomalies(days, values, window, threshold)
+
+        # Un rango que incluye hoy sigue cambiando: se conserva menos tiempo
+        ttl = ANOMALY_CACHE_OPEN_TTL if end_date >= date.today() else ANOMALY_CACHE_CLOSED_TTL
+        with StatsService._anomaly_cache_lock:
+            if len(StatsService._anomaly_cache) >= ANOMALY_CACHE_MAX_ENTRIES:
+                StatsService._anomaly_cache.pop(next(iter(StatsService._anomaly_cache)))
+            StatsService._anomaly_cache[key] = (now + ttl, anomalies)
+        return anomalies
+
+    @staticmethod
+    def _daily_metric_series(start_date: date, end_date: date):
+        """
+        Serie diaria completa (días sin datos en cero) de ANOMALY_METRICS en una sola consulta.
+        Retorna (lista de fechas, matriz días x métricas).
+        """
+        with get_db(pool=Database.REPORTING, readonly=True) as cursor:
+            cursor.execute(rollup_query("""
+                SELECT 
+                    d.day::date,
+                    COALESCE(p.revenue, 0),
+                    COALESCE(m.appointments_pending + m.appointments_completed + m.appointments_cancelled, 0),
+                    COALESCE(m.appointments_cancelled, 0),
+                    COALESCE(m.new_clients, 0)
+                FROM generate_series(%s::date, %s::date, interval '1 day') AS d(day)
+                LEFT JOIN (
+                    SELECT * FROM daily_metrics WHERE day BETWEEN %s AND %s
+                ) m ON m.day = d.day::date
+                LEFT JOIN (
+                    SELECT day, SUM(amount) AS revenue
+                    FROM daily_payment_metrics
+                    WHERE status = 'completed'
+                    AND day BETWEEN %s AND %s
+                    GROUP BY day
+                ) p ON p.day = d.day::date
+                ORDER BY d.day
+            """), (start_date, end_date) * 3)
+            rows = cursor.fetchall()
+
+        days = [row[0] for row in rows]
+        values = np.array([row[1:] for row in rows], dtype=float).reshape(len(rows), len(ANOMALY_METRICS))
+        return days, values
+
+    @staticmethod
+    def _flag_anomalies(days: list, values, window: int, threshold: float) -> list[Dict]:
+        """Marca los días (a partir de la posición `window`) que se apartan de su ventana previa"""
+        if window < 2 or len(values) <= window:
+            return []
+
+        # history[i] son los `window` días anteriores a current[i]: (días, métricas, ventana)
+        history = sliding_window_view(values[:-1], window, axis=0)
+        current = values[window:]
+
+        mean = history.mean(axis=2)
+        std = history.std(axis=2)
+        median = np.median(history, axis=2)
+        mad = np.median(np.abs(history - median[..., np.newaxis]), axis=2)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_scores = np.where(std > 0, (current - mean) / std, 0.0)
+            # 0.6745 escala la MAD para que sea comparable con la desviación estándar
+            mad_scores = np.where(mad > 0, 0.6745 * (current - median) / mad, 0.0)
+
+        z_flags = np.abs(z_scores) > threshold
+        mad_flags = np.abs(mad_scores) > threshold
+
+        anomalies = []
+        for row, col in np.argwhere(z_flags | mad_flags):
+            anomalies.append({
+                'date': days[window + row],
+                'metric': ANOMALY_METRICS[col],
+                'value': float(current[row, col]),
+                'expected': float(median[row, col]),
+                'z_score': round(float(z_scores[row, col]), 2),
+                'mad_score': round(float(mad_scores[row, col]), 2),
+                'direction': 'up' if current[row, col] > median[row, col] else 'down',
+                'methods': [
+                    name for name, flagged in (('zscore', z_flags[row, col]), ('mad', mad_flags[row, col])) if flagged
+                ]
+            })
+        return anomalies
     
     @staticmethod
     def _count_appointments_by_status(start_date: date, end_date: date, status: str = None) -> int:
         """Cuenta citas en un rango de fechas con filtro opcional de estado"""
-        with get_db() as cursor:
+        with get_db(pool=Database.REPORTING, readonly=True) as cursor:
             query = """
                 SELECT COUNT(*) 
                 FROM appointments 
@@ -168,50 +522,134 @@ class StatsService:
             cursor.execute(query, params)
             return cursor.fetchone()[0] or 0
     
+    # Todas las cifras del dashboard en una sola sentencia (un solo viaje a la base).
+    # Mantiene la semántica de los helpers _count_*/_calculate_*: citas de la semana, mes
+    # y año solo pendientes; ingresos de hoy por DATE(payment_date) y los de rangos con
+    # payment_date BETWEEN fechas (timestamp contra la medianoche del último día).
+    _DASHBOARD_QUERY = """
+        WITH bounds AS (
+            SELECT %s::date AS today, %s::date AS week_start, %s::date AS month_start, %s::date AS year_start
+        ),
+        appointment_stats AS (
+            SELECT
+                COUNT(*) FILTER (WHERE a.date = b.today) AS today,
+                COUNT(*) FILTER (WHERE a.date >= b.week_start AND a.status = 'pending') AS week,
+                COUNT(*) FILTER (WHERE a.date >= b.month_start AND a.status = 'pending') AS month,
+                COUNT(*) FILTER (WHERE a.date >= b.year_start AND a.status = 'pending') AS year
+            FROM appointments a, bounds b
+            WHERE a.date BETWEEN LEAST(b.week_start, b.year_start) AND b.today
+        ),
+        client_stats AS (
+            SELECT
+                COUNT(*) FILTER (WHERE DATE(c.created_at) = b.today) AS today,
+                COUNT(*) FILTER (WHERE DATE(c.created_at) <= b.today) AS month
+            FROM clients c, bounds b
+            WHERE c.created_at >= b.month_start
+        ),
+        revenue_stats AS (
+            SELECT
+                COALESCE(SUM(p.amount) FILTER (WHERE DATE(p.payment_date) = b.today), 0) AS today,
+                COALESCE(SUM(p.amount) FILTER (WHERE p.payment_date BETWEEN b.week_start AND b.today), 0) AS week,
+                COALESCE(SUM(p.amount) FILTER (WHERE p.payment_date BETWEEN b.month_start AND b.today), 0) AS month,
+                COALESCE(SUM(p.amount) FILTER (WHERE p.payment_date BETWEEN b.year_start AND b.today), 0) AS year
+            FROM payments p, bounds b
+            WHERE p.status = 'completed'
+            AND p.payment_date >= LEAST(b.week_start, b.year_start)
+            AND p.payment_date < b.today + 1
+        ),
+        debt_stats AS (
+            SELECT
+                COALESCE(SUM(amount - paid_amount), 0) AS pending_amount,
+                COUNT(*) FILTER (WHERE due_date < CURRENT_DATE) AS overdue
+            FROM debts
+            WHERE status = 'pending'
+        ),
+        method_stats AS (
+            SELECT p.method, COUNT(*) AS count, SUM(p.amount) AS total
+            FROM payments p, bounds b
+            WHERE p.payment_date BETWEEN b.month_start AND b.today
+            AND p.status = 'completed'
+            GROUP BY p.method
+        )
+        SELECT
+            ap.today, ap.week, ap.month, ap.year,
+            cl.today, cl.month,
+            ds.pending_amount,
+            rv.today, rv.week, rv.month, rv.year,
+            (
+                SELECT COALESCE(JSON_AGG(JSON_BUILD_ARRAY(method, count, total) ORDER BY total DESC), '[]'::json)
+                FROM method_stats
+            ) AS payment_methods,
+            ds.overdue
+        FROM appointment_stats ap, client_stats cl, revenue_stats rv, debt_stats ds
+    """
+
     @staticmethod
-    def get_dashboard_stats() -> Dict[str, Any]:
-        """
-        Obtiene las estadísticas principales para el dashboard
-        Returns:
-            Dict con las estadísticas clave
-        """
-        today = date.today()
-        start_of_week = today - timedelta(days=today.weekday())
-        start_of_month = today.replace(day=1)
-        start_of_year = today.replace(month=1, day=1)
-        
+    def _dashboard_params(today: date) -> tuple:
+        """Parámetros de _DASHBOARD_QUERY: hoy e inicio de semana, mes y año"""
+        return (
+            today,
+            today - timedelta(days=today.weekday()),
+            today.replace(day=1),
+            today.replace(month=1, day=1)
+        )
+
+    @staticmethod
+    def _dashboard_from_row(row) -> Dict[str, Any]:
+        """Mapea la fila de _DASHBOARD_QUERY al diccionario del dashboard"""
+        methods = row[11]
         return {
             # Estadísticas de citas
             # Citas de hoy: Cantidad de citas del día actual (todas, no solo pendientes)
-            'appointments_today': StatsService._count_appointments_by_status(today, today, status=None),
-            'appointments_week': StatsService._count_appointments_by_status(start_of_week, today, 'pending'),
-            'appointments_month': StatsService._count_appointments_by_status(start_of_month, today, 'pending'),
-            'appointments_year': StatsService._count_appointments_by_status(start_of_year, today, 'pending'),
-            
+            'appointments_today': row[0],
+            'appointments_week': row[1],
+            'appointments_month': row[2],
+            'appointments_year': row[3],
+
             # Estadísticas de clientes
-            'new_clients_today': StatsService._count_new_clients(today),
-            'new_clients_month': StatsService._count_new_clients_month(start_of_month, today),
-            
+            'new_clients_today': row[4],
+            'new_clients_month': row[5],
+
             # Estadísticas financieras
             # Pendientes: Monto total de deudas pendientes
-            'total_pending_debts_amount': StatsService._calculate_total_debts(), 
+            'total_pending_debts_amount': float(row[6]),
             # Ingresos: Suma de los pagos realizados el día actual (estado 'completed')
-            'revenue_today': StatsService._calculate_revenue(today, today),
-            'revenue_week': StatsService._calculate_revenue(start_of_week, today),
-            'revenue_month': StatsService._calculate_revenue(start_of_month, today),
-            'revenue_year': StatsService._calculate_revenue(start_of_year, today),
-            
-            # Métodos de pago más usados
-            'payment_methods': StatsService._get_payment_methods_stats(start_of_month, today),
-            
+            'revenue_today': float(row[7]),
+            'revenue_week': float(row[8]),
+            'revenue_month': float(row[9]),
+            'revenue_year': float(row[10]),
+
+            # Métodos de pago más usados (del mes en curso)
+            'payment_methods': {
+                method: {'count': count, 'total': float(total)} for method, count, total in methods
+            },
+
             # Deudas vencidas
-            'overdue_debts': StatsService._count_overdue_debts()
+            'overdue_debts': row[12]
         }
 
+    @staticmethod
+    def get_dashboard_stats() -> Dict[str, Any]:
+        """
+        Obtiene las estadísticas principales para el dashboard
+        Returns:
+            Dict con las estadísticas clave
+        """
+        with get_db(pool=Database.REPORTING, readonly=True) as cursor:
+            cursor.execute(StatsService._DASHBOARD_QUERY, StatsService._dashboard_params(date.today()))
+            return StatsService._dashboard_from_row(cursor.fetchone())
+
+    @staticmethod
+    async def get_dashboard_stats_async() -> Dict[str, Any]:
+        """Versión asíncrona de get_dashboard_stats para handlers de page.run_task"""
+        async with get_db_async(pool=Database.REPORTING, readonly=True) as cursor:
+            await cursor.execute(StatsService._DASHBOARD_QUERY, StatsService._dashboard_params(date.today()))
+            return StatsService._dashboard_from_row(await cursor.fetchone())
+
     @staticmethod
     def _count_new_clients_month(start_date: date, end_date: date) -> int:
         """Cuenta clientes nuevos registrados en un rango de fechas"""
-        with get_db() as cursor:
+        with get_db(pool=Database.REPORTING, readonly=True) as cursor:
             cursor.execute(
                 """
                 SELECT COUNT(*) 
@@ -225,7 +663,7 @@ class StatsService:
     @staticmethod
     def _calculate_total_debts() -> float:
         """Calcula el total de deudas pendientes (monto de la deuda - monto pagado)"""
-        with get_db() as cursor:
+        with get_db(pool=Database.REPORTING, readonly=True) as cursor:
             cursor.execute(
                 """
                 SELECT COALESCE(SUM(amount - paid_amount), 0)
@@ -238,7 +676,7 @@ class StatsService:
     @staticmethod
     def _get_payment_methods_stats(start_date: date, end_date: date) -> Dict[str, float]:
         """Obtiene estadísticas de métodos de pago"""
-        with get_db() as cursor:
+        with get_db(pool=Database.REPORTING, readonly=True) as cursor:
             cursor.execute(
                 """
                 SELECT 
@@ -258,7 +696,7 @@ class StatsService:
     @staticmethod
     def _count_overdue_debts() -> int:
         """Cuenta deudas vencidas (donde due_date es anterior a la fecha actual y el estado es 'pending')"""
-        with get_db() as cursor:
+        with get_db(pool=Database.REPORTING, readonly=True) as cursor:
             cursor.execute(
                 """
                 SELECT COUNT(*) 
@@ -272,7 +710,7 @@ class StatsService:
     @staticmethod
     def _count_appointments(start_date: date, end_date: date) -> int:
         """Cuenta citas en un rango de fechas (originalmente solo completadas, ahora no se usa para el dashboard)"""
-        with get_db() as cursor:
+        with get_db(pool=Database.REPORTING, readonly=True) as cursor:
             cursor.execute(
                 """
                 SELECT COUNT(*) 
@@ -287,7 +725,7 @@ class StatsService:
     @staticmethod
     def _count_new_clients(for_date: date) -> int:
         """Cuenta clientes nuevos registrados en una fecha específica"""
-        with get_db() as cursor:
+        with get_db(pool=Database.REPORTING, readonly=True) as cursor:
             cursor.execute(
                 """
                 SELECT COUNT(*) 
@@ -304,7 +742,7 @@ class StatsService:
         Cuenta los pagos registrados que no tienen el estado 'completed'.
         Esta función ya no se usa directamente para la métrica "Pendientes" en el dashboard.
         """
-        with get_db() as cursor:
+        with get_db(pool=Database.REPORTING, readonly=True) as cursor:
             cursor.execute(
                 """
                 SELECT COUNT(*) 
@@ -317,7 +755,7 @@ class StatsService:
     @staticmethod
     def _calculate_revenue(start_date: date, end_date: date) -> float:
         """Calcula ingresos en un rango de fechas (solo pagos 'completed')"""
-        with get_db() as cursor:
+        with get_db(pool=Database.REPORTING, readonly=True) as cursor:
             if start_date == end_date: # Si es para un solo día, compara solo la fecha
                 query = """
                     SELECT COALESCE(SUM(amount), 0)
@@ -341,7 +779,7 @@ class StatsService:
     @staticmethod
     def get_client_stats(client_id: int) -> Dict[str, Any]:
         """Obtiene estadísticas específicas de un cliente"""
-        with get_db() as cursor:
+        with get_db(pool=Database.REPORTING, readonly=True) as cursor:
             # Citas totales
             cursor.execute(
                 """
@@ -380,7 +818,7 @@ class StatsService:
     @staticmethod
     def get_appointment_stats() -> Dict[str, Any]:
         """Obtiene estadísticas generales de citas"""
-        with get_db() as cursor:
+        with get_db(pool=Database.REPORTING, readonly=True) as cursor:
             # Por estado
             cursor.execute(
                 """
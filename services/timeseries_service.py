@@ -0,0 +1,145 @@
+"""
+Series temporales para los gráficos de reportes.
+
+Las series salen completas (un punto por periodo, en cero si no hubo movimientos,
+rellenadas con generate_series) y, si superan el máximo de puntos, se reducen antes
+de enviarlas al cliente Flet, de modo que el tamaño del gráfico y su tiempo de
+dibujo no dependen de la longitud del rango.
+"""
+from datetime import date
+from typing import Dict, List, Sequence
+from core.config import settings
+from core.database import get_db, Database
+from services.daily_metrics import rollup_query
+from utils.date_utils import get_month_name
+
+# Tipo de reporte -> (unidad de DATE_TRUNC, paso de generate_series)
+BUCKETS = {
+    'daily': ('day', '1 day'),
+    'weekly': ('week', '1 week'),
+    'monthly': ('month', '1 month'),
+}
+
+# Métodos de reducción de TimeSeriesService.downsample
+LTTB = 'lttb'
+BUCKET_AVERAGE = 'average'
+
+
+class TimeSeriesService:
+    @staticmethod
+    def revenue_series(start_date: date, end_date: date, report_type: str = 'monthly',
+                       max_points: int = None, method: str = LTTB) -> Dict[str, list]:
+        """Ingresos por periodo (desde los agregados diarios), listos para un gráfico
+
+        Args:
+            start_date: Fecha de inicio
+            end_date: Fecha de fin
+            report_type: 'daily', 'weekly' o 'monthly' (por defecto)
+            max_points: Máximo de puntos a devolver (settings.CHART_MAX_POINTS si es None)
+            method: LTTB o BUCKET_AVERAGE, para reducir la serie si supera max_points
+
+        Returns:
+            Dict: 'labels' y 'values' alineados, y 'downsampled' si la serie se redujo
+        """
+        unit, step = BUCKETS.get(report_type, BUCKETS['monthly'])
+
+        with get_db(pool=Database.REPORTING, readonly=True) as cursor:
+            cursor.execute(rollup_query(f"""
+                SELECT s.period::date, COALESCE(r.amount, 0)
+                FROM generate_series(
+                    DATE_TRUNC('{unit}', %s::timestamp),
+                    DATE_TRUNC('{unit}', %s::timestamp),
+                    interval '{step}'
+                ) AS s(period)
+                LEFT JOIN (
+                    SELECT DATE_TRUNC('{unit}', day::timestamp) AS period, SUM(amount) AS amount
+                    FROM daily_payment_metrics
+                    WHERE day BETWEEN %s AND %s
+                    GROUP BY 1
+                ) r ON r.period = s.period
+                ORDER BY s.period
+            """), (start_date, end_date, start_date, end_date))
+            rows = cursor.fetchall()
+
+        periods = [row[0] for row in rows]
+        values = [float(row[1]) for row in rows]
+        labels = TimeSeriesService._labels(periods, unit)
+        return TimeSeriesService.downsample(labels, values, max_points or settings.CHART_MAX_POINTS, method)
+
+    @staticmethod
+    def _labels(periods: List[date], unit: str) -> List[str]:
+        if unit == 'day':
+            return [period.strftime('%d/%m') for period in periods]
+        if unit == 'week':
+            return [f"Semana {period.isocalendar()[1]}" for period in periods]
+        # Con más de un año en el rango, el mes solo no identifica el periodo
+        several_years = len({period.year for period in periods}) > 1
+        return [
+            f"{get_month_name(period.month)} {period.year}" if several_years else get_month_name(period.month)
+            for period in periods
+        ]
+
+    @staticmethod
+    def downsample(labels: Sequence, values: Sequence[float], max_points: int,
+                   method: str = LTTB) -> Dict[str, list]:
+        """
+        Reduce la serie a `max_points` puntos como máximo. LTTB conserva puntos reales
+        (con su etiqueta y valor) elegidos para mantener la forma de la curva, incluidos
+        los picos; BUCKET_AVERAGE promedia tramos consecutivos y etiqueta cada tramo con
+        su primer y último periodo.
+        """
+        if max_points < 3 or len(values) <= max_points:
+            return {'labels': list(labels), 'values': list(values), 'downsampled': False}
+
+        if method == BUCKET_AVERAGE:
+            bounds = TimeSeriesService._bucket_bounds(len(values), max_points)
+            return {
+                'labels': [
+                    str(labels[start]) if end - start == 1 else f"{labels[start]} - {labels[end - 1]}"
+                    for start, end in bounds
+                ],
+                'values': [sum(values[start:end]) / (end - start) for start, end in bounds],
+                'downsampled': True
+            }
+
+        indices = TimeSeriesService.lttb_indices(values, max_points)
+        return {
+            'labels': [labels[i] for i in indices],
+            'values': [values[i] for i in indices],
+            'downsampled': True
+        }
+
+    @staticmethod
+    def _bucket_bounds(length: int, buckets: int) -> List[tuple]:
+        """Divide [0, length) en `buckets` tramos consecutivos de tamaño casi igual"""
+        edges = [round(i * length / buckets) for i in range(buckets + 1)]
+        return [(edges[i], edges[i + 1]) for i in range(buckets) if edges[i + 1] > edges[i]]
+
+    @staticmethod
+    def lttb_indices(values: Sequence[float], max_points: int) -> List[int]:
+        """
+        Largest-Triangle-Three-Buckets: conserva el primer y el último punto y, de cada
+        tramo intermedio, el que forma el triángulo de mayor área con el punto elegido
+        en el tramo anterior y el promedio del tramo siguiente (x = posición en la serie).
+        """
+        length = len(values)
+        if max_points < 3 or length <= max_points:
+            return list(range(length))
+
+        # Los extremos son fijos; el resto se reparte en max_points - 2 tramos
+        bounds = [(start + 1, end + 1) for start, end in TimeSeriesService._bucket_bounds(length - 2, max_points - 2)]
+        indices = [0]
+        for n, (start, end) in enumerate(bounds):
+            next_start, next_end = bounds[n + 1] if n + 1 < len(bounds) else (length - 1, length)
+            avg_x = (next_start + next_end - 1) / 2
+            avg_y = sum(values[next_start:next_end]) / (next_end - next_start)
+
+            prev_x, prev_y = indices[-1], values[indices[-1]]
+            best, best_area = start, -1.0
+            for i in range(start, end):
+                area = abs((prev_x - avg_x) * (values[i] - prev_y) - (prev_x - i) * (avg_y - prev_y))
+                if area > best_area:
+                    best, best_area = i, area
+            indices.append(best)
+        indices.append(length - 1)
+        return indices
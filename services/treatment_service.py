@@ -1,13 +1,17 @@
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from datetime import timedelta, datetime
 import logging
 from models.treatment import Treatment
 # Asume que tienes un módulo core.database con get_db o Database.get_cursor
 # Si tu conexión a la base de datos es diferente, ajusta esta importación.
 from core.database import get_db, Database 
+from core.cache import cached, invalidate, invalidates
 
 logger = logging.getLogger(__name__)
 
+# Caché de las lecturas de tratamientos (listados y búsquedas); la vacía cualquier escritura
+TREATMENTS_CACHE = "treatments"
+
 class TreatmentService:
     @staticmethod
     def create_treatment_if_not_exists(name: str, price: float) -> int:
@@ -38,7 +42,49 @@ class TreatmentService:
         except Exception as e:
             logger.error(f"Error al crear tratamiento (if_not_exists): {e}")
             raise
-    
+
+    @staticmethod
+    def get_or_create_treatments(treatments: List[dict], cursor) -> Dict[str, int]:
+        """
+        Versión por lotes de create_treatment_if_not_exists: resuelve los IDs de todos
+        los tratamientos (por nombre, sin distinguir mayúsculas) y crea los que falten,
+        con dos consultas en total sin importar la cantidad de tratamientos.
+        Returns: diccionario {nombre en minúsculas: ID del tratamiento}
+        """
+        # Primer precio visto por nombre, para los tratamientos que haya que crear
+        prices = {}
+        for treatment in treatments:
+            prices.setdefault(treatment['name'].lower(), (treatment['name'], treatment['price']))
+        if not prices:
+            return {}
+
+        cursor.execute(
+            """
+            SELECT DISTINCT ON (lower(name)) lower(name), id
+            FROM treatments
+            WHERE lower(name) = ANY(%s)
+            ORDER BY lower(name), id
+            """,
+            (list(prices.keys()),)
+        )
+        treatment_ids = dict(cursor.fetchall())
+
+        missing = [prices[key] for key in prices if key not in treatment_ids]
+        new_rows = Database.insert_many(
+            cursor,
+            "treatments",
+            ("name", "description", "price", "duration", "is_active", "created_at", "updated_at"),
+            [(name, f"Tratamiento creado automáticamente: {name}", price, "00:30:00", True)
+             for name, price in missing],
+            template="(%s, %s, %s, %s, %s, NOW(), NOW())",
+            returning="id"
+        )
+        for (name, _), row in zip(missing, new_rows):
+            treatment_ids[name.lower()] = row[0]
+        if missing:
+            invalidate(TREATMENTS_CACHE)
+        return treatment_ids
+
     @staticmethod
     def search_treatments(search_term: str) -> List[Tuple[int, str, float]]: # Cambiado a float
         """
@@ -72,38 +118,44 @@ class TreatmentService:
             active_status (Optional[bool]): Filtrar por estado activo.
         """
         try:
-            query = """
-                SELECT id, name, description, price, duration, is_active, created_at, updated_at
-                FROM treatments 
-                WHERE (unaccent(name) ILIKE unaccent(%s))
-            """
-            params = [f"%{search_term}%"]
-
-            if active_status is not None:
-                query += " AND is_active = %s"
-                params.append(active_status)
-            
-            query += " ORDER BY name ASC LIMIT 10;"
-
-            with get_db() as cursor:
-                cursor.execute(query, params)
-                return [
-                    Treatment(
-                        id=row[0],
-                        name=row[1],
-                        description=row[2],
-                        price=float(row[3]),
-                        duration=row[4],
-                        is_active=row[5],
-                        created_at=row[6],
-                        updated_at=row[7]
-                    ) for row in cursor.fetchall()
-                ]
+            return TreatmentService._load_treatments_by_name(search_term, active_status)
         except Exception as e:
             logger.error(f"Error al buscar tratamientos (full object): {e}")
             return []
 
     @staticmethod
+    @cached(TREATMENTS_CACHE, maxsize=128)
+    def _load_treatments_by_name(search_term: str, active_status: Optional[bool]) -> List[Treatment]:
+        query = """
+            SELECT id, name, description, price, duration, is_active, created_at, updated_at
+            FROM treatments 
+            WHERE (unaccent(name) ILIKE unaccent(%s))
+        """
+        params = [f"%{search_term}%"]
+
+        if active_status is not None:
+            query += " AND is_active = %s"
+            params.append(active_status)
+        
+        query += " ORDER BY name ASC LIMIT 10;"
+
+        with get_db() as cursor:
+            cursor.execute(query, params)
+            return [
+                Treatment(
+                    id=row[0],
+                    name=row[1],
+                    description=row[2],
+                    price=float(row[3]),
+                    duration=row[4],
+                    is_active=row[5],
+                    created_at=row[6],
+                    updated_at=row[7]
+                ) for row in cursor.fetchall()
+            ]
+
+    @staticmethod
+    @invalidates(TREATMENTS_CACHE)
     def create_treatment(name: str, price: float, 
                          description: Optional[str] = None, # Ahora opcional
                          duration: str = "00:30:00",      # Duración por defecto
@@ -181,42 +233,48 @@ class TreatmentService:
             List[Treatment]: Una lista de objetos Treatment.
         """
         try:
-            query = """
-                SELECT id, name, description, price, duration, is_active, created_at, updated_at
-                FROM treatments
-                WHERE 1=1
-            """
-            params = []
-
-            if active_status is not None:
-                query += " AND is_active = %s"
-                params.append(active_status)
-            
-            if search_term:
-                query += " AND (unaccent(name) ILIKE unaccent(%s) OR unaccent(description) ILIKE unaccent(%s))"
-                params.extend([f"%{search_term}%", f"%{search_term}%"])
-            
-            query += " ORDER BY name ASC;"
-
-            with get_db() as cursor:
-                cursor.execute(query, params)
-                return [
-                    Treatment(
-                        id=row[0],
-                        name=row[1],
-                        description=row[2],
-                        price=float(row[3]),
-                        duration=row[4],
-                        is_active=row[5],
-                        created_at=row[6],
-                        updated_at=row[7]
-                    ) for row in cursor.fetchall()
-                ]
+            return TreatmentService._load_treatments(active_status, search_term)
         except Exception as e:
             logger.error(f"Error al obtener todos los tratamientos: {e}")
             return []
 
     @staticmethod
+    @cached(TREATMENTS_CACHE, maxsize=128)
+    def _load_treatments(active_status: Optional[bool], search_term: Optional[str]) -> List[Treatment]:
+        query = """
+            SELECT id, name, description, price, duration, is_active, created_at, updated_at
+            FROM treatments
+            WHERE 1=1
+        """
+        params = []
+
+        if active_status is not None:
+            query += " AND is_active = %s"
+            params.append(active_status)
+        
+        if search_term:
+            query += " AND (unaccent(name) ILIKE unaccent(%s) OR unaccent(description) ILIKE unaccent(%s))"
+            params.extend([f"%{search_term}%", f"%{search_term}%"])
+        
+        query += " ORDER BY name ASC;"
+
+        with get_db() as cursor:
+            cursor.execute(query, params)
+            return [
+                Treatment(
+                    id=row[0],
+                    name=row[1],
+                    description=row[2],
+                    price=float(row[3]),
+                    duration=row[4],
+                    is_active=row[5],
+                    created_at=row[6],
+                    updated_at=row[7]
+                ) for row in cursor.fetchall()
+            ]
+
+    @staticmethod
+    @invalidates(TREATMENTS_CACHE)
     def toggle_treatment_active(treatment_id: int, is_active: bool) -> Tuple[bool, str]:
         """
         Cambia el estado activo/inactivo de un tratamiento.
@@ -240,6 +298,7 @@ class TreatmentService:
             return False, f"Error al cambiar estado: {str(e)}"
 
     @staticmethod
+    @invalidates(TREATMENTS_CACHE)
     def update_treatment(treatment_id: int, name: str, price: float) -> Tuple[bool, str]: # Simplificado para la vista
         """
         Actualiza los detalles de un tratamiento existente (nombre y precio).
@@ -267,6 +326,7 @@ class TreatmentService:
             return False, f"Error al actualizar tratamiento: {str(e)}"
 
     @staticmethod
+    @invalidates(TREATMENTS_CACHE)
     def delete_treatment(treatment_id: int) -> Tuple[bool, str]: # Cambiado el tipo de retorno
         """
         Elimina un tratamiento por su ID.
@@ -0,0 +1,73 @@
+"""
+Benchmark: ejecución ad hoc vs. sentencias preparadas en el servidor.
+
+Compara, para cada sentencia registrada con Database.register_statement,
+el tiempo de ejecutar la consulta tal cual (parse + plan en cada llamada)
+contra EXECUTE de la sentencia preparada, sobre la misma conexión.
+
+Uso (desde la raíz del proyecto, con la base de datos configurada en .env):
+    python test/bench_prepared_statements.py [iteraciones]
+"""
+import os
+import sys
+import time
+from datetime import date, time as dtime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.database import Database, get_db
+# Importar los servicios registra sus sentencias preparadas
+import services.appointment_service  # noqa: F401
+import services.client_service  # noqa: F401
+import services.preference_service  # noqa: F401
+
+
+def _sample_params(cursor):
+    cursor.execute("SELECT id FROM clients ORDER BY id LIMIT 1")
+    row = cursor.fetchone()
+    client_id = row[0] if row else 1
+    return {
+        "appointment_slot_taken": (date.today(), dtime(9, 0), None),
+        "appointment_booked_times": (date.today(),),
+        "client_by_id": (client_id,),
+        "user_theme": (1,),
+    }
+
+
+def _time_runs(run, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        run()
+    return (time.perf_counter() - started) * 1000 / iterations
+
+
+def main(iterations=500):
+    Database.initialize()
+    with get_db() as cursor:
+        samples = _sample_params(cursor)
+        print(f"{'sentencia':<28}{'ad hoc (ms)':>14}{'preparada (ms)':>16}{'mejora':>10}")
+        for name, query in Database._statements.items():
+            params = samples.get(name)
+            if params is None:
+                continue
+
+            def adhoc():
+                cursor.execute(query, params)
+                cursor.fetchall()
+
+            def prepared():
+                Database.execute_prepared(cursor, name, params)
+                cursor.fetchall()
+
+            # Calentamiento para que ambas variantes partan de cachés equivalentes
+            adhoc()
+            prepared()
+            adhoc_ms = _time_runs(adhoc, iterations)
+            prepared_ms = _time_runs(prepared, iterations)
+            gain = (adhoc_ms - prepared_ms) / adhoc_ms * 100 if adhoc_ms else 0.0
+            print(f"{name:<28}{adhoc_ms:>14.3f}{prepared_ms:>16.3f}{gain:>9.1f}%")
+    Database.close_all_connections()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
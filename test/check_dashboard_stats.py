@@ -0,0 +1,88 @@
+"""
+Regresión: la consulta consolidada del dashboard contra los helpers individuales.
+
+Compara StatsService.get_dashboard_stats (una sola sentencia) con las mismas cifras
+calculadas por los helpers _count_*/_calculate_*/_get_payment_methods_stats (una
+consulta por cifra), e informa el tiempo de ambas variantes. Sale con código 1 si
+alguna cifra difiere.
+
+Uso (desde la raíz del proyecto, con la base de datos configurada en .env):
+    python test/check_dashboard_stats.py [iteraciones]
+"""
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.database import Database
+from services.stats_service import StatsService
+
+
+def legacy_dashboard_stats():
+    """Cifras del dashboard calculadas helper por helper, como antes de consolidarlas"""
+    today = date.today()
+    start_of_week = today - timedelta(days=today.weekday())
+    start_of_month = today.replace(day=1)
+    start_of_year = today.replace(month=1, day=1)
+
+    with Database.session(readonly=True, pool=Database.REPORTING):
+        return {
+            'appointments_today': StatsService._count_appointments_by_status(today, today, status=None),
+            'appointments_week': StatsService._count_appointments_by_status(start_of_week, today, 'pending'),
+            'appointments_month': StatsService._count_appointments_by_status(start_of_month, today, 'pending'),
+            'appointments_year': StatsService._count_appointments_by_status(start_of_year, today, 'pending'),
+            'new_clients_today': StatsService._count_new_clients(today),
+            'new_clients_month': StatsService._count_new_clients_month(start_of_month, today),
+            'total_pending_debts_amount': StatsService._calculate_total_debts(),
+            'revenue_today': StatsService._calculate_revenue(today, today),
+            'revenue_week': StatsService._calculate_revenue(start_of_week, today),
+            'revenue_month': StatsService._calculate_revenue(start_of_month, today),
+            'revenue_year': StatsService._calculate_revenue(start_of_year, today),
+            'payment_methods': StatsService._get_payment_methods_stats(start_of_month, today),
+            'overdue_debts': StatsService._count_overdue_debts()
+        }
+
+
+def _same(expected, actual):
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        return expected.keys() == actual.keys() and all(_same(expected[k], actual[k]) for k in expected)
+    if isinstance(expected, (int, float)) and isinstance(actual, (int, float)):
+        return abs(float(expected) - float(actual)) < 0.005
+    return expected == actual
+
+
+def _time_runs(run, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        run()
+    return (time.perf_counter() - started) * 1000 / iterations
+
+
+def main(iterations=20):
+    Database.initialize()
+    expected = legacy_dashboard_stats()
+    actual = StatsService.get_dashboard_stats()
+
+    mismatches = [key for key in expected if not _same(expected[key], actual.get(key))]
+    missing = [key for key in actual if key not in expected]
+    for key in expected:
+        status = "DIFERENTE" if key in mismatches else "ok"
+        print(f"{key:<28}{status:>10}  helpers={expected[key]!r}  consolidada={actual.get(key)!r}")
+    for key in missing:
+        print(f"{key:<28}{'SOBRANTE':>10}  consolidada={actual[key]!r}")
+
+    legacy_ms = _time_runs(legacy_dashboard_stats, iterations)
+    single_ms = _time_runs(StatsService.get_dashboard_stats, iterations)
+    print(f"\nhelpers: {legacy_ms:.2f} ms   consolidada: {single_ms:.2f} ms   ({iterations} iteraciones)")
+    Database.close_all_connections()
+
+    if mismatches or missing:
+        print(f"\n{len(mismatches) + len(missing)} cifra(s) no coinciden")
+        sys.exit(1)
+    print("\nTodas las cifras coinciden")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,83 @@
+import logging
+import threading
+import weakref
+from typing import Callable, Iterable, Optional, Set
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# ft.View -> funciones a llamar cuando la vista deja la página (ver close_view)
+_view_closers = weakref.WeakKeyDictionary()
+
+
+def on_view_closed(view, callback: Callable[[], None]):
+    """Registra callback() para cuando `view` deje la página; retorna la vista"""
+    _view_closers.setdefault(view, []).append(callback)
+    return view
+
+
+def close_view(view):
+    """Llama a lo registrado para `view` (route_change, al sacarla de page.views)"""
+    for callback in _view_closers.pop(view, ()):
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Error al cerrar la vista {getattr(view, 'route', '')}: {str(e)}")
+
+
+class RefreshScheduler:
+    """
+    Agrupa los pedidos de recarga de una vista.
+
+    Cada evento marca como pendientes las secciones que afecta (request). El primer
+    pedido abre una ventana de VIEW_REFRESH_WINDOW_MS; al cerrarse se llama una sola vez
+    a refresh(secciones) con todas las marcadas durante la ventana. Así, un cambio masivo
+    que emite un evento por fila produce una recarga parcial en lugar de N completas.
+    Las recargas nunca se ejecutan en paralelo: lo pedido durante una recarga queda para
+    la siguiente ventana.
+    """
+
+    def __init__(self, refresh: Callable[[Set[str]], None], window_ms: Optional[float] = None):
+        self._refresh = refresh
+        self._window = (window_ms if window_ms is not None else settings.VIEW_REFRESH_WINDOW_MS) / 1000
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._pending: Set[str] = set()
+        self._timer: Optional[threading.Timer] = None
+
+    def request(self, sections: Iterable[str]):
+        """Marca secciones para la próxima recarga y abre la ventana si no hay una abierta"""
+        with self._lock:
+            self._pending.update(sections)
+            if self._timer is None and self._pending:
+                self._timer = threading.Timer(self._window, self._run)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Ejecuta ya la recarga de lo pendiente (por ejemplo, tras una acción del propio usuario)"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        self._run()
+
+    def cancel(self):
+        """Descarta lo pendiente (la vista se cerró)"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._pending.clear()
+
+    def _run(self):
+        with self._refresh_lock:
+            with self._lock:
+                sections, self._pending = self._pending, set()
+                self._timer = None
+            if not sections:
+                return
+            try:
+                self._refresh(sections)
+            except Exception as e:
+                logger.error(f"Error al recargar las secciones {', '.join(sorted(sections))}: {str(e)}")
@@ -389,11 +389,8 @@ class AppointmentFormView:
         self.client_search.controls.clear()
 
         try:
-            # Si no hay término de búsqueda, mostrar todos los clientes
-            if not search_term:
-                clients = ClientService.get_all_clients_full_object()
-            else:
-                clients = ClientService.search_clients_full_object(search_term)
+            # Autocompletado desde el índice en memoria (sin término: los primeros por nombre)
+            clients = ClientService.typeahead(search_term)
             
             if clients:
                 self.client_search.controls.extend([
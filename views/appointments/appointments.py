@@ -1,19 +1,28 @@
 import flet as ft
 from datetime import datetime, time
 from services.appointment_service import AppointmentService, get_appointment_treatments
+from services.event_bus import event_bus, APPOINTMENT_STATUS_CHANGED
 from utils.alerts import AlertManager
+from utils.refresh_scheduler import on_view_closed
 from models.appointment import Appointment # Asegúrate de que este modelo tenga dentist_name
 
 class AppointmentsView:
     def __init__(self, page: ft.Page):
         self.page = page
         self.appointment_service = AppointmentService()
-        self.appointment_service.subscribe(self) # Suscribirse a eventos
+        # En el hilo del bus; al salir de la vista se desuscribe (dispose, vía on_view_closed)
+        event_bus.subscribe(self.on_event, (APPOINTMENT_STATUS_CHANGED,), threaded=True)
         
         self.total_items = 0
         self.page_number = 1
         self.items_per_page = 12
         self.total_pages = 1
+        self.total_is_estimate = False
+        # Paginación por clave: cursor de la página actual, de sus vecinas y filtros a los que pertenecen
+        self.page_cursor = None
+        self.next_cursor = None
+        self.prev_cursor = None
+        self.cursor_filters = None
         self.debounce_timer = None
         
         self.filters = {
@@ -39,9 +48,15 @@ class AppointmentsView:
         
         self.update_appointments(update_ui=False)
 
+    def dispose(self):
+        """La vista dejó la página: deja de escuchar eventos y descarta la búsqueda pendiente"""
+        event_bus.unsubscribe(self.on_event)
+        if self.debounce_timer:
+            self.debounce_timer.cancel()
+
     def on_event(self, event_type, data):
         """Maneja eventos de actualización"""
-        if event_type == 'APPOINTMENT_STATUS_CHANGED':
+        if event_type == APPOINTMENT_STATUS_CHANGED:
             # Verificar si la vista sigue activa antes de actualizar
             if self.page.views and self.page.views[-1].route == "/appointments":
                 self.update_appointments()
@@ -125,20 +140,34 @@ class AppointmentsView:
 
     def update_appointments(self, update_ui=True):
         """Actualiza la lista de citas con los filtros actuales y paginación"""
-        offset = (self.page_number - 1) * self.items_per_page
+        # Un cursor solo vale para los filtros con los que se generó
+        if self.filters != self.cursor_filters:
+            self.page_number = 1
+            self.page_cursor = None
+            self.cursor_filters = dict(self.filters)
         
-        # Obtener total y calcular páginas
-        self.total_items = self.appointment_service.count_appointments(self.filters)
-        import math
-        self.total_pages = max(1, math.ceil(self.total_items / self.items_per_page))
-        self.page_number = min(max(1, self.page_number), self.total_pages)
-        
-        appointments = self.appointment_service.get_appointments(
+        # Página por clave y total del listado (con los tratamientos) en una sola consulta
+        page = self.appointment_service.get_appointments_page(
             limit=self.items_per_page,
-            offset=offset,
-            filters=self.filters
+            filters=self.filters,
+            cursor=self.page_cursor
         )
-        self._render_appointments(appointments, update_ui=update_ui)
+        self.total_items = page.total or 0
+        import math
+        self.total_pages = max(1, math.ceil(self.total_items / self.items_per_page))
+        if self.page_number > self.total_pages and not page.total_is_estimate:
+            self.page_number = 1
+            self.page_cursor = None
+            page = self.appointment_service.get_appointments_page(
+                limit=self.items_per_page,
+                filters=self.filters
+            )
+        # Un total estimado puede quedarse corto respecto de la página en que ya se está
+        self.total_pages = max(self.total_pages, self.page_number)
+        self.total_is_estimate = page.total_is_estimate
+        self.next_cursor = page.next_cursor
+        self.prev_cursor = page.prev_cursor
+        self._render_appointments(page.items, update_ui=update_ui)
         if update_ui:
             self._update_pagination_controls()
         else:
@@ -152,11 +181,11 @@ class AppointmentsView:
                 disabled=self.page_number <= 1,
                 tooltip="Anterior"
             ),
-            ft.Text(f"Página {self.page_number} de {self.total_pages}"),
+            ft.Text(f"Página {self.page_number} de {'~' if self.total_is_estimate else ''}{self.total_pages}"),
             ft.IconButton(
                 icon=ft.icons.ARROW_FORWARD,
                 on_click=self._next_page,
-                disabled=self.page_number >= self.total_pages,
+                disabled=self.next_cursor is None,
                 tooltip="Siguiente"
             )
         ]
@@ -164,11 +193,13 @@ class AppointmentsView:
     def _prev_page(self, e):
         if self.page_number > 1:
             self.page_number -= 1
+            self.page_cursor = self.prev_cursor if self.page_number > 1 else None
             self.update_appointments()
             
     def _next_page(self, e):
-        if self.page_number < self.total_pages:
+        if self.next_cursor:
             self.page_number += 1
+            self.page_cursor = self.next_cursor
             self.update_appointments()
 
     def _update_pagination_controls(self):
@@ -179,11 +210,11 @@ class AppointmentsView:
                 disabled=self.page_number <= 1,
                 tooltip="Anterior"
             ),
-            ft.Text(f"Página {self.page_number} de {self.total_pages}"),
+            ft.Text(f"Página {self.page_number} de {'~' if self.total_is_estimate else ''}{self.total_pages}"),
             ft.IconButton(
                 icon=ft.icons.ARROW_FORWARD,
                 on_click=self._next_page,
-                disabled=self.page_number >= self.total_pages,
+                disabled=self.next_cursor is None,
                 tooltip="Siguiente"
             )
         ]
@@ -439,6 +470,7 @@ class AppointmentsView:
     def _perform_search(self, search_term):
         self.filters['search_term'] = search_term if search_term else None
         self.page_number = 1
+        self.page_cursor = None
         self.update_appointments()
     
     def _handle_search_submit(self, e):
@@ -499,4 +531,5 @@ class AppointmentsView:
 
 def appointments_view(page: ft.Page):
     """Función de fábrica para crear la vista de citas"""
-    return AppointmentsView(page).build_view()
+    appointments = AppointmentsView(page)
+    return on_view_closed(appointments.build_view(), appointments.dispose)
@@ -11,14 +11,17 @@ from utils.date_utils import (
 from utils.alerts import show_snackbar
 from services.appointment_service import AppointmentService
 from services.client_service import ClientService
+from services.event_bus import event_bus, APPOINTMENT_STATUS_CHANGED
 from services.payment_service import PaymentService
 from utils.alerts import show_snackbar, show_error, show_success
+from utils.refresh_scheduler import RefreshScheduler, on_view_closed
 
 class CalendarView:
     def __init__(self, page: ft.Page):
         self.page = page
-        # Suscribirse a eventos
-        AppointmentService().subscribe(self)
+        # Suscribirse a eventos: se agrupan por ventana y se recarga una vez por ventana
+        self.refresh_scheduler = RefreshScheduler(self._reload_appointments)
+        event_bus.subscribe(self.on_event, (APPOINTMENT_STATUS_CHANGED,))
         self.current_date = datetime.now().date()
         self.selected_date = self.current_date
         self.appointments = {} # Ahora almacenará más información: {'fecha_str': {'appointments': [...], 'has_cancelled_appointments': bool}}
@@ -54,14 +57,22 @@ class CalendarView:
         )
         page.overlay.append(self.date_picker)
 
+    def dispose(self):
+        """La vista dejó la página: deja de escuchar eventos y descarta las recargas pendientes"""
+        event_bus.unsubscribe(self.on_event)
+        self.refresh_scheduler.cancel()
+
     def on_event(self, event_type, data):
-        """Maneja eventos de actualización de citas, recargando el calendario y la lista."""
-        if event_type == 'APPOINTMENT_STATUS_CHANGED':
-            # Recargar solo las citas del mes actual para eficiencia
-            self.appointments = {} # Reiniciar para asegurar la recarga completa de estados
-            self.load_data()
-            self.update_calendar()
-            self.update_appointments_list()
+        """Maneja eventos de actualización de citas: programa la recarga del calendario y la lista."""
+        if event_type == APPOINTMENT_STATUS_CHANGED:
+            self.refresh_scheduler.request(('appointments',))
+
+    def _reload_appointments(self, sections):
+        # Recargar solo las citas del mes actual para eficiencia
+        self.appointments = {} # Reiniciar para asegurar la recarga completa de estados
+        self.load_data()
+        self.update_calendar()
+        self.update_appointments_list()
     
     def open_date_picker(self, e):
         """Abre el selector de fechas del calendario."""
@@ -240,7 +251,7 @@ class CalendarView:
     def load_data(self):
         """Carga las citas y cumpleaños desde la base de datos para el mes actual."""
         # 1. Cargar Citas
-        with get_db() as cursor:
+        with get_db(readonly=True) as cursor:
             first_day = date(self.current_date.year, self.current_date.month, 1)
             last_day = date(
                 self.current_date.year,
@@ -689,4 +700,5 @@ class CalendarView:
 
 def calendar_view(page: ft.Page):
     """Función de fábrica para crear la vista del calendario."""
-    return CalendarView(page).build_view()
+    calendar = CalendarView(page)
+    return on_view_closed(calendar.build_view(), calendar.dispose)
@@ -1,5 +1,6 @@
 import flet as ft
 from core.database import get_db
+from services.event_bus import event_bus, CLIENT_CREATED, CLIENT_UPDATED
 from utils.validators import validate_email, validate_phone, validate_cedula
 from utils.alerts import show_success, show_error
 from typing import Optional
@@ -96,10 +97,18 @@ class ClientFormView:
                 else:
                     cursor.execute(
                         """INSERT INTO clients (name, cedula, phone, email, birth_date) 
-                        VALUES (%s, %s, %s, %s, %s)""",
+                        VALUES (%s, %s, %s, %s, %s)
+                        RETURNING id""",
                         (self.name.value, self.cedula.value, self.phone.value, self.email.value, birth_date_val)
                     )
+                    new_id = cursor.fetchone()[0]
                     success_message = "Cliente creado con éxito"
+
+            # Notificar después del commit (índice de autocompletado y vistas suscritas)
+            if self.client_id:
+                event_bus.publish(CLIENT_UPDATED, {'client_id': self.client_id})
+            else:
+                event_bus.publish(CLIENT_CREATED, {'client_id': new_id})
             
             show_success(self.page, success_message)
             self.page.go("/clients")
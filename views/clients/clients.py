@@ -1,6 +1,8 @@
 import flet as ft
 from services.client_service import ClientService
+from services.event_bus import event_bus, CLIENT_EVENTS
 from utils.alerts import show_error, show_success
+from utils.refresh_scheduler import on_view_closed
 from models.client import Client
 from services.appointment_service import AppointmentService
 from services.payment_service import PaymentService
@@ -14,13 +16,19 @@ class ClientsView:
     def __init__(self, page: ft.Page):
         self.page = page
         self.client_service = ClientService()
-        self.client_service.subscribe(self) # Suscribirse a eventos
+        # En el hilo del bus; al salir de la vista se desuscribe (dispose, vía on_view_closed)
+        event_bus.subscribe(self.on_event, CLIENT_EVENTS, threaded=True)
         self.all_clients = []
         
         # Paginación y búsqueda
         self.page_number = 1
         self.items_per_page = 20
         self.total_pages = 1
+        self.total_is_estimate = False
+        # Paginación por clave: cursor de la página actual y de sus vecinas
+        self.page_cursor = None
+        self.next_cursor = None
+        self.prev_cursor = None
         self.search_term = ""
         self.debounce_timer = None
         
@@ -40,18 +48,24 @@ class ClientsView:
                 disabled=self.page_number <= 1,
                 tooltip="Anterior"
             ),
-            ft.Text(f"Página {self.page_number} de {self.total_pages}"),
+            ft.Text(f"Página {self.page_number} de {'~' if self.total_is_estimate else ''}{self.total_pages}"),
             ft.IconButton(
                 icon=ft.icons.ARROW_FORWARD,
                 on_click=self._next_page,
-                disabled=self.page_number >= self.total_pages,
+                disabled=self.next_cursor is None,
                 tooltip="Siguiente"
             )
         ]
 
+    def dispose(self):
+        """La vista dejó la página: deja de escuchar eventos y descarta la búsqueda pendiente"""
+        event_bus.unsubscribe(self.on_event)
+        if self.debounce_timer:
+            self.debounce_timer.cancel()
+
     def on_event(self, event_type, data):
         """Maneja eventos de actualización"""
-        if event_type in ['CLIENT_CREATED', 'CLIENT_DELETED', 'CLIENT_UPDATED']:
+        if event_type in CLIENT_EVENTS:
             # Verificar si la vista sigue activa
             if self.page.views and self.page.views[-1].route == "/clients":
                 # Si hay término de búsqueda, reaplicarlo, si no, cargar todo
@@ -87,6 +101,7 @@ class ClientsView:
     def _perform_search(self, search_term):
         self.search_term = search_term
         self.page_number = 1 # Resetear a la primera página
+        self.page_cursor = None
         self.load_clients()
         
     def _update_pagination_controls(self):
@@ -97,11 +112,11 @@ class ClientsView:
                 disabled=self.page_number <= 1,
                 tooltip="Anterior"
             ),
-            ft.Text(f"Página {self.page_number} de {self.total_pages}"),
+            ft.Text(f"Página {self.page_number} de {'~' if self.total_is_estimate else ''}{self.total_pages}"),
             ft.IconButton(
                 icon=ft.icons.ARROW_FORWARD,
                 on_click=self._next_page,
-                disabled=self.page_number >= self.total_pages,
+                disabled=self.next_cursor is None,
                 tooltip="Siguiente"
             )
         ]
@@ -110,11 +125,13 @@ class ClientsView:
     def _prev_page(self, e):
         if self.page_number > 1:
             self.page_number -= 1
+            self.page_cursor = self.prev_cursor if self.page_number > 1 else None
             self.load_clients()
             
     def _next_page(self, e):
-        if self.page_number < self.total_pages:
+        if self.next_cursor:
             self.page_number += 1
+            self.page_cursor = self.next_cursor
             self.load_clients()
     
     def _handle_search_submit(self, e):
@@ -883,22 +900,34 @@ class ClientsView:
     
     def load_clients(self, search_term=None, update_ui=True):
         if search_term is not None:
+            if search_term != self.search_term:
+                self.page_number = 1
+                self.page_cursor = None
             self.search_term = search_term
         
-        # Obtener total de items y calcular páginas
-        total_items = self.client_service.count_clients(self.search_term)
-        import math
-        self.total_pages = max(1, math.ceil(total_items / self.items_per_page))
-        
-        # Validar número de página
-        self.page_number = min(max(1, self.page_number), self.total_pages)
-        
-        # Obtener clientes paginados
-        self.all_clients = self.client_service.get_paginated_clients(
-            page=self.page_number,
+        # Página por clave a partir del cursor y total del listado, en una sola consulta
+        page = self.client_service.get_clients_page(
             per_page=self.items_per_page,
-            search_term=self.search_term
+            search_term=self.search_term,
+            cursor=self.page_cursor
         )
+        import math
+        self.total_pages = max(1, math.ceil((page.total or 0) / self.items_per_page))
+        
+        # Validar número de página (si la lista se achicó, volver al inicio)
+        if self.page_number > self.total_pages and not page.total_is_estimate:
+            self.page_number = 1
+            self.page_cursor = None
+            page = self.client_service.get_clients_page(
+                per_page=self.items_per_page,
+                search_term=self.search_term
+            )
+        # Un total estimado puede quedarse corto respecto de la página en que ya se está
+        self.total_pages = max(self.total_pages, self.page_number)
+        self.total_is_estimate = page.total_is_estimate
+        self.all_clients = page.items
+        self.next_cursor = page.next_cursor
+        self.prev_cursor = page.prev_cursor
         self.update_clients(update_ui=update_ui)
         if update_ui:
             self._update_pagination_controls()
@@ -1079,5 +1108,6 @@ class ClientsView:
         )
 
 def clients_view(page: ft.Page):
-    return ClientsView(page).build_view()
+    clients = ClientsView(page)
+    return on_view_closed(clients.build_view(), clients.dispose)
 
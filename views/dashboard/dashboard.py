@@ -1,8 +1,10 @@
 import flet as ft
+import asyncio
 from datetime import datetime, time, date # Importar time y date
-from core.database import Database
+from core.database import AsyncDatabase, Database
 from services.appointment_service import AppointmentService, get_appointment_by_id
 from services.client_service import ClientService
+from services.event_bus import event_bus, APPOINTMENT_STATUS_CHANGED, CLIENT_EVENTS
 from services.stats_service import StatsService
 from services.payment_service import PaymentService
 from services.preference_service import PreferenceService
@@ -11,6 +13,7 @@ from utils.date_utils import format_date
 from utils.widgets import build_stat_card
 from utils.alerts import show_success, show_error, show_confirmation_dialog
 from utils.theme_utils import AppTheme # Importar AppTheme
+from utils.refresh_scheduler import RefreshScheduler, on_view_closed
 import logging
 
 # Importar la nueva vista de dentistas (ya estaba, pero se mantiene)
@@ -19,12 +22,25 @@ from models.appointment import Appointment # Importar el modelo Appointment para
 
 logger = logging.getLogger(__name__)
 
+# Secciones del dashboard que se recargan por separado
+STATS = 'stats'
+APPOINTMENTS = 'appointments'
+CLIENTS = 'clients'
+ALL_SECTIONS = (STATS, APPOINTMENTS, CLIENTS)
+
+# Secciones afectadas por cada tipo de evento
+DIRTY_SECTIONS = {
+    APPOINTMENT_STATUS_CHANGED: (STATS, APPOINTMENTS),
+    **{event_type: (STATS, CLIENTS) for event_type in CLIENT_EVENTS},
+}
+
 
 class DashboardView:
     def __init__(self, page: ft.Page):
         self.page = page
-        # Suscribirse a eventos
-        AppointmentService().subscribe(self)
+        # Los eventos solo marcan secciones; la recarga se agrupa por ventana
+        self.refresh_scheduler = RefreshScheduler(self._refresh_sections)
+        event_bus.subscribe(self.on_event, DIRTY_SECTIONS.keys())
         self.current_date = datetime.now()
         self.upcoming_appointments = []
         self.recent_clients = []
@@ -45,31 +61,67 @@ class DashboardView:
         self.appointments_column = None
         self.clients_row = None
     
+    def dispose(self):
+        """La vista dejó la página: deja de escuchar eventos y descarta las recargas pendientes"""
+        event_bus.unsubscribe(self.on_event)
+        self.refresh_scheduler.cancel()
+
     def on_event(self, event_type, data):
-        """Maneja eventos de actualización"""
-        if event_type == 'APPOINTMENT_STATUS_CHANGED':
-            # Recargar datos
-            self.load_data()
-            
-            # Actualizar componentes específicos
+        """Maneja eventos de actualización: marca las secciones afectadas para la próxima recarga"""
+        self.refresh_scheduler.request(DIRTY_SECTIONS.get(event_type, ()))
+
+    def refresh(self, *sections):
+        """Recarga ya las secciones indicadas (todas si no se indican) y lo que estuviera pendiente"""
+        self.refresh_scheduler.request(sections or ALL_SECTIONS)
+        self.refresh_scheduler.flush()
+
+    def _refresh_sections(self, sections):
+        """Recarga los datos solo de las secciones marcadas y las redibuja con una sola actualización"""
+        sections = set(sections)
+        if STATS in sections and AsyncDatabase.is_available():
+            # Las estadísticas se recargan en el bucle de Flet, sin ocupar este hilo mientras esperan a Postgres
+            sections.discard(STATS)
+            self.page.run_task(self._refresh_stats_async)
+        if not sections:
+            return
+        self.load_data(sections)
+        if STATS in sections:
             self.update_stats()
+        if APPOINTMENTS in sections:
             self.update_appointments()
-            # Si hubiera cambios que afecten a clientes, llamaríamos a self.update_clients()
-            
-            self.page.update()
+        if CLIENTS in sections:
+            self.update_clients()
+        self.page.update()
     
-    def load_data(self):
-        """Carga todos los datos necesarios para el dashboard"""
-        logger.info("Cargando datos para el dashboard...")
+    async def _refresh_stats_async(self):
+        """Recarga y redibuja las estadísticas con la capa asíncrona (asyncpg)"""
         try:
-            self.upcoming_appointments = self.appointment_service.get_upcoming_appointments(limit=5)
-            logger.info(f"Citas próximas cargadas: {len(self.upcoming_appointments)}")
-            self.recent_clients = self.client_service.get_recent_clients(limit=5)
-            logger.info(f"Clientes recientes cargados: {len(self.recent_clients)}")
-            
-            # Obtener estadísticas actualizadas del StatsService
-            self.stats = self.stats_service.get_dashboard_stats()
-            logger.info(f"Estadísticas cargadas: {self.stats}")
+            self.stats = await self.stats_service.get_dashboard_stats_async()
+        except Exception as e:
+            logger.warning(f"Estadísticas asíncronas no disponibles, se usa la consulta síncrona: {str(e)}")
+            self.stats = await asyncio.to_thread(self.stats_service.get_dashboard_stats)
+        # update_stats aún consulta los cumpleaños con la capa síncrona: fuera del bucle
+        await asyncio.to_thread(self.update_stats)
+        self.page.update()
+
+    def load_data(self, sections=ALL_SECTIONS):
+        """Carga los datos de las secciones indicadas del dashboard (todas por defecto)"""
+        logger.info(f"Cargando datos para el dashboard ({', '.join(sorted(sections))})...")
+        try:
+            # Una sola conexión por pool: citas y clientes (lecturas de solo lectura) comparten
+            # la del interactivo; las estadísticas usan la del pool de reportes
+            with Database.session(readonly=True), Database.session(readonly=True, pool=Database.REPORTING):
+                if APPOINTMENTS in sections:
+                    self.upcoming_appointments = self.appointment_service.get_upcoming_appointments(limit=5)
+                    logger.info(f"Citas próximas cargadas: {len(self.upcoming_appointments)}")
+                if CLIENTS in sections:
+                    self.recent_clients = self.client_service.get_recent_clients(limit=5)
+                    logger.info(f"Clientes recientes cargados: {len(self.recent_clients)}")
+                
+                if STATS in sections:
+                    # Obtener estadísticas actualizadas del StatsService
+                    self.stats = self.stats_service.get_dashboard_stats()
+                    logger.info(f"Estadísticas cargadas: {self.stats}")
         except Exception as e:
             logger.error(f"Error al cargar datos del dashboard: {str(e)}")
             raise
@@ -726,11 +778,8 @@ class DashboardView:
                     else:
                         logger.warning(f"No se encontró deuda asociada a la cita {appointment_id} para eliminar o falló la eliminación al cancelar.")
 
-                self.load_data()
-                # Actualización granular
-                self.update_stats()
-                self.update_appointments()
-                self.page.update()
+                # Actualización granular (incluye lo que marcó el evento del cambio de estado)
+                self.refresh(STATS, APPOINTMENTS)
                 show_success(self.page, f"Estado actualizado a {new_status.capitalize()}")
             else:
                 show_error(self.page, "No se pudo actualizar el estado")
@@ -771,11 +820,8 @@ class DashboardView:
         try:
             success = self.appointment_service.delete_appointment(appointment_id)
             if success:
-                self.load_data()
                 # Actualización granular
-                self.update_stats()
-                self.update_appointments()
-                self.page.update()
+                self.refresh(STATS, APPOINTMENTS)
                 show_success(self.page, "Cita eliminada exitosamente.")
             else:
                 show_error(self.page, "No se pudo eliminar la cita.")
@@ -948,11 +994,7 @@ class DashboardView:
                     show_success(self.page, msg)
                     
                     # Recargar estadísticas y datos del Dashboard
-                    self.load_data()
-                    self.update_stats()
-                    self.update_appointments()
-                    self.update_clients()
-                    self.page.update()
+                    self.refresh()
                     close_dialog(e)
                 else:
                     show_error(self.page, message)
@@ -986,4 +1028,4 @@ class DashboardView:
 def dashboard_view(page: ft.Page):
     """Función de fábrica para la vista del dashboard"""
     dashboard = DashboardView(page)
-    return dashboard.build_view()
+    return on_view_closed(dashboard.build_view(), dashboard.dispose)
@@ -198,8 +198,8 @@ class PresupFormView:
             return
 
         try:
-            # Usar ClientService para buscar clientes
-            clients = ClientService.get_all_clients(search_term=search_term) 
+            # Autocompletado de clientes desde el índice en memoria de ClientService
+            clients = ClientService.typeahead(search_term)
             e.control.controls = [
                 ft.ListTile(
                     title=ft.Text(f"{client.name}", color=list_tile_title_color),
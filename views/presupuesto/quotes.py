@@ -22,6 +22,14 @@ class QuotesView:
         self.current_page = 1
         self.items_per_page = 10
         self.total_items = 0
+        # Paginación por clave: cómo se pide la página actual y cursores de sus vecinas
+        self.page_cursor: Optional[str] = None
+        self.page_from_end = False
+        self.next_cursor: Optional[str] = None
+        self.prev_cursor: Optional[str] = None
+        self.cursor_filters = None
+        self.total_pages = 1
+        self.total_is_estimate = False
 
         # Configurar el FilePicker para la descarga con un handler de resultado
         self.file_picker = ft.FilePicker(on_result=self._on_file_picker_result)
@@ -246,25 +254,58 @@ class QuotesView:
         start_date = self.start_date_picker.value.date() if self.start_date_picker.value else self.default_start_date
         end_date = self.end_date_picker.value.date() if self.end_date_picker.value else self.default_end_date
 
-        offset = (self.current_page - 1) * self.items_per_page
+        # Un cursor solo vale para los filtros con los que se generó
+        filters = (search_term, status_filter, start_date, end_date)
+        if self.current_page == 1 or filters != self.cursor_filters:
+            self.current_page = 1
+            self.page_cursor = None
+            self.page_from_end = False
+            self.cursor_filters = filters
 
-        logger.info(f"Loading quotes with: search_term='{search_term}', status_filter='{status_filter}', start_date={start_date}, end_date={end_date}, limit={self.items_per_page}, offset={offset}")
+        logger.info(f"Loading quotes with: search_term='{search_term}', status_filter='{status_filter}', start_date={start_date}, end_date={end_date}, limit={self.items_per_page}, page={self.current_page}")
 
         try:
-            self.all_quotes = self.quote_service.get_all_quotes(
+            limit = self.items_per_page
+            if self.page_from_end and not self.total_is_estimate:
+                # La última página puede estar incompleta: se piden solo las filas que le tocan
+                limit = max(1, self.total_items - (self.total_pages - 1) * self.items_per_page)
+
+            # Página por clave, tratamientos y total del listado en una sola consulta
+            page = self.quote_service.get_quotes_page(
                 search_term=search_term,
                 status_filter=status_filter,
                 start_date=start_date,
                 end_date=end_date,
-                limit=self.items_per_page,
-                offset=offset
+                limit=limit,
+                cursor=self.page_cursor,
+                from_end=self.page_from_end
             )
-            self.total_items = self.quote_service.count_quotes(
-                search_term=search_term,
-                status_filter=status_filter,
-                start_date=start_date,
-                end_date=end_date
+            self.total_items = page.total or 0
+            self.total_is_estimate = page.total_is_estimate
+            total_pages = max(1, (self.total_items + self.items_per_page - 1) // self.items_per_page)
+
+            stale_last_page = (
+                self.page_from_end and not self.total_is_estimate and total_pages != self.total_pages
             )
+            if (self.current_page > total_pages and not self.total_is_estimate) or stale_last_page:
+                # La lista cambió desde la carga anterior: volver a la primera página
+                self.current_page = 1
+                self.page_cursor = None
+                self.page_from_end = False
+                page = self.quote_service.get_quotes_page(
+                    search_term=search_term,
+                    status_filter=status_filter,
+                    start_date=start_date,
+                    end_date=end_date,
+                    limit=self.items_per_page
+                )
+            if self.page_from_end:
+                self.current_page = total_pages
+            # Un total estimado puede quedarse corto respecto de la página en que ya se está
+            self.total_pages = max(total_pages, self.current_page)
+            self.all_quotes = page.items
+            self.next_cursor = page.next_cursor
+            self.prev_cursor = page.prev_cursor
 
             logger.info(f"Quotes loaded: {len(self.all_quotes)}, Total items: {self.total_items}")
             self._render_quotes()
@@ -569,7 +610,7 @@ class QuotesView:
 
     def _update_pagination_controls(self):
         """Actualiza los controles de paginación."""
-        total_pages = max(1, (self.total_items + self.items_per_page - 1) // self.items_per_page)
+        total_pages = self.total_pages
         
         # Colores para los íconos de paginación y el texto del número de página
         icon_color_pagination = ft.colors.BLACK if self.page.theme_mode == ft.ThemeMode.LIGHT else ft.colors.WHITE
@@ -592,17 +633,20 @@ class QuotesView:
                 disabled=self.current_page == 1,
                 icon_color=icon_color_pagination
             ),
-            ft.Text(f"Página {self.current_page} de {total_pages}", color=text_color_pagination),
+            ft.Text(
+                f"Página {self.current_page} de {'~' if self.total_is_estimate else ''}{total_pages}",
+                color=text_color_pagination
+            ),
             ft.IconButton(
                 icon=ft.icons.CHEVRON_RIGHT,
                 on_click=lambda e: self.change_page(self.current_page + 1),
-                disabled=self.current_page * self.items_per_page >= self.total_items,
+                disabled=self.next_cursor is None,
                 icon_color=icon_color_pagination
             ),
             ft.IconButton(
                 icon=ft.icons.LAST_PAGE,
                 on_click=lambda e: self.change_page(total_pages),
-                disabled=self.current_page * self.items_per_page >= self.total_items,
+                disabled=self.next_cursor is None,
                 icon_color=icon_color_pagination
             ),
             ft.Dropdown(
@@ -624,6 +668,17 @@ class QuotesView:
 
     def change_page(self, new_page):
         """Cambia la página actual y recarga los presupuestos."""
+        total_pages = self.total_pages
+        if new_page <= 1:
+            self.page_cursor, self.page_from_end = None, False
+        elif new_page == self.current_page + 1 and self.next_cursor:
+            self.page_cursor, self.page_from_end = self.next_cursor, False
+        elif new_page == self.current_page - 1 and self.prev_cursor:
+            self.page_cursor, self.page_from_end = self.prev_cursor, False
+        elif new_page == total_pages:
+            self.page_cursor, self.page_from_end = None, True
+        else:
+            return
         self.current_page = new_page
         self.load_quotes()
 
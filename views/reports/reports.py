@@ -1,9 +1,10 @@
 import flet as ft
 from datetime import datetime, timedelta
-from core.database import get_db
+from core.database import get_db, Database
+from services.stats_service import StatsService
+from services.report_snapshot_service import ReportSnapshotService
 from utils.date_utils import (
     format_date,
-    get_month_name,
     get_week_range,
     get_last_day_of_month
 )
@@ -194,6 +195,7 @@ class ReportsView:
 
         # Componentes UI principales para el diseño
         self.stats_row = ft.ResponsiveRow(spacing=20, run_spacing=20)
+        self.anomalies_column = ft.Column(spacing=5)
         self.charts_column = ft.Column(spacing=20)
         
         # DatePickers para rango de fechas personalizado
@@ -309,6 +311,7 @@ class ReportsView:
         try:
             self.current_stats = self.load_statistics()
             self.update_stats_row(self.current_stats)
+            self.update_anomalies(StatsService.detect_anomalies(self.start_date, self.end_date))
             
             chart_data = self.load_chart_data()
             self.update_charts(chart_data)
@@ -330,7 +333,7 @@ class ReportsView:
     def load_payments(self):
         """Carga los pagos para mostrar en la tabla."""
         try:
-            with get_db() as cursor: # Usar get_db directamente si es un contexto manager
+            with get_db(pool=Database.REPORTING) as cursor: # Usar get_db directamente si es un contexto manager
                 cursor.execute("""
                     SELECT 
                         p.id,
@@ -398,7 +401,7 @@ class ReportsView:
     def load_debts(self):
         """Carga las deudas para mostrar en la tabla."""
         try:
-            with get_db() as cursor:
+            with get_db(pool=Database.REPORTING) as cursor:
                 cursor.execute("""
                     SELECT 
                         d.id,
@@ -475,7 +478,7 @@ class ReportsView:
         treatments_content = []
         if quote_id:
             try:
-                with get_db() as cursor:
+                with get_db(pool=Database.REPORTING) as cursor:
                     cursor.execute("""
                         SELECT t.name, qt.price_at_quote, t.description, qt.quantity
                         FROM treatments t
@@ -527,90 +530,17 @@ class ReportsView:
         self.page.update()
     
     def load_statistics(self):
-        """Carga estadísticas generales desde la base de datos."""
-        stats = {}
-        
-        with get_db() as cursor:
-            # Estadísticas de citas
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) as total,
-                    SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as completed,
-                    SUM(CASE WHEN status = 'cancelled' THEN 1 ELSE 0 END) as cancelled,
-                    SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END) as pending
-                FROM appointments 
-                WHERE date BETWEEN %s AND %s
-            """, (self.start_date, self.end_date))
-            appointment_stats = cursor.fetchone()
-            stats.update({
-                'total_appointments': int(appointment_stats[0]) if appointment_stats and appointment_stats[0] is not None else 0,
-                'completed_appointments': int(appointment_stats[1]) if appointment_stats and appointment_stats[1] is not None else 0,
-                'cancelled_appointments': int(appointment_stats[2]) if appointment_stats and appointment_stats[2] is not None else 0,
-                'pending_appointments': int(appointment_stats[3]) if appointment_stats and appointment_stats[3] is not None else 0
-            })
-            
-            # Estadísticas financieras (pagos completados)
-            cursor.execute("""
-                SELECT 
-                    COALESCE(SUM(amount), 0) as total_revenue,
-                    COUNT(*) as total_payments
-                FROM payments
-                WHERE payment_date BETWEEN %s AND %s
-            """, (self.start_date, self.end_date))
-            payment_stats = cursor.fetchone()
-            stats.update({
-                'total_revenue': float(payment_stats[0]) if payment_stats and payment_stats[0] is not None else 0.0,
-                'total_payments': int(payment_stats[1]) if payment_stats and payment_stats[1] is not None else 0
-            })
-
-            # Monto total de deudas pendientes (todas, no solo vencidas)
-            cursor.execute("""
-                SELECT COALESCE(SUM(amount - paid_amount), 0) as total_pending_debts_amount
-                FROM debts
-                WHERE status = 'pending'
-                AND created_at BETWEEN %s AND %s
-            """, (self.start_date, self.end_date))
-            total_pending_debts_stats = cursor.fetchone()
-            stats.update({
-                'total_pending_debts_amount': float(total_pending_debts_stats[0]) if total_pending_debts_stats and total_pending_debts_stats[0] is not None else 0.0
-            })
-
-            # Monto total de deudas vencidas (solo las que están pending Y due_date < CURRENT_DATE)
-            cursor.execute("""
-                SELECT 
-                    COALESCE(SUM(amount - paid_amount), 0) as overdue_debts_amount,
-                    COUNT(*) as overdue_count
-                FROM debts
-                WHERE status = 'pending'
-                AND due_date < CURRENT_DATE
-                AND created_at BETWEEN %s AND %s
-            """, (self.start_date, self.end_date))
-            overdue_stats = cursor.fetchone()
-            stats.update({
-                'overdue_debts_amount': float(overdue_stats[0]) if overdue_stats and overdue_stats[0] is not None else 0.0,
-                'overdue_count': int(overdue_stats[1]) if overdue_stats and overdue_stats[1] is not None else 0
-            })
-            
-            # Métodos de pago más usados
-            cursor.execute("""
-                SELECT method, COUNT(*) as count
-                FROM payments
-                WHERE payment_date BETWEEN %s AND %s
-                GROUP BY method
-                ORDER BY count DESC
-                LIMIT 1
-            """, (self.start_date, self.end_date))
-            popular_method = cursor.fetchone()
-            stats['popular_payment_method'] = popular_method[0] if popular_method else "N/A"
-            
-            # Cantidad total de clientes (todos, no solo nuevos)
-            cursor.execute("""
-                SELECT COUNT(*) 
-                FROM clients 
-            """) # No se filtra por fecha para obtener el total general
-            total_clients_result = cursor.fetchone() 
-            stats['total_clients'] = int(total_clients_result[0]) if total_clients_result and total_clients_result[0] is not None else 0
-        
+        """
+        Carga estadísticas generales. Las de un periodo ya cerrado se sirven desde su
+        instantánea (ReportSnapshotService) salvo que haya ediciones posteriores.
+        """
+        start_date, end_date = self.start_date, self.end_date
+        stats = dict(ReportSnapshotService.get_or_compute(
+            'statistics', start_date, end_date,
+            lambda: StatsService.get_report_statistics(start_date, end_date)
+        ))
+        # Cantidad total de clientes (todos, no solo nuevos): no depende del periodo
+        stats['total_clients'] = StatsService.count_clients()
         return stats
 
     def update_stats_row(self, stats):
@@ -642,6 +572,36 @@ class ReportsView:
         ])
         self.page.update() # Asegurar que la fila de estadísticas se actualice
 
+    def update_anomalies(self, anomalies):
+        """Muestra bajo las estadísticas los días con valores atípicos (los más recientes primero)."""
+        labels = {
+            'revenue': "Ingresos",
+            'appointments': "Citas",
+            'cancellations': "Cancelaciones",
+            'new_clients': "Clientes nuevos"
+        }
+        text_color = ft.colors.GREY_800 if self.page.theme_mode == ft.ThemeMode.LIGHT else ft.colors.BLUE_GREY_100
+
+        self.anomalies_column.controls.clear()
+        for anomaly in sorted(anomalies, key=lambda a: a['date'], reverse=True)[:10]:
+            is_up = anomaly['direction'] == 'up'
+            value = anomaly['value']
+            expected = anomaly['expected']
+            if anomaly['metric'] == 'revenue':
+                value, expected = f"${value:,.2f}", f"${expected:,.2f}"
+            else:
+                value, expected = int(value), int(expected)
+            self.anomalies_column.controls.append(ft.Row([
+                ft.Icon(ft.icons.TRENDING_UP if is_up else ft.icons.TRENDING_DOWN,
+                        color=ft.colors.GREEN_400 if is_up else ft.colors.RED_400, size=18),
+                ft.Text(
+                    f"{anomaly['date'].strftime('%d/%m/%Y')} - {labels.get(anomaly['metric'], anomaly['metric'])}: "
+                    f"{value} (habitual: {expected})",
+                    size=13, color=text_color
+                )
+            ], spacing=8))
+        self.page.update()
+
     def _build_stat_card(self, title: str, value: any, icon: ft.icons, color: str):
         """
         Helper para construir una tarjeta de estadística consistente.
@@ -685,96 +645,13 @@ class ReportsView:
         ], col={"xs": 12, "sm": 6, "md": 3}) # Column para ResponsiveRow
 
     def load_chart_data(self):
-        """Carga datos para gráficos incluyendo información financiera."""
-        chart_data = {}
-        
-        with get_db() as cursor:
-            # Datos de citas por estado (Pie Chart)
-            cursor.execute("""
-                SELECT status, COUNT(*) 
-                FROM appointments 
-                WHERE date BETWEEN %s AND %s
-                GROUP BY status
-            """, (self.start_date, self.end_date))
-            chart_data['appointments_by_status'] = {
-                status: int(count) if count is not None else 0 
-                for status, count in cursor.fetchall()
-            }
-            
-            # Datos de ingresos por método de pago (Pie Chart)
-            cursor.execute("""
-                SELECT method, SUM(amount)
-                FROM payments
-                WHERE payment_date BETWEEN %s AND %s
-                GROUP BY method
-            """, (self.start_date, self.end_date))
-            chart_data['revenue_by_method'] = {
-                method: float(amount) if amount is not None else 0.0
-                for method, amount in cursor.fetchall()
-            }
-            
-            # Datos de deudas por estado (Pie Chart - Distinción entre pendientes y vencidas)
-            cursor.execute("""
-                SELECT 
-                    CASE 
-                        WHEN status = 'pending' AND due_date < CURRENT_DATE THEN 'Vencidas'
-                        WHEN status = 'pending' THEN 'Pendientes'
-                        ELSE 'Pagadas'
-                    END as status_category,
-                    COALESCE(
-                        CASE
-                            WHEN status = 'pending' THEN SUM(amount - paid_amount)
-                            WHEN status = 'paid' THEN SUM(amount)
-                            ELSE 0
-                        END, 0
-                    ) as total_amount
-                FROM debts
-                WHERE created_at BETWEEN %s AND %s
-                GROUP BY status_category, status
-            """, (self.start_date, self.end_date))
-            chart_data['debts_by_status'] = {
-                category: float(amount) if amount is not None else 0.0
-                for category, amount in cursor.fetchall()
-            }
-            
-            # Datos temporales de ingresos (Bar Chart)
-            if self.report_type == 'daily':
-                cursor.execute("""
-                    SELECT DATE(payment_date), SUM(amount)
-                    FROM payments
-                    WHERE payment_date BETWEEN %s AND %s
-                    GROUP BY DATE(payment_date)
-                    ORDER BY DATE(payment_date)
-                """, (self.start_date, self.end_date))
-                chart_data['revenue_over_time'] = [(date, float(amount) if amount is not None else 0.0) for date, amount in cursor.fetchall()]
-            elif self.report_type == 'weekly':
-                cursor.execute("""
-                    SELECT EXTRACT(YEAR FROM payment_date)::int, 
-                        EXTRACT(WEEK FROM payment_date)::int, 
-                        SUM(amount)
-                    FROM payments
-                    WHERE payment_date BETWEEN %s AND %s
-                    GROUP BY EXTRACT(YEAR FROM payment_date), EXTRACT(WEEK FROM payment_date)
-                    ORDER BY EXTRACT(YEAR FROM payment_date), EXTRACT(WEEK FROM payment_date)
-                """, (self.start_date, self.end_date))
-                chart_data['revenue_over_time'] = [
-                    (f"Semana {int(week)}", float(amount) if amount is not None else 0.0) for year, week, amount in cursor.fetchall()
-                ]
-            else:  # monthly (o cualquier otro por defecto a mensual)
-                cursor.execute("""
-                    SELECT EXTRACT(YEAR FROM payment_date)::int, 
-                        EXTRACT(MONTH FROM payment_date)::int, 
-                        SUM(amount)
-                    FROM payments
-                    WHERE payment_date BETWEEN %s AND %s
-                    GROUP BY EXTRACT(YEAR FROM payment_date), EXTRACT(MONTH FROM payment_date)
-                    ORDER BY EXTRACT(YEAR FROM payment_date), EXTRACT(MONTH FROM payment_date)
-                """, (self.start_date, self.end_date))
-                chart_data['revenue_over_time'] = [
-                    (get_month_name(int(month)), float(amount) if amount is not None else 0.0) for year, month, amount in cursor.fetchall()
-                ]
-        
-        return chart_data
+        """Carga datos para gráficos incluyendo información financiera (agregados diarios e instantáneas)."""
+        start_date, end_date, report_type = self.start_date, self.end_date, self.report_type
+        # La serie temporal se agrupa según el tipo de reporte: cada tipo tiene su instantánea
+        return ReportSnapshotService.get_or_compute(
+            f'charts:{report_type}', start_date, end_date,
+            lambda: StatsService.get_report_chart_data(start_date, end_date, report_type)
+        )
 
     def update_charts(self, chart_data):
         """Actualiza los gráficos con datos financieros."""
@@ -887,15 +764,19 @@ class ReportsView:
         tooltip_bgcolor = ft.colors.with_opacity(0.8, ft.colors.GREY_800) if self.page.theme_mode == ft.ThemeMode.LIGHT else ft.colors.with_opacity(0.9, ft.colors.BLUE_GREY_900)
         border_color = ft.colors.GREY_300 if self.page.theme_mode == ft.ThemeMode.LIGHT else ft.colors.BLUE_GREY_600
 
-        if not data:
+        if not data or (isinstance(data, dict) and not any(data.get('values', []))):
             return ft.Column([
                 ft.Text(title, size=16, weight="bold", color=chart_title_color), 
                 ft.Text("No hay datos disponibles para este período.", italic=True, color=chart_title_color)
             ], expand=True, alignment=ft.MainAxisAlignment.CENTER, horizontal_alignment=ft.CrossAxisAlignment.CENTER)
 
+        # Series de TimeSeriesService: etiquetas y valores en listas alineadas
+        if isinstance(data, dict):
+            data = list(zip(data.get('labels', []), data.get('values', [])))
+
         processed_data = []
         for item in data:
-            if isinstance(item, tuple) and len(item) == 2:
+            if isinstance(item, (tuple, list)) and len(item) == 2:
                 processed_data.append((str(item[0]), float(item[1])))
             else:
                 processed_data.append((str(item), float(item))) 
@@ -1032,7 +913,7 @@ class ReportsView:
     def load_recent_appointments(self):
         """Carga las citas para mostrar en la tabla."""
         try:
-            with get_db() as cursor:
+            with get_db(pool=Database.REPORTING) as cursor:
                 cursor.execute("""
                     SELECT a.id, c.name, a.date, a.time, a.status, 
                         COALESCE(SUM(t.price), 0) as total_treatments_amount
@@ -1384,6 +1265,7 @@ class ReportsView:
         return ft.Column([
             ft.Text("Resumen Estadístico", size=20, weight="bold", color=section_title_color),
             self.stats_row, 
+            self.anomalies_column,
             ft.Divider(color=divider_color),
             ft.Text("Visualización de Datos", size=20, weight="bold", color=section_title_color),
             self.charts_column,
@@ -1,9 +1,10 @@
 import flet as ft
-import time
+import importlib
 import threading
 import logging
 from core.database import Database
-from services.appointment_service import AppointmentService
+from core.startup import StartupPipeline
+from services.maintenance_jobs import start_maintenance
 from services.preference_service import PreferenceService
 
 logger = logging.getLogger(__name__)
@@ -13,6 +14,7 @@ class SplashView(ft.View):
         super().__init__(route="/splash", padding=0)
         self.page = page
         self.on_complete = on_complete
+        self.startup = self._build_pipeline()
         self.bgcolor = ft.colors.SURFACE_VARIANT
         
         self.logo = ft.Image(
@@ -71,38 +73,50 @@ class SplashView(ft.View):
         self.progress_bar.opacity = 1
         self.status_text.opacity = 1
         self.update()
+        self.startup.report.mark("splash_visible")
         
         # Iniciar carga en segundo plano
         threading.Thread(target=self._run_initialization, daemon=True).start()
 
-    def _run_initialization(self):
-        try:
-            self._update_status("Conectando a la base de datos...", 0.2)
-            # Simular un pequeño delay para que se vea la animación si es muy rápido
-            time.sleep(0.5) 
-            Database.initialize()
-            
-            self._update_status("Verificando citas pendientes...", 0.6)
-            AppointmentService.cancel_past_pending_appointments()
-            
-            self._update_status("Cargando módulos...", 0.8)
-            # Aquí podríamos precargar otros módulos si fuera necesario
-            time.sleep(0.5)
+    def _build_pipeline(self) -> StartupPipeline:
+        """
+        Pasos del arranque. La conexión y la precarga de las primeras vistas son
+        independientes y corren a la vez; las preferencias esperan a la conexión. Los
+        barridos de mantenimiento no hacen falta para mostrar el login: se difieren.
+        """
+        pipeline = StartupPipeline()
+        pipeline.add("database", Database.initialize, label="Conectando a la base de datos...")
+        pipeline.add("modules", self._preload_modules, label="Cargando módulos...")
+        pipeline.add("preferences", self._load_preferences, requires=("database",),
+                     label="Cargando preferencias...")
+        pipeline.add("maintenance", start_maintenance, requires=("database",), deferred=True)
+        return pipeline
 
-            self._update_status("Cargando preferencias...", 0.9)
-            user_id_for_preferences = 1 # Esto debería venir de algún lado, pero por ahora hardcoded como en main.py
-            saved_theme = PreferenceService.get_user_theme(user_id_for_preferences)
-            self.page.theme_mode = ft.ThemeMode.DARK if saved_theme == 'dark' else ft.ThemeMode.LIGHT
-            self.page.update()
+    @staticmethod
+    def _preload_modules():
+        # Las vistas se importan al navegar; las dos primeras se adelantan mientras se conecta
+        for module in ("views.auth.login", "views.dashboard.dashboard"):
+            importlib.import_module(module)
 
+    def _load_preferences(self):
+        user_id_for_preferences = 1 # Esto debería venir de algún lado, pero por ahora hardcoded como en main.py
+        saved_theme = PreferenceService.get_user_theme(user_id_for_preferences)
+        self.page.theme_mode = ft.ThemeMode.DARK if saved_theme == 'dark' else ft.ThemeMode.LIGHT
+        self.page.update()
+
+    def _run_initialization(self):
+        try:
+            self._update_status("Conectando a la base de datos...", 0.0)
+            self.startup.run(on_progress=self._update_status)
+            self.startup.report.mark("initialized")
             self._update_status("¡Listo!", 1.0)
-            time.sleep(0.5)
             
             # Navegar al login en el hilo principal
             self.page.run_task(self._complete_loading)
             
         except Exception as e:
             logger.error(f"Error durante la inicialización: {e}")
+            self.startup.report.write()
             self._update_status(f"Error: {str(e)}", 0.0)
             # Aquí podrías mostrar un botón de reintentar o salir
 
@@ -113,3 +127,6 @@ class SplashView(ft.View):
 
     async def _complete_loading(self):
         self.on_complete()
+        self.startup.report.mark("login_visible")
+        # Con el login ya dibujado, se ejecuta lo diferido y se escribe el informe de tiempos
+        self.startup.run_deferred()